@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import FundSnapshot, MutualFund
 
-# Register your models here.
+
+@admin.register(FundSnapshot)
+class FundSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['id', 'source_url', 'fetched_at', 'fund_count']
+
+
+@admin.register(MutualFund)
+class MutualFundAdmin(admin.ModelAdmin):
+    list_display = ['scheme_name', 'plan', 'category_name', 'crisil_rank', 'aum_cr', 'return_1y', 'snapshot']
+    list_filter = ['plan', 'category_name']
+    search_fields = ['scheme_name', 'isin']
@@ -0,0 +1,142 @@
+"""
+Streaming fund exports.
+
+Rows are read from the database with ``QuerySet.iterator`` and encoded a
+batch at a time, so the export never holds more than one batch in memory:
+
+* ``csv``: the same columns as the JSON API, one header row
+* ``ndjson``: one JSON object per line
+* ``parquet``: one row group per batch (needs pyarrow)
+
+Any format can additionally be gzip-compressed on the fly.
+"""
+import csv
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from .extractor import NUMERIC_FIELDS, RECORD_COLUMNS
+
+BATCH_SIZE = 2000
+
+EXPORT_FORMATS = {
+    # format: (content type, file extension)
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _batches(queryset):
+    fields = [field for field, _ in RECORD_COLUMNS]
+    batch = []
+    for row in queryset.values_list(*fields).iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Buffer:
+    """Write target that hands back what was written since the last ``take``."""
+
+    def __init__(self, binary=True):
+        self.empty = b'' if binary else ''
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = self.parts, []
+        return self.empty.join(data)
+
+
+def csv_chunks(queryset):
+    buffer = _Buffer(binary=False)
+    writer = csv.writer(buffer)
+    writer.writerow([column for _, column in RECORD_COLUMNS])
+    for batch in _batches(queryset):
+        writer.writerows(batch)
+        yield buffer.take().encode()
+    yield buffer.take().encode()
+
+
+def ndjson_chunks(queryset):
+    columns = [column for _, column in RECORD_COLUMNS]
+    for batch in _batches(queryset):
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in batch).encode()
+
+
+def _arrow_schema():
+    types = []
+    for field, column in RECORD_COLUMNS:
+        if field in NUMERIC_FIELDS:
+            types.append((column, pa.float64()))
+        elif field == 'crisil_rank':
+            types.append((column, pa.int8()))
+        else:
+            types.append((column, pa.string()))
+    return pa.schema(types)
+
+
+def parquet_chunks(queryset):
+    schema = _arrow_schema()
+    buffer = _Buffer()
+    writer = pq.ParquetWriter(buffer, schema)
+    try:
+        for batch in _batches(queryset):
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield buffer.take()
+    finally:
+        writer.close()
+    yield buffer.take()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(queryset, export_format='csv', compress=False):
+    """Encoded chunks of ``queryset`` in ``export_format``; raises ExportError for unknown formats."""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export format {export_format}; use one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == 'parquet' and pq is None:
+        raise ExportError('Parquet export requires pyarrow to be installed')
+
+    encoders = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'parquet': parquet_chunks}
+    chunks = encoders[export_format](queryset)
+    return gzip_chunks(chunks) if compress else chunks
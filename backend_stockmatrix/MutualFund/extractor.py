@@ -0,0 +1,168 @@
+"""
+Streaming extractor for the moneycontrol fund table.
+
+The page is fed to an incremental parser chunk by chunk and only ``<tr>``
+rows whose class starts with ``INF`` (the scheme ISIN) are turned into typed
+fund records; nothing else is kept in memory.  lxml's HTMLPullParser is used
+when lxml is installed, otherwise the stdlib ``html.parser`` tokenizer.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Model field -> column name used by the JSON API and CSV export, in table order
+RECORD_COLUMNS = [
+    ('scheme_name', 'Scheme Name'),
+    ('plan', 'Plan'),
+    ('category_name', 'Category Name'),
+    ('crisil_rank', 'Crisil Rank'),
+    ('aum_cr', 'AuM (Cr)'),
+    ('return_1w', '1W'),
+    ('return_1m', '1M'),
+    ('return_3m', '3M'),
+    ('return_6m', '6M'),
+    ('return_ytd', 'YTD'),
+    ('return_1y', '1Y'),
+    ('return_2y', '2Y'),
+    ('return_3y', '3Y'),
+    ('return_5y', '5Y'),
+    ('return_10y', '10Y'),
+]
+
+NUMERIC_FIELDS = {field for field, _ in RECORD_COLUMNS if field == 'aum_cr' or field.startswith('return_')}
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_DIGIT = re.compile(r'\d')
+_ASCII_SPACES = ' \n\t\f\r'
+
+
+def parse_number(text):
+    """Parse '12,345.6', '18.2%' or '-3.1' into a float; '-', '--' and 'N/A' become None."""
+    match = _NUMBER.search(str(text).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def parse_rank(text):
+    match = _DIGIT.search(str(text))
+    return int(match.group()) if match else None
+
+
+def typed_fund(isin, cells):
+    """Model field values for one table row given its cell texts."""
+    fund = {'isin': isin}
+    for (field, _), text in zip(RECORD_COLUMNS, cells):
+        if field in NUMERIC_FIELDS:
+            fund[field] = parse_number(text)
+        elif field == 'crisil_rank':
+            fund[field] = parse_rank(text)
+        else:
+            fund[field] = text
+    return fund
+
+
+def _cell_text(strings):
+    """Join a cell's text nodes the way BeautifulSoup's ``.text`` did.
+
+    Whitespace-only nodes between tags collapse to a newline (or a space when
+    they have none), so multi-element cells keep the old scraper's values.
+    """
+    return ''.join(
+        ('\n' if '\n' in text else ' ') if text and not text.strip(_ASCII_SPACES) else text
+        for text in strings
+    ).strip()
+
+
+def _fund_isin(class_attr):
+    for name in (class_attr or '').split():
+        if name.startswith('INF'):
+            return name
+    return None
+
+
+def _chunks(source):
+    return [source] if isinstance(source, (bytes, str)) else source
+
+
+def _extract_lxml(source):
+    parser = etree.HTMLPullParser(events=('end',), tag='tr')
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        for _, row in parser.read_events():
+            isin = _fund_isin(row.get('class'))
+            if isin:
+                cells = [_cell_text(td.itertext()) for td in row.iter('td')]
+                if len(cells) >= len(RECORD_COLUMNS):
+                    yield typed_fund(isin, cells)
+            # Drop rows we have already seen so memory stays flat
+            row.clear()
+            while row.getprevious() is not None:
+                del row.getparent()[0]
+    parser.close()
+
+
+class _FundRowParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []
+        self._isin = None
+        self._cells = None
+        self._text = None
+        self._run = []
+
+    def _end_run(self):
+        # html.parser can split one text node across calls, so nodes end at tags
+        if self._run:
+            self._text.append(''.join(self._run))
+            self._run = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._text is not None:
+            self._end_run()
+        if tag == 'tr':
+            self._isin = _fund_isin(dict(attrs).get('class'))
+            self._cells = [] if self._isin else None
+        elif tag == 'td' and self._cells is not None:
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if self._text is not None:
+            self._end_run()
+        if tag == 'td' and self._text is not None:
+            self._cells.append(_cell_text(self._text))
+            self._text = None
+        elif tag == 'tr' and self._cells is not None:
+            if len(self._cells) >= len(RECORD_COLUMNS):
+                self.records.append(typed_fund(self._isin, self._cells))
+            self._isin = self._cells = None
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._run.append(data)
+
+
+def _extract_stdlib(source):
+    parser = _FundRowParser()
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in _chunks(source):
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from parser.records
+        parser.records.clear()
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.records
+
+
+def extract_funds(source, backend=None):
+    """Yield typed fund records from HTML given as bytes or an iterable of chunks.
+
+    ``backend`` is 'lxml' or 'html.parser'; by default lxml is used if installed.
+    """
+    backend = backend or ('lxml' if etree is not None else 'html.parser')
+    if backend == 'lxml':
+        return _extract_lxml(source)
+    return _extract_stdlib(source)
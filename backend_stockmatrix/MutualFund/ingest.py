@@ -0,0 +1,83 @@
+"""
+Turns scraped fund tables into typed FundSnapshot/MutualFund rows and reads
+them back for the API.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from backend_stockmatrix.response_cache import ResponseCache
+from .extractor import RECORD_COLUMNS
+from .models import FundSnapshot, MutualFund
+from .scraper import EQUITY_FUNDS_URL, FundParseError, ascrape_funds, fund_flight, scrape_funds
+
+logger = logging.getLogger(__name__)
+
+fund_cache = ResponseCache('mutual_funds')
+
+
+def ingest_funds(url=EQUITY_FUNDS_URL, keep=None):
+    """Scrape ``url`` once and store the result as a new snapshot."""
+    return store_funds(url, scrape_funds(url), keep)
+
+
+async def aingest_funds(url=EQUITY_FUNDS_URL, keep=None):
+    return await sync_to_async(store_funds)(url, await ascrape_funds(url), keep)
+
+
+def store_funds(url, funds, keep=None):
+    """Store ``funds`` as the latest snapshot of ``url``, keeping the newest ``keep`` snapshots.
+
+    An empty scrape (a captcha page, a changed table layout) raises
+    FundParseError instead, so the previous snapshot keeps serving and is
+    never pruned in favour of nothing.
+    """
+    if not funds:
+        raise FundParseError(f'No funds found at {url}')
+
+    with transaction.atomic():
+        snapshot = FundSnapshot.objects.create(source_url=url, fund_count=len(funds))
+        MutualFund.objects.bulk_create(
+            [MutualFund(snapshot=snapshot, **fund) for fund in funds],
+            batch_size=500,
+        )
+        if keep:
+            stale = FundSnapshot.objects.filter(source_url=url).values_list('id', flat=True)[keep:]
+            FundSnapshot.objects.filter(id__in=list(stale)).delete()
+
+    logger.info(f"Ingested {len(funds)} funds from {url} into snapshot {snapshot.id}")
+    return snapshot
+
+
+def latest_snapshot(url=EQUITY_FUNDS_URL):
+    return FundSnapshot.objects.filter(source_url=url).order_by('-fetched_at', '-id').first()
+
+
+def ensure_snapshot(url=EQUITY_FUNDS_URL):
+    """Latest snapshot, ingesting once (coalesced across requests) if none exists yet."""
+    snapshot = latest_snapshot(url)
+    if snapshot is None:
+        snapshot = fund_flight.do(f'ingest:{url}', lambda: latest_snapshot(url) or ingest_funds(url))
+    return snapshot
+
+
+async def aensure_snapshot(url=EQUITY_FUNDS_URL):
+    snapshot = await sync_to_async(latest_snapshot)(url)
+    if snapshot is None:
+        async def ingest():
+            return await sync_to_async(latest_snapshot)(url) or await aingest_funds(url)
+        snapshot = await fund_flight.ado(f'ingest:{url}', ingest)
+    return snapshot
+
+
+def fund_records(snapshot):
+    """API records for a snapshot; cached per snapshot id since snapshots never change."""
+    fields = [field for field, _ in RECORD_COLUMNS]
+    columns = [column for _, column in RECORD_COLUMNS]
+
+    def load():
+        rows = snapshot.funds.order_by('id').values_list(*fields)
+        return [dict(zip(columns, row)) for row in rows]
+
+    return fund_cache.get(f'snapshot:{snapshot.id}', load)
@@ -0,0 +1,134 @@
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from MutualFund.extractor import etree, extract_funds
+from MutualFund.synthetic import synthetic_fund_page
+
+
+def legacy_parse(content):
+    # The BeautifulSoup/DataFrame path MutualFundsView used before the extractor
+    soup = BeautifulSoup(content, 'html.parser')
+    rows = soup.find_all('tr', class_=lambda x: x and x.startswith('INF'))
+    
+    # Define lists to hold each attribute
+    scheme_names = []
+    plans = []
+    categories = []
+    crisil_ranks = []
+    aum_cr = []
+    one_weeks = []
+    one_months = []
+    three_months = []
+    six_months = []
+    ytds = []
+    one_years = []
+    two_years = []
+    three_years = []
+    five_years = []
+    ten_years = []
+    
+    for row in rows:
+        columns = row.find_all('td')
+        
+        if len(columns) < 15:  # Ensure there are enough columns
+            continue
+        
+        # Append the data to respective lists
+        scheme_names.append(columns[0].text.strip())
+        plans.append(columns[1].text.strip() if len(columns) > 1 else 'N/A')
+        categories.append(columns[2].text.strip() if len(columns) > 2 else 'N/A')
+        crisil_ranks.append(columns[3].text.strip() if len(columns) > 3 else 'N/A')
+        aum_cr.append(columns[4].text.strip() if len(columns) > 4 else 'N/A')
+        one_weeks.append(columns[5].text.strip() if len(columns) > 5 else 'N/A')
+        one_months.append(columns[6].text.strip() if len(columns) > 6 else 'N/A')
+        three_months.append(columns[7].text.strip() if len(columns) > 7 else 'N/A')
+        six_months.append(columns[8].text.strip() if len(columns) > 8 else 'N/A')
+        ytds.append(columns[9].text.strip() if len(columns) > 9 else 'N/A')
+        one_years.append(columns[10].text.strip() if len(columns) > 10 else 'N/A')
+        two_years.append(columns[11].text.strip() if len(columns) > 11 else 'N/A')
+        three_years.append(columns[12].text.strip() if len(columns) > 12 else 'N/A')
+        five_years.append(columns[13].text.strip() if len(columns) > 13 else 'N/A')
+        ten_years.append(columns[14].text.strip() if len(columns) > 14 else 'N/A')
+    
+    # Create a DataFrame with the data
+    return pd.DataFrame({
+        'Scheme Name': scheme_names,
+        'Plan': plans,
+        'Category Name': categories,
+        'Crisil Rank': crisil_ranks,
+        'AuM (Cr)': aum_cr,
+        '1W': one_weeks,
+        '1M': one_months,
+        '3M': three_months,
+        '6M': six_months,
+        'YTD': ytds,
+        '1Y': one_years,
+        '2Y': two_years,
+        '3Y': three_years,
+        '5Y': five_years,
+        '10Y': ten_years
+    })
+
+
+
+def run_legacy(content, chunk_size):
+    return len(legacy_parse(content))
+
+
+def stream_extractor(backend):
+    def run(content, chunk_size):
+        chunks = (content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+        return sum(1 for _ in extract_funds(chunks, backend=backend))
+    return run
+
+
+class Command(BaseCommand):
+    help = 'Compare the streaming fund extractor with the old BeautifulSoup path on saved HTML fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fixtures', nargs='*',
+            help='Saved moneycontrol pages (default: MutualFund/fixtures/html/*.html)',
+        )
+        parser.add_argument('--synthetic-rows', type=int, default=2000,
+                            help='Rows in the synthetic page used when no fixtures exist')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+
+    def handle(self, *args, **options):
+        paths = [Path(p) for p in options['fixtures']]
+        if not paths:
+            paths = sorted((Path(settings.BASE_DIR) / 'MutualFund' / 'fixtures' / 'html').glob('*.html'))
+
+        pages = [(path.name, path.read_bytes()) for path in paths]
+        if not pages:
+            rows = options['synthetic_rows']
+            pages = [(f'synthetic ({rows} rows)', synthetic_fund_page(rows))]
+
+        candidates = [('bs4 + DataFrame', run_legacy), ('html.parser stream', stream_extractor('html.parser'))]
+        if etree is not None:
+            candidates.append(('lxml stream', stream_extractor('lxml')))
+
+        for name, content in pages:
+            self.stdout.write(f'{name}: {len(content) / 1024:.0f} KiB')
+            for label, run in candidates:
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    count = run(content, options['chunk_size'])
+                    best = min(best, time.perf_counter() - started)
+
+                tracemalloc.start()
+                run(content, options['chunk_size'])
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f'  {label:<20} {best * 1000:9.1f} ms  {peak / 1024 / 1024:8.2f} MiB peak  {count} rows'
+                )
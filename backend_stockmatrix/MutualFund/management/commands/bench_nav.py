@@ -0,0 +1,67 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from MutualFund.nav import NAVPanel, NAVStore, load_nav_files, months_before
+from MutualFund.synthetic import synthetic_nav_report
+
+
+def loop_rolling_mean(navs, months):
+    # Reference: one scheme and one window at a time
+    dates, values = navs['date'], navs['nav']
+    windows = []
+    for end in range(len(dates)):
+        base = np.searchsorted(dates, months_before(dates[end], months), side='right') - 1
+        if base >= 0:
+            windows.append((values[end] / values[base]) ** (12 / months) - 1)
+    return np.mean(windows) * 100 if windows else np.nan
+
+
+class Command(BaseCommand):
+    help = 'Benchmark NAV loading and the vectorized NAV analytics on a synthetic AMFI NAV report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schemes', type=int, default=2000)
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--loop-schemes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            report = Path(directory) / 'navs.txt'
+            report.write_text(synthetic_nav_report(options['schemes'], options['years'], seed=1))
+            store = NAVStore(Path(directory) / 'navs')
+
+            started = time.perf_counter()
+            rows, _ = load_nav_files([report], store)
+            loaded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            panel = NAVPanel.from_store(store)
+            built = time.perf_counter() - started
+
+            started = time.perf_counter()
+            records = panel.analytics(window_months=36)
+            computed = time.perf_counter() - started
+
+        n_schemes = len(panel.schemes)
+        self.stdout.write(f'schemes: {n_schemes}, NAV rows: {rows:,}, calendar: {len(panel.dates)} dates')
+        self.stdout.write(f'load report:     {loaded * 1000:9.1f} ms total, {loaded / rows * 1e6:8.2f} us/row')
+        self.stdout.write(f'build panel:     {built * 1000:9.1f} ms total')
+        self.stdout.write(f'analytics:       {computed * 1000:9.1f} ms total, {computed / n_schemes * 1e6:8.2f} us/scheme')
+
+        n_loop = min(options['loop_schemes'], n_schemes)
+        if n_loop:
+            started = time.perf_counter()
+            expected = [loop_rolling_mean(panel.histories[row], 36) for row in range(n_loop)]
+            looped = time.perf_counter() - started
+            difference = max(
+                abs(record['rolling_mean'] - value)
+                for record, value in zip(records[:n_loop], expected) if record['rolling_mean'] is not None
+            )
+            self.stdout.write(
+                f'rolling 3Y loop: {looped * 1000:9.1f} ms for {n_loop} schemes, '
+                f'{looped / n_loop * 1e6:8.2f} us/scheme (max difference {difference:.2e} pp)'
+            )
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from backend_stockmatrix.conditional import make_etag
+from backend_stockmatrix.renderers import FastJSONRenderer, orjson
+from MutualFund.extractor import RECORD_COLUMNS, extract_funds
+from MutualFund.synthetic import synthetic_fund_page
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering the mutual funds payload against answering a conditional GET'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        funds = list(extract_funds([synthetic_fund_page(options['rows'])]))
+        payload = {'data': [{column: fund[field] for field, column in RECORD_COLUMNS} for fund in funds]}
+        repeat = options['repeat']
+
+        drf = best_of(lambda: JSONRenderer().render(payload), repeat)
+        fast = best_of(lambda: FastJSONRenderer().render(payload), repeat)
+        etag = best_of(lambda: make_etag('funds', 1, [('limit', ['50'])]), repeat * 100)
+        size = len(FastJSONRenderer().render(payload))
+
+        self.stdout.write(f"{len(funds)} funds, {size / 1024:.0f} KiB of JSON")
+        self.stdout.write(f'JSONRenderer:             {drf * 1000:8.2f} ms')
+        self.stdout.write(
+            f"FastJSONRenderer:         {fast * 1000:8.2f} ms ({drf / fast:.1f}x, "
+            f"{'orjson' if orjson else 'stdlib fallback'})"
+        )
+        self.stdout.write(f'ETag for a 304:           {etag * 1e6:8.2f} us')
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from MutualFund.sip import monte_carlo, parse_grid, project
+
+
+def month_loop(monthly, annual_return, years, inflation):
+    # Reference: the frontend calculator's month-by-month loop, one scenario at a time
+    monthly_rate = annual_return / 12 / 100
+    monthly_inflation = inflation / 12 / 100
+    future_value = 0
+    yearly = []
+    for month in range(1, years * 12 + 1):
+        future_value = (future_value + monthly) * (1 + monthly_rate)
+        inflation_adjusted = future_value / (1 + monthly_inflation) ** month
+        if month % 12 == 0:
+            yearly.append((future_value, inflation_adjusted))
+    return yearly
+
+
+class Command(BaseCommand):
+    help = 'Benchmark closed-form SIP scenario grids against the month-by-month loop, and Monte Carlo bands'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investments', type=int, default=100)
+        parser.add_argument('--returns', type=int, default=100)
+        parser.add_argument('--years', type=int, default=20)
+        parser.add_argument('--paths', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        years = options['years']
+        grid = parse_grid({
+            'monthlyInvestment': list(np.linspace(1000, 50000, options['investments'])),
+            'annualReturn': list(np.linspace(4, 20, options['returns'])),
+            'years': years,
+        })
+        n_scenarios = len(grid['years'])
+
+        started = time.perf_counter()
+        project(grid)
+        totals_only = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scenarios = project(grid, yearly=True)
+        closed_form = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reference = [
+            month_loop(monthly, annual_return, years, 6)
+            for monthly, annual_return in zip(grid['monthlyInvestment'], grid['annualReturn'])
+        ]
+        looped = time.perf_counter() - started
+
+        error = max(
+            abs(scenario['futureValue'] - expected[-1][0]) / expected[-1][0]
+            for scenario, expected in zip(scenarios, reference)
+        )
+        self.stdout.write(f'scenarios: {n_scenarios}, {years} years each')
+        self.stdout.write(f'closed-form grid, totals: {totals_only * 1000:8.1f} ms total, {totals_only / n_scenarios * 1e6:8.2f} us/scenario')
+        self.stdout.write(f'closed-form grid, yearly: {closed_form * 1000:8.1f} ms total, {closed_form / n_scenarios * 1e6:8.2f} us/scenario')
+        self.stdout.write(f'month loop, yearly:       {looped * 1000:8.1f} ms total, {looped / n_scenarios * 1e6:8.2f} us/scenario')
+        self.stdout.write(f'max relative difference in future value: {error:.2e}')
+
+        for mc_years in sorted({10, years, 30}):
+            started = time.perf_counter()
+            result = monte_carlo(5000, 12, 15, mc_years, inflation=6, paths=options['paths'], seed=1)
+            took = time.perf_counter() - started
+            final = result['final']
+            self.stdout.write(
+                f"monte carlo {result['paths']} paths x {mc_years:2d} years: {took * 1000:8.1f} ms "
+                f"(p5 {final['p5']:,.0f}, p50 {final['p50']:,.0f}, p95 {final['p95']:,.0f})"
+            )
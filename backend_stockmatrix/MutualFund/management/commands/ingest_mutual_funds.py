@@ -0,0 +1,28 @@
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from MutualFund.ingest import ingest_funds
+from MutualFund.scraper import EQUITY_FUNDS_URL, FundParseError
+
+
+class Command(BaseCommand):
+    help = (
+        'Scrape the moneycontrol fund listing once and store it as a new snapshot. '
+        'Run it from cron or a systemd timer, e.g. every 30 minutes during market hours.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=EQUITY_FUNDS_URL)
+        parser.add_argument('--keep', type=int, default=30, help='Number of snapshots to retain (0 keeps all)')
+
+    def handle(self, *args, **options):
+        try:
+            snapshot = ingest_funds(options['url'], keep=options['keep'])
+        except requests.exceptions.RequestException as e:
+            raise CommandError(f'Request failed: {str(e)}')
+        except FundParseError as e:
+            raise CommandError(f'Error parsing the data: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored snapshot {snapshot.id} with {snapshot.fund_count} funds'
+        ))
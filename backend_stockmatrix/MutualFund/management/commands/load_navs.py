@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from MutualFund.nav import load_nav_files
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-load NAV history from local files into the NAV store: AMFI NAVAll.txt, '
+        'AMFI historical NAV reports, or scheme,date,nav CSV. Rows already stored are replaced.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+
+    def handle(self, *args, **options):
+        try:
+            rows, changed = load_nav_files(options['paths'])
+        except OSError as e:
+            raise CommandError(f'Could not read NAV file: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Read {rows} NAVs; {len(changed)} schemes changed'))
@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_url', models.URLField(max_length=255)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('fund_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MutualFund',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('isin', models.CharField(blank=True, max_length=20)),
+                ('scheme_name', models.CharField(max_length=255)),
+                ('plan', models.CharField(max_length=50)),
+                ('category_name', models.CharField(max_length=100)),
+                ('crisil_rank', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('aum_cr', models.FloatField(blank=True, null=True)),
+                ('return_1w', models.FloatField(blank=True, null=True)),
+                ('return_1m', models.FloatField(blank=True, null=True)),
+                ('return_3m', models.FloatField(blank=True, null=True)),
+                ('return_6m', models.FloatField(blank=True, null=True)),
+                ('return_ytd', models.FloatField(blank=True, null=True)),
+                ('return_1y', models.FloatField(blank=True, null=True)),
+                ('return_2y', models.FloatField(blank=True, null=True)),
+                ('return_3y', models.FloatField(blank=True, null=True)),
+                ('return_5y', models.FloatField(blank=True, null=True)),
+                ('return_10y', models.FloatField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='funds', to='MutualFund.fundsnapshot')),
+            ],
+        ),
+    ]
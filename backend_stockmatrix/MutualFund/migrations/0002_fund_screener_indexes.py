@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MutualFund', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'category_name'], name='fund_snapshot_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'plan'], name='fund_snapshot_plan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'crisil_rank'], name='fund_snapshot_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'aum_cr'], name='fund_snapshot_aum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'return_1y'], name='fund_snapshot_return_1y_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'return_3y'], name='fund_snapshot_return_3y_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mutualfund',
+            index=models.Index(fields=['snapshot', 'return_5y'], name='fund_snapshot_return_5y_idx'),
+        ),
+    ]
@@ -1,3 +1,49 @@
 from django.db import models
 
-# Create your models here.
+
+class FundSnapshot(models.Model):
+    """One ingestion run of a moneycontrol fund listing."""
+    source_url = models.URLField(max_length=255)
+    fetched_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    fund_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-fetched_at']
+
+    def __str__(self):
+        return f'{self.source_url} @ {self.fetched_at:%Y-%m-%d %H:%M}'
+
+
+class MutualFund(models.Model):
+    snapshot = models.ForeignKey(FundSnapshot, related_name='funds', on_delete=models.CASCADE)
+    isin = models.CharField(max_length=20, blank=True)
+    scheme_name = models.CharField(max_length=255)
+    plan = models.CharField(max_length=50)
+    category_name = models.CharField(max_length=100)
+    crisil_rank = models.PositiveSmallIntegerField(null=True, blank=True)
+    aum_cr = models.FloatField(null=True, blank=True)
+    return_1w = models.FloatField(null=True, blank=True)
+    return_1m = models.FloatField(null=True, blank=True)
+    return_3m = models.FloatField(null=True, blank=True)
+    return_6m = models.FloatField(null=True, blank=True)
+    return_ytd = models.FloatField(null=True, blank=True)
+    return_1y = models.FloatField(null=True, blank=True)
+    return_2y = models.FloatField(null=True, blank=True)
+    return_3y = models.FloatField(null=True, blank=True)
+    return_5y = models.FloatField(null=True, blank=True)
+    return_10y = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        # Screener queries always filter on one snapshot first
+        indexes = [
+            models.Index(fields=['snapshot', 'category_name'], name='fund_snapshot_category_idx'),
+            models.Index(fields=['snapshot', 'plan'], name='fund_snapshot_plan_idx'),
+            models.Index(fields=['snapshot', 'crisil_rank'], name='fund_snapshot_rank_idx'),
+            models.Index(fields=['snapshot', 'aum_cr'], name='fund_snapshot_aum_idx'),
+            models.Index(fields=['snapshot', 'return_1y'], name='fund_snapshot_return_1y_idx'),
+            models.Index(fields=['snapshot', 'return_3y'], name='fund_snapshot_return_3y_idx'),
+            models.Index(fields=['snapshot', 'return_5y'], name='fund_snapshot_return_5y_idx'),
+        ]
+
+    def __str__(self):
+        return self.scheme_name
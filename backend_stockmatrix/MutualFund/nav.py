@@ -0,0 +1,576 @@
+"""
+NAV history per scheme, and return and risk analytics computed for every
+scheme at once.
+
+``NAVStore`` keeps one ``<scheme>.npy`` array of ``(date, nav)`` per scheme
+under ``NAV_HISTORY['STORE_DIR']``.  Schemes are keyed by ISIN (the key the
+fund listing uses), falling back to the AMFI scheme code.  ``load_nav_files``
+bulk-loads local files:
+
+* AMFI's daily ``NAVAll.txt``
+* the AMFI historical NAV report
+* plain ``scheme,date,nav[,name]`` CSV
+
+A load that changes any history bumps the store's version.
+
+``NAVPanel`` puts every scheme on one shared calendar of NAV dates.  It
+computes each metric for CHUNK_SCHEMES schemes at a time with array
+operations.  Each scheme is measured as of its own latest NAV:
+
+* trailing returns (1W to 10Y), annualized beyond a year, like the listing
+* rolling returns over a window sampled at every NAV date: mean, median,
+  min, max and the share of negative windows
+* the XIRR and absolute return of a monthly SIP over the last ``sip_years``
+* CAGR, annualized volatility, Sharpe and Sortino ratios and maximum
+  drawdown over the last ``risk_years``
+
+The panel is rebuilt, and cached analytics recomputed, only when the store
+version changes, i.e. when new NAVs arrive.
+"""
+import csv
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import warnings
+from contextlib import ExitStack
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from backend_stockmatrix.response_cache import ResponseCache
+from .sip import solve_rates
+
+logger = logging.getLogger(__name__)
+
+NAV_DTYPE = np.dtype([('date', 'datetime64[D]'), ('nav', 'f8')])
+
+DEFAULTS = {
+    'STORE_DIR': 'market_data/navs',
+}
+
+TRADING_DAYS = 252
+CHUNK_SCHEMES = 512
+MAX_YEARS = 10
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Below this annualized volatility Sharpe and Sortino ratios are rounding noise or infinite
+MIN_VOLATILITY = 1e-9
+TRAILING_MONTHS = {'1m': 1, '3m': 3, '6m': 6, '1y': 12, '2y': 24, '3y': 36, '5y': 60, '10y': 120}
+EPOCH = date(1970, 1, 1)
+DATE_FORMATS = ('%d-%b-%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y')
+
+# Normalized header name -> column role, for AMFI downloads and plain CSV
+COLUMN_ROLES = {
+    'schemecode': 'code',
+    'scheme': 'code',
+    'isin': 'isin',
+    'isingrowth': 'isin',
+    'isindivpayoutisingrowth': 'isin',
+    'isindivreinvestment': 'isin_reinvestment',
+    'schemename': 'name',
+    'name': 'name',
+    'netassetvalue': 'nav',
+    'nav': 'nav',
+    'date': 'date',
+}
+
+SORTABLE_FIELDS = (
+    {'scheme', 'name', 'nav'}
+    | {f'return_{key}' for key in ('1w', 'ytd', *TRAILING_MONTHS)}
+    | {'rolling_mean', 'rolling_median', 'rolling_min', 'rolling_max', 'rolling_negative', 'rolling_windows'}
+    | {'sip_xirr', 'sip_return', 'cagr', 'volatility', 'sharpe', 'sortino', 'max_drawdown'}
+)
+
+_DIGIT = re.compile(r'\d')
+_ISIN = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}\d$')
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+_WINDOW = re.compile(r'^(\d+)([MY])$')
+
+nav_cache = ResponseCache('nav_analytics')
+
+
+def nav_setting(name):
+    value = getattr(settings, 'NAV_HISTORY', {}).get(name, DEFAULTS[name])
+    if name.endswith('_DIR'):
+        return Path(settings.BASE_DIR) / value
+    return value
+
+
+class NAVError(ValueError):
+    pass
+
+
+def empty_navs():
+    return np.empty(0, dtype=NAV_DTYPE)
+
+
+def merge_navs(existing, fresh):
+    """Union of two histories sorted by date; ``fresh`` wins where both have a date."""
+    combined = np.concatenate([existing, fresh])
+    combined = combined[np.argsort(combined['date'], kind='stable')]
+    keep = np.append(combined['date'][1:] != combined['date'][:-1], True)
+    return combined[keep]
+
+
+def _header(line):
+    # (roles, delimiter, width) if ``line`` is a NAV file header
+    for delimiter in (';', ',', '\t'):
+        names = [re.sub(r'[^a-z]', '', name.lower()) for name in line.split(delimiter)]
+        roles = {COLUMN_ROLES[name]: index for index, name in enumerate(names) if name in COLUMN_ROLES}
+        if {'nav', 'date'} <= roles.keys() and roles.keys() & {'code', 'isin'}:
+            return roles, delimiter, max(roles.values()) + 1
+    return None
+
+
+def _scheme_key(fields, roles):
+    for role in ('isin', 'isin_reinvestment'):
+        if role in roles and _ISIN.match(fields[roles[role]].strip()):
+            return fields[roles[role]].strip()
+    if 'code' in roles:
+        return _UNSAFE.sub('', fields[roles['code']].strip())
+    return ''
+
+
+def _parse_day(text):
+    # Days since the epoch, or None
+    for date_format in DATE_FORMATS:
+        try:
+            return (datetime.strptime(text, date_format).date() - EPOCH).days
+        except ValueError:
+            pass
+    return None
+
+
+class NAVRows:
+    """Parsed NAV rows as columns; ``ids`` index into ``schemes``."""
+
+    def __init__(self, schemes, names, ids, days, navs):
+        self.schemes = schemes
+        self.names = names
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int64).view('datetime64[D]')
+        self.navs = np.asarray(navs, dtype=float)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def grouped(self):
+        """``(scheme, navs)`` per scheme, rows in file order."""
+        order = np.argsort(self.ids, kind='stable')
+        ids = self.ids[order]
+        bounds = np.flatnonzero(np.diff(ids)) + 1
+        for rows in np.split(order, bounds) if len(order) else ():
+            navs = np.empty(len(rows), dtype=NAV_DTYPE)
+            navs['date'], navs['nav'] = self.days[rows], self.navs[rows]
+            yield self.schemes[self.ids[rows[0]]], navs
+
+
+def parse_nav_lines(lines):
+    """Parse the lines of one or more NAV files into ``NAVRows``.
+
+    Every header line sets the column layout for the lines after it.  Lines
+    before the first header, AMC and category headings, and rows without a
+    numeric NAV (AMFI prints ``N.A.``) are skipped.  Scheme keys and dates
+    repeat on many rows, so each distinct value is resolved only once.
+    """
+    roles = None
+    delimiter, width = ';', 0
+    scheme_ids, names, keys, days = {}, {}, {}, {}
+    ids, row_days, navs = [], [], []
+    for line in lines:
+        fields = line.split(delimiter)
+        try:
+            if roles is None or len(fields) < width:
+                raise ValueError
+            if delimiter != ';' and '"' in line:
+                fields = next(csv.reader([line], delimiter=delimiter))
+            nav = float(fields[nav_column])
+        except ValueError:
+            # Headers, headings, blank lines and N.A. NAVs
+            header = _header(line.strip()) if line.strip() and not _DIGIT.search(line) else None
+            if header:
+                roles, delimiter, width = header
+                nav_column, date_column = roles['nav'], roles['date']
+                key_column = roles['code'] if 'code' in roles else roles['isin']
+                keys = {}
+            continue
+
+        text = fields[date_column]
+        day = days.get(text)
+        if day is None:
+            day = days[text] = _parse_day(text.strip())
+        key = fields[key_column]
+        scheme_id = keys.get(key)
+        if scheme_id is None:
+            scheme = _scheme_key(fields, roles)
+            scheme_id = keys[key] = scheme_ids.setdefault(scheme, len(scheme_ids)) if scheme else -1
+            name = fields[roles['name']].strip() if 'name' in roles else ''
+            if scheme and name:
+                names[scheme] = name
+        if day is not None and nav > 0 and scheme_id >= 0:
+            ids.append(scheme_id)
+            row_days.append(day)
+            navs.append(nav)
+
+    return NAVRows(list(scheme_ids), names, ids, row_days, navs)
+
+
+class NAVStore:
+    """Persistent per-scheme NAV histories."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def _path(self, scheme):
+        return self.directory / f'{scheme}.npy'
+
+    def _write_atomic(self, path, data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            if isinstance(data, np.ndarray):
+                np.save(f, data)
+            else:
+                f.write(data)
+        os.replace(tmp_path, path)
+
+    def schemes(self):
+        if not self.directory.exists():
+            return []
+        return sorted(path.stem for path in self.directory.glob('*.npy'))
+
+    def read(self, scheme):
+        if not scheme or _UNSAFE.search(scheme):
+            return empty_navs()
+        try:
+            return np.load(self._path(scheme), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return empty_navs()
+
+    def read_names(self):
+        try:
+            with open(self.directory / 'names.json') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def version(self):
+        """Changes whenever a load changes any scheme's history or name."""
+        try:
+            return (self.directory / 'VERSION').read_text().strip()
+        except FileNotFoundError:
+            return '0'
+
+    def load(self, rows):
+        """Merge parsed ``NAVRows`` into the store; returns the schemes whose history changed."""
+        changed = []
+        with self._lock:
+            for scheme, fresh in rows.grouped():
+                existing = self.read(scheme)
+                merged = merge_navs(existing, fresh)
+                if not np.array_equal(merged, existing):
+                    self._write_atomic(self._path(scheme), merged)
+                    changed.append(scheme)
+
+            stored_names = self.read_names()
+            renamed = any(stored_names.get(scheme) != name for scheme, name in rows.names.items())
+            if renamed:
+                self._write_atomic(self.directory / 'names.json', json.dumps(dict(stored_names, **rows.names)).encode())
+            if changed or renamed:
+                self._write_atomic(self.directory / 'VERSION', str(time.time_ns()).encode())
+
+        logger.info(f"Loaded {len(rows)} NAVs; {len(changed)} of {len(rows.schemes)} schemes changed")
+        return changed
+
+
+def load_nav_files(paths, store=None):
+    """Bulk-load local NAV files into the store; returns ``(rows, changed schemes)``."""
+    store = store or get_nav_store()
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(path, encoding='utf-8', errors='replace')) for path in paths]
+        rows = parse_nav_lines(itertools.chain.from_iterable(files))
+    return len(rows), store.load(rows)
+
+
+def months_before(days, months):
+    """``days`` moved back by whole calendar months, clamped to the end of shorter months."""
+    days = np.asarray(days, dtype='datetime64[D]')
+    month = days.astype('datetime64[M]')
+    target = (month - months).astype('datetime64[D]') + (days - month.astype('datetime64[D]'))
+    return np.minimum(target, (month - months + 1).astype('datetime64[D]') - 1)
+
+
+def parse_window(value):
+    """Months in a window such as ``3Y`` or ``6M``."""
+    match = _WINDOW.match(str(value).strip().upper())
+    months = int(match.group(1)) * (12 if match.group(2) == 'Y' else 1) if match else 0
+    if not 1 <= months <= 12 * MAX_YEARS:
+        raise NAVError(f'window must look like 6M or 3Y and be at most {MAX_YEARS}Y')
+    return months
+
+
+def _number(params, name, default, minimum, maximum, cast=float):
+    try:
+        value = cast(params.get(name) or default)
+    except ValueError:
+        raise NAVError(f'{name} must be a number')
+    if not minimum <= value <= maximum:
+        raise NAVError(f'{name} must be between {minimum:g} and {maximum:g}')
+    return value
+
+
+def parse_analytics_params(params):
+    """``(options, schemes, sort_keys, limit)`` from query parameters.
+
+    ``window`` (default 3Y), ``sip_years`` (5), ``risk_years`` (3) and
+    ``risk_free`` (percent, 6) select the analytics; ``schemes`` (comma
+    separated), ``sort`` (``-`` prefix for descending, nulls last) and
+    ``limit`` select the records.
+    """
+    options = {
+        'window_months': parse_window(params.get('window') or '3Y'),
+        'sip_years': _number(params, 'sip_years', 5, 1, MAX_YEARS, int),
+        'risk_years': _number(params, 'risk_years', 3, 1, MAX_YEARS, int),
+        'risk_free': _number(params, 'risk_free', 6, -10, 50) / 100,
+    }
+    schemes = [scheme.strip() for scheme in params.get('schemes', '').split(',') if scheme.strip()]
+    sort_keys = []
+    for part in params.get('sort', '').split(','):
+        field = part.strip().lstrip('-')
+        if field and field not in SORTABLE_FIELDS:
+            raise NAVError(f'Cannot sort by {field}')
+        if field:
+            sort_keys.append((field, part.strip().startswith('-')))
+    limit = _number(params, 'limit', DEFAULT_LIMIT, 1, MAX_LIMIT, int)
+    return options, schemes, sort_keys, limit
+
+
+def select_records(records, schemes=None, sort_keys=(), limit=DEFAULT_LIMIT):
+    if schemes:
+        wanted = set(schemes)
+        records = [record for record in records if record['scheme'] in wanted]
+    # Stable sorts from the last key to the first give a multi-key order
+    for field, descending in reversed(sort_keys):
+        present = [record for record in records if record[field] is not None]
+        missing = [record for record in records if record[field] is None]
+        records = sorted(present, key=lambda record: record[field], reverse=descending) + missing
+    return records[:limit]
+
+
+def _percent(values, digits=4):
+    return [None if np.isnan(value) else round(float(value) * 100, digits) for value in values]
+
+
+class NAVPanel:
+    """Every stored scheme's NAVs on one shared calendar of NAV dates."""
+
+    def __init__(self, histories, names=None, version=None):
+        self.schemes = [scheme for scheme, navs in histories.items() if len(navs)]
+        self.histories = [histories[scheme] for scheme in self.schemes]
+        self.names = names or {}
+        self.version = version
+        if not self.histories:
+            self.dates = np.empty(0, dtype='datetime64[D]')
+            return
+
+        # A date is on the calendar if any scheme has a NAV for it
+        origin = min(navs['date'][0] for navs in self.histories)
+        span = (max(navs['date'][-1] for navs in self.histories) - origin).astype(int) + 1
+        present = np.zeros(span, dtype=bool)
+        for navs in self.histories:
+            present[(navs['date'] - origin).astype(int)] = True
+        self.dates = origin + np.flatnonzero(present)
+        self._column = np.cumsum(present) - 1
+        self._origin = origin
+
+    @classmethod
+    def from_store(cls, store):
+        version = store.version()
+        # Copied out of the memory maps so the panel does not hold a file open per scheme
+        return cls({scheme: np.array(store.read(scheme)) for scheme in store.schemes()}, store.read_names(), version)
+
+    def matrix(self, rows):
+        """Forward-filled ``(len(rows), len(dates))`` NAVs and the mask of observed NAVs.
+
+        Values before a scheme's first NAV stay NaN.
+        """
+        observed = np.zeros((len(rows), len(self.dates)), dtype=bool)
+        values = np.full(observed.shape, np.nan)
+        for offset, row in enumerate(rows):
+            navs = self.histories[row]
+            columns = self._column[(navs['date'] - self._origin).astype(int)]
+            values[offset, columns] = navs['nav']
+            observed[offset, columns] = True
+        index = np.where(observed, np.arange(len(self.dates)), 0)
+        np.maximum.accumulate(index, axis=1, out=index)
+        return values[np.arange(len(rows))[:, None], index], observed
+
+    def history(self, scheme):
+        try:
+            return self.histories[self.schemes.index(scheme)]
+        except ValueError:
+            return empty_navs()
+
+    def _on_or_before(self, days):
+        return np.searchsorted(self.dates, days, side='right') - 1
+
+    def _trailing(self, values, first, last):
+        rows = np.arange(len(values))
+        as_of = self.dates[last]
+        targets = {'1w': as_of - 7, 'ytd': as_of.astype('datetime64[Y]').astype('datetime64[D]') - 1}
+        targets.update({key: months_before(as_of, months) for key, months in TRAILING_MONTHS.items()})
+
+        returns = {}
+        for key in ('1w', '1m', '3m', '6m', 'ytd', '1y', '2y', '3y', '5y', '10y'):
+            base = self._on_or_before(targets[key])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ratio = np.where(base >= first, values[rows, last] / values[rows, np.maximum(base, 0)], np.nan)
+                months = TRAILING_MONTHS.get(key, 0)
+                returns[f'return_{key}'] = ratio ** (12 / months) - 1 if months > 12 else ratio - 1
+        return returns
+
+    def _rolling(self, values, first, last, months):
+        base = self._on_or_before(months_before(self.dates, months))
+        columns = np.arange(len(self.dates))
+        valid = (base[None, :] >= first[:, None]) & (columns[None, :] <= last[:, None])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = values / values[:, np.maximum(base, 0)]
+            windows = ratio ** (12 / months) - 1 if months > 12 else ratio - 1
+        windows[~valid] = np.nan
+
+        count = valid.sum(axis=1)
+        with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+            # Schemes younger than the window have no windows at all
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return {
+                'rolling_mean': np.nanmean(windows, axis=1),
+                'rolling_median': np.nanmedian(windows, axis=1),
+                'rolling_min': np.nanmin(windows, axis=1),
+                'rolling_max': np.nanmax(windows, axis=1),
+                'rolling_negative': np.where(count > 0, (windows < 0).sum(axis=1) / np.maximum(count, 1), np.nan),
+            }, count
+
+    def _sip(self, values, first, last, years):
+        # One unit invested at the first NAV on or after the same day of each month
+        rows = np.arange(len(values))
+        installments = 12 * years
+        targets = months_before(self.dates[last][:, None], installments - np.arange(installments)[None, :])
+        index = np.minimum(np.searchsorted(self.dates, targets, side='left'), len(self.dates) - 1)
+        valid = targets[:, 0] >= self.dates[first]
+
+        units = (1 / np.take_along_axis(values, index, axis=1)).sum(axis=1)
+        final = np.where(valid, units * values[rows, last], np.nan)
+        flow_dates = np.concatenate([self.dates[index], self.dates[last][:, None]], axis=1)
+        times = (flow_dates - flow_dates[:, :1]).astype(float) / 365
+        flows = np.concatenate([np.full((len(values), installments), -1.0), final[:, None]], axis=1)
+        flows[~valid] = np.nan
+
+        rates = np.full(len(values), np.nan)
+        if valid.any():
+            rates[valid] = solve_rates(times[valid], flows[valid])
+        return {'sip_xirr': rates, 'sip_return': final / installments - 1}
+
+    def _risk(self, values, observed, first, last, years, risk_free):
+        rows = np.arange(len(values))
+        base = self._on_or_before(months_before(self.dates[last], 12 * years))
+        valid = base >= first
+        columns = np.arange(len(self.dates))
+        in_window = (columns[None, :] >= base[:, None]) & (columns[None, :] <= last[:, None])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            span_years = (self.dates[last] - self.dates[np.maximum(base, 0)]).astype(float) / 365.25
+            cagr = (values[rows, last] / values[rows, np.maximum(base, 0)]) ** (1 / span_years) - 1
+
+            # Daily log returns ending on the scheme's own NAV dates inside the window
+            log_returns = np.diff(np.log(values), axis=1)
+            mask = in_window[:, :-1] & in_window[:, 1:] & observed[:, 1:] & ~np.isnan(log_returns)
+            log_returns = np.where(mask, log_returns, 0.0)
+            count = mask.sum(axis=1)
+            mean = log_returns.sum(axis=1) / count
+            variance = ((log_returns - mean[:, None]) ** 2 * mask).sum(axis=1) / (count - 1)
+            volatility = np.sqrt(variance * TRADING_DAYS)
+            downside = np.sqrt((np.minimum(log_returns, 0) ** 2).sum(axis=1) / count * TRADING_DAYS)
+
+            window_values = np.where(in_window, values, np.nan)
+            drawdown = window_values / np.fmax.accumulate(window_values, axis=1) - 1
+            max_drawdown = np.nanmin(np.where(np.isnan(drawdown), np.inf, drawdown), axis=1)
+
+            excess = cagr - risk_free
+            risk = {
+                'cagr': cagr,
+                'volatility': volatility,
+                'sharpe': np.where(volatility > MIN_VOLATILITY, excess / volatility, np.nan),
+                'sortino': np.where(downside > MIN_VOLATILITY, excess / downside, np.nan),
+                'max_drawdown': max_drawdown,
+            }
+        return {name: np.where(valid & (count > 1), metric, np.nan) for name, metric in risk.items()}
+
+    def analytics(self, window_months=36, sip_years=5, risk_years=3, risk_free=0.06):
+        """One record per scheme; returns and risk figures are percentages."""
+        records = []
+        ratios = {'sharpe', 'sortino'}
+        for offset in range(0, len(self.schemes), CHUNK_SCHEMES):
+            rows = range(offset, min(offset + CHUNK_SCHEMES, len(self.schemes)))
+            values, observed = self.matrix(rows)
+            first = observed.argmax(axis=1)
+            last = observed.shape[1] - 1 - observed[:, ::-1].argmax(axis=1)
+
+            metrics = self._trailing(values, first, last)
+            rolling, windows = self._rolling(values, first, last, window_months)
+            metrics.update(rolling)
+            metrics.update(self._sip(values, first, last, sip_years))
+            metrics.update(self._risk(values, observed, first, last, risk_years, risk_free))
+            columns = {
+                name: [None if np.isnan(value) else round(float(value), 4) for value in metric]
+                if name in ratios else _percent(metric)
+                for name, metric in metrics.items()
+            }
+
+            for position, row in enumerate(rows):
+                scheme = self.schemes[row]
+                record = {
+                    'scheme': scheme,
+                    'name': self.names.get(scheme, ''),
+                    'asOf': str(self.dates[last[position]]),
+                    'nav': float(values[position, last[position]]),
+                }
+                record.update({name: column[position] for name, column in columns.items()})
+                record['rolling_windows'] = int(windows[position])
+                records.append(record)
+        return records
+
+
+@lru_cache(maxsize=None)
+def get_nav_store():
+    return NAVStore(nav_setting('STORE_DIR'))
+
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def get_nav_panel():
+    """The process-wide panel, rebuilt when the store version changes."""
+    global _panel
+    store = get_nav_store()
+    with _panel_lock:
+        if _panel is None or _panel.version != store.version():
+            started = time.perf_counter()
+            _panel = NAVPanel.from_store(store)
+            logger.info(f"Built NAV panel of {len(_panel.schemes)} schemes in {time.perf_counter() - started:.2f}s")
+        return _panel
+
+
+def nav_analytics(window_months=36, sip_years=5, risk_years=3, risk_free=0.06):
+    """Analytics for every scheme, cached per store version."""
+    panel = get_nav_panel()
+    key = f'{panel.version}:{window_months}:{sip_years}:{risk_years}:{risk_free:g}'
+    return panel, nav_cache.get(key, lambda: panel.analytics(window_months, sip_years, risk_years, risk_free))
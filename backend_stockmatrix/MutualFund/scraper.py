@@ -0,0 +1,59 @@
+"""
+Downloads the moneycontrol best-funds page and extracts its fund rows.
+"""
+import asyncio
+
+import requests
+
+from backend_stockmatrix.singleflight import SingleFlight
+from backend_stockmatrix.upstream import get_upstream
+from .extractor import extract_funds
+
+EQUITY_FUNDS_URL = "https://www.moneycontrol.com/mutual-funds/best-funds/equity.html"
+
+fund_flight = SingleFlight('mutual_funds')
+
+
+class FundParseError(Exception):
+    pass
+
+
+def stream_page(url, chunk_size=64 * 1024):
+    with get_upstream(url).get(url, stream=True) as response:
+        yield from response.iter_content(chunk_size)
+
+
+def scrape_funds(url=EQUITY_FUNDS_URL):
+    """Stream ``url`` through the fund extractor; concurrent callers share one scrape.
+
+    Request failures propagate as ``requests.exceptions.RequestException`` so
+    callers can tell them apart from parse errors.
+    """
+    def scrape():
+        try:
+            return list(extract_funds(stream_page(url)))
+        except requests.exceptions.RequestException:
+            raise
+        except Exception as e:
+            raise FundParseError(str(e)) from e
+
+    return fund_flight.do(url, scrape)
+
+
+async def ascrape_funds(url=EQUITY_FUNDS_URL):
+    """Async variant of ``scrape_funds``; request failures propagate as ``UPSTREAM_ERRORS``.
+
+    The page is downloaded with the pooled async client and parsed in a thread
+    so the event loop stays free while lxml works.
+    """
+    async def read(response):
+        return [chunk async for chunk in response.content.iter_chunked(64 * 1024)]
+
+    async def scrape():
+        chunks = await get_upstream(url).afetch(url, read)
+        try:
+            return await asyncio.to_thread(lambda: list(extract_funds(chunks)))
+        except Exception as e:
+            raise FundParseError(str(e)) from e
+
+    return await fund_flight.ado(url, scrape)
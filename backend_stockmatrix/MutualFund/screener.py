@@ -0,0 +1,153 @@
+"""
+Server-side filtering, multi-key sorting and keyset (cursor) pagination of
+the funds in a snapshot.
+
+Query parameters:
+
+* ``category``, ``plan``: comma-separated exact values
+* ``crisil_rank``: comma-separated ranks, ``crisil_rank_min``/``crisil_rank_max``
+* ``<field>_min`` / ``<field>_max`` for ``aum_cr`` and every ``return_*`` field
+* ``sort``: comma-separated fields, ``-`` prefix for descending (nulls sort last)
+* ``limit`` (default 50, max 500) and ``cursor`` from the previous page's ``next``
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import F, Q
+
+from .extractor import NUMERIC_FIELDS, RECORD_COLUMNS
+from .models import MutualFund
+
+SORTABLE_FIELDS = {field for field, _ in RECORD_COLUMNS}
+RANGE_FIELDS = NUMERIC_FIELDS | {'crisil_rank'}
+SCREENER_PARAMS = (
+    {'category', 'plan', 'crisil_rank', 'sort', 'limit', 'cursor'}
+    | {f'{field}_min' for field in RANGE_FIELDS}
+    | {f'{field}_max' for field in RANGE_FIELDS}
+)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ScreenerError(ValueError):
+    pass
+
+
+def is_screener_request(params):
+    return any(name in params for name in SCREENER_PARAMS)
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _number(name, value, cast=float):
+    try:
+        return cast(value)
+    except ValueError:
+        raise ScreenerError(f'{name} must be a number')
+
+
+def parse_sort(params):
+    keys = []
+    for part in _split(params.get('sort', '')):
+        field = part.lstrip('-')
+        if field not in SORTABLE_FIELDS:
+            raise ScreenerError(f'Cannot sort by {field}')
+        keys.append((field, part.startswith('-')))
+    return keys
+
+
+def filter_funds(snapshot, params):
+    """Filtered and ordered queryset for ``params``; returns ``(queryset, sort_keys)``."""
+    queryset = MutualFund.objects.filter(snapshot=snapshot)
+
+    if params.get('category'):
+        queryset = queryset.filter(category_name__in=_split(params['category']))
+    if params.get('plan'):
+        queryset = queryset.filter(plan__in=_split(params['plan']))
+    if params.get('crisil_rank'):
+        ranks = [_number('crisil_rank', rank, int) for rank in _split(params['crisil_rank'])]
+        queryset = queryset.filter(crisil_rank__in=ranks)
+
+    for field in RANGE_FIELDS:
+        cast = int if field == 'crisil_rank' else float
+        if params.get(f'{field}_min'):
+            queryset = queryset.filter(**{f'{field}__gte': _number(f'{field}_min', params[f'{field}_min'], cast)})
+        if params.get(f'{field}_max'):
+            queryset = queryset.filter(**{f'{field}__lte': _number(f'{field}_max', params[f'{field}_max'], cast)})
+
+    sort_keys = parse_sort(params)
+    ordering = [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in sort_keys
+    ]
+    return queryset.order_by(*ordering, 'id'), sort_keys
+
+
+def encode_cursor(sort_keys, values, last_id):
+    payload = {'s': [('-' if d else '') + f for f, d in sort_keys], 'v': values, 'id': last_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor, sort_keys):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values, last_id = payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ScreenerError('Invalid cursor')
+    if payload.get('s') != [('-' if d else '') + f for f, d in sort_keys] or len(values) != len(sort_keys):
+        raise ScreenerError('Cursor does not match the requested sort')
+    return values, last_id
+
+
+def _after(field, descending, value):
+    # Rows strictly after ``value`` for one sort key, with NULLs ordered last
+    if value is None:
+        return Q(pk__in=[])
+    beyond = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+    return beyond | Q(**{f'{field}__isnull': True})
+
+
+def _equal(field, value):
+    return Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+
+
+def seek(queryset, sort_keys, values, last_id):
+    """Keyset condition: rows that sort after (values..., last_id)."""
+    condition = Q()
+    prefix = Q()
+    for (field, descending), value in zip(sort_keys, values):
+        condition |= prefix & _after(field, descending, value)
+        prefix &= _equal(field, value)
+    condition |= prefix & Q(id__gt=last_id)
+    return queryset.filter(condition)
+
+
+def screen_funds(snapshot, params):
+    """One page of screened funds as ``{'data': [...], 'next': cursor or None}``."""
+    queryset, sort_keys = filter_funds(snapshot, params)
+
+    limit = _number('limit', params.get('limit', DEFAULT_LIMIT), int)
+    if not 0 < limit <= MAX_LIMIT:
+        raise ScreenerError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    if params.get('cursor'):
+        queryset = seek(queryset, sort_keys, *decode_cursor(params['cursor'], sort_keys))
+
+    fields = [field for field, _ in RECORD_COLUMNS]
+    rows = list(queryset.values_list('id', *fields)[:limit + 1])
+    page, has_more = rows[:limit], len(rows) > limit
+
+    next_cursor = None
+    if has_more:
+        last = dict(zip(['id'] + fields, page[-1]))
+        next_cursor = encode_cursor(sort_keys, [last[field] for field, _ in sort_keys], last['id'])
+
+    columns = [column for _, column in RECORD_COLUMNS]
+    return {
+        'data': [dict(zip(columns, row[1:])) for row in page],
+        'next': next_cursor,
+    }
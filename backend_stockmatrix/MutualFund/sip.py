@@ -0,0 +1,302 @@
+"""
+SIP (systematic investment plan) projections.
+
+Contributions are made at the start of each month and compound monthly at
+``annualReturn / 12`` (the same convention as the frontend calculator).  An
+optional annual step-up raises the contribution by ``stepUp`` percent each
+year.  Values are deflated by monthly inflation at ``inflationRate / 12``.
+
+* ``project``: closed-form future value, invested amount and
+  inflation-adjusted value for a whole grid of scenarios at once.  Every
+  list-valued input is a grid axis.  For year ``Y`` with monthly growth
+  ``g = (1 + r)**12`` and step-up factor ``q``::
+
+      FV = P * A * (g**Y - q**Y) / (g - q),   A = ((1 + r)**12 - 1) / r * (1 + r)
+
+  Because every contribution compounds at the same rate, the XIRR of a
+  scenario is its effective annual rate ``g - 1``.
+* ``monte_carlo``: vectorized simulation of lognormal monthly returns over
+  ``paths`` paths.  It returns percentile bands per year and the XIRR
+  implied by each final percentile.
+* ``xirr``: money-weighted annual return of dated cash flows.
+"""
+import itertools
+from datetime import date
+
+import numpy as np
+
+MAX_SCENARIOS = 10000
+MAX_YEARS = 60
+DEFAULT_PATHS = 100_000
+MAX_PATHS = 200_000
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+GRID_FIELDS = {
+    # field: (default, minimum, maximum)
+    'monthlyInvestment': (None, 1, 1e9),
+    'annualReturn': (12, -50, 100),
+    'years': (10, 1, MAX_YEARS),
+    'inflationRate': (6, -20, 50),
+    'stepUp': (0, 0, 100),
+}
+
+
+class SIPError(ValueError):
+    pass
+
+
+def _values(data, field, default, minimum, maximum):
+    value = data.get(field, default)
+    if value is None:
+        raise SIPError(f'{field} is required')
+    values = value if isinstance(value, list) else [value]
+    if not values:
+        raise SIPError(f'{field} must not be empty')
+    try:
+        values = [float(item) for item in values]
+    except (TypeError, ValueError):
+        raise SIPError(f'{field} must be a number or a list of numbers')
+    if any(not minimum <= item <= maximum for item in values):
+        raise SIPError(f'{field} must be between {minimum:g} and {maximum:g}')
+    if field == 'years' and any(item != int(item) for item in values):
+        raise SIPError('years must be whole numbers')
+    return values
+
+
+def parse_flag(data, field, default):
+    """Boolean ``field`` of request data, which form posts send as strings such as "false"."""
+    value = data.get(field, default)
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes', 'on'):
+        return True
+    if text in ('false', '0', 'no', 'off'):
+        return False
+    raise SIPError(f'{field} must be true or false')
+
+
+def parse_grid(data):
+    """Scenario grid from request data: the cartesian product of list-valued fields."""
+    axes = {field: _values(data, field, *limits) for field, limits in GRID_FIELDS.items()}
+    count = int(np.prod([len(values) for values in axes.values()]))
+    if count > MAX_SCENARIOS:
+        raise SIPError(f'At most {MAX_SCENARIOS} scenarios per request; got {count}')
+    columns = zip(*itertools.product(*axes.values()))
+    return {field: np.array(column) for field, column in zip(axes, columns)}
+
+
+def _growth(annual_return, months=12):
+    # (1 + r)**months - 1 over r; the r -> 0 limit is months
+    r = np.asarray(annual_return) / 1200
+    safe = np.where(r == 0, 1, r)
+    return np.where(r == 0, months, np.expm1(months * np.log1p(r)) / safe)
+
+
+def sip_values(monthly, annual_return, years, inflation, step_up):
+    """Future value, amount invested and inflation-adjusted value after ``years`` (broadcasting)."""
+    r = np.asarray(annual_return) / 1200
+    g = (1 + r) ** 12
+    q = 1 + np.asarray(step_up) / 100
+    year_value = _growth(annual_return) * (1 + r)
+
+    same = np.isclose(g, q, rtol=1e-12, atol=0)
+    spread = np.where(same, 1, g - q)
+    series = np.where(same, years * g ** (years - 1), (g ** years - q ** years) / spread)
+    future_value = monthly * year_value * series
+
+    step = np.where(q == 1, 1, q - 1)
+    invested = 12 * monthly * np.where(q == 1, years, (q ** years - 1) / step)
+    real_value = future_value / (1 + np.asarray(inflation) / 1200) ** (12 * years)
+    return future_value, invested, real_value
+
+
+def project(grid, yearly=False):
+    """Closed-form results for every scenario in ``grid`` (see ``parse_grid``)."""
+    monthly, annual_return, years = grid['monthlyInvestment'], grid['annualReturn'], grid['years']
+    inflation, step_up = grid['inflationRate'], grid['stepUp']
+    future_value, invested, real_value = sip_values(monthly, annual_return, years, inflation, step_up)
+
+    # Rounded as arrays and converted once; per-value float()/round() dominates otherwise
+    columns = {
+        'monthlyInvestment': monthly.tolist(),
+        'annualReturn': annual_return.tolist(),
+        'years': years.astype(int).tolist(),
+        'inflationRate': inflation.tolist(),
+        'stepUp': step_up.tolist(),
+        'totalInvestment': np.round(invested, 2).tolist(),
+        'futureValue': np.round(future_value, 2).tolist(),
+        'wealthGained': np.round(future_value - invested, 2).tolist(),
+        'absoluteReturn': np.round((future_value - invested) / invested * 100, 4).tolist(),
+        'inflationAdjustedValue': np.round(real_value, 2).tolist(),
+        'xirr': np.round(((1 + annual_return / 1200) ** 12 - 1) * 100, 4).tolist(),
+    }
+    scenarios = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    if yearly:
+        year_axis = np.arange(1, int(years.max()) + 1)
+        fv, paid, real = sip_values(monthly[:, None], annual_return[:, None], year_axis,
+                                    inflation[:, None], step_up[:, None])
+        rows = zip(*(np.round(values, 2).tolist() for values in (paid, fv - paid, fv, real)))
+        labels = ('investment', 'returns', 'totalValue', 'inflationAdjustedValue')
+        for scenario, row in zip(scenarios, rows):
+            scenario['yearlyData'] = [
+                {'year': year, **dict(zip(labels, values))}
+                for year, values in zip(range(1, scenario['years'] + 1), zip(*row))
+            ]
+    return scenarios
+
+
+def solve_rates(times, flows, guess=0.1, iterations=50):
+    """Annual rates ``x`` with ``sum(flows * (1 + x) ** -times) == 0`` for each row of ``flows``.
+
+    ``times`` is shared by every row or given per row.  Newton's method runs
+    on all rows at once; rows it cannot settle fall back to bisection on
+    ``(-0.9999, 100)``.  Rows without a sign change are NaN.
+    """
+    flows = np.atleast_2d(np.asarray(flows, dtype=float))
+    times = np.broadcast_to(np.asarray(times, dtype=float), flows.shape)
+    rate = np.full(len(flows), guess)
+
+    def npv(rates):
+        return (flows * (1 + rates[:, None]) ** -times).sum(axis=1)
+
+    with np.errstate(all='ignore'):
+        for _ in range(iterations):
+            discount = (1 + rate[:, None]) ** -times
+            value = (flows * discount).sum(axis=1)
+            slope = (-times * flows * discount / (1 + rate[:, None])).sum(axis=1)
+            step = value / slope
+            rate = np.clip(rate - step, -0.9999, 100)
+            if np.all(np.abs(step) < 1e-10):
+                break
+
+        unsettled = ~np.isfinite(rate) | (np.abs(npv(rate)) > 1e-6 * np.abs(flows).sum(axis=1))
+        if unsettled.any():
+            low = np.full(unsettled.sum(), -0.9999)
+            high = np.full(unsettled.sum(), 100.0)
+            rows, row_times = flows[unsettled], times[unsettled]
+            low_value = (rows * (1 + low[:, None]) ** -row_times).sum(axis=1)
+            high_value = (rows * (1 + high[:, None]) ** -row_times).sum(axis=1)
+            bracketed = np.sign(low_value) != np.sign(high_value)
+            for _ in range(200):
+                middle = (low + high) / 2
+                value = (rows * (1 + middle[:, None]) ** -row_times).sum(axis=1)
+                below = np.sign(value) == np.sign(low_value)
+                low, low_value = np.where(below, middle, low), np.where(below, value, low_value)
+                high = np.where(below, high, middle)
+            rate[unsettled] = np.where(bracketed, (low + high) / 2, np.nan)
+    return rate
+
+
+def xirr(cashflows):
+    """XIRR (percent) of ``[{'date': 'YYYY-MM-DD', 'amount': ...}, ...]``; investments are negative."""
+    if not isinstance(cashflows, list) or len(cashflows) < 2:
+        raise SIPError('cashflows must be a list of at least two {date, amount} entries')
+    try:
+        dates = [date.fromisoformat(str(flow['date'])) for flow in cashflows]
+        amounts = [float(flow['amount']) for flow in cashflows]
+    except (KeyError, TypeError, ValueError):
+        raise SIPError('Each cash flow needs an ISO date and a numeric amount')
+    if not (min(amounts) < 0 < max(amounts)):
+        raise SIPError('cashflows need at least one negative and one positive amount')
+
+    start = min(dates)
+    times = np.array([(day - start).days for day in dates]) / 365.0
+    rate = solve_rates(times, [amounts])[0]
+    return None if np.isnan(rate) else round(float(rate * 100), 4)
+
+
+def monthly_contributions(monthly, years, step_up):
+    return monthly * (1 + step_up / 100) ** (np.arange(12 * years) // 12)
+
+
+def monte_carlo(monthly, annual_return, volatility, years, inflation=0, step_up=0,
+                paths=DEFAULT_PATHS, percentiles=DEFAULT_PERCENTILES, target=None, seed=None):
+    """Percentile bands of the SIP value over ``paths`` simulated return paths.
+
+    Monthly returns are lognormal with mean ``annual_return / 12`` and
+    volatility ``volatility / sqrt(12)`` (both in percent).  Half of the paths
+    are the antithetic mirror of the other half, which halves the random
+    draws and tightens the bands.  Paths advance a month at a time as whole
+    vectors, with returns drawn a year at a time in float32.
+    """
+    rng = np.random.default_rng(seed)
+    sigma = volatility / 100 / np.sqrt(12)
+    mu = np.log1p(annual_return / 1200) - sigma ** 2 / 2
+    contributions = monthly_contributions(monthly, years, step_up)
+
+    half = (paths + 1) // 2
+    paths = 2 * half
+    values = np.zeros((2, half))
+    yearly = np.empty((years, 2, half))
+    growth = np.empty((2, 12, half), dtype=np.float32)
+    for year in range(years):
+        rng.standard_normal((12, half), dtype=np.float32, out=growth[0])
+        np.negative(growth[0], out=growth[1])
+        growth *= np.float32(sigma)
+        growth += np.float32(mu)
+        np.exp(growth, out=growth)
+        for month in range(12):
+            values += contributions[12 * year + month]
+            values *= growth[:, month]
+        yearly[year] = values
+    yearly = yearly.reshape(years, paths)
+
+    bands = np.percentile(yearly, percentiles, axis=1)
+    deflators = (1 + inflation / 1200) ** (12 * np.arange(1, years + 1))
+    invested = np.cumsum(contributions)[11::12]
+    labels = [f'p{percentile:g}' for percentile in percentiles]
+
+    # Final value is increasing in the path's rate, so each percentile has one implied XIRR
+    times = np.arange(12 * years + 1) / 12
+    flows = np.zeros((len(percentiles), len(times)))
+    flows[:, :-1] = -contributions
+    flows[:, -1] = bands[:, -1]
+    implied = solve_rates(times, flows)
+
+    result = {
+        'paths': paths,
+        'years': years,
+        'yearlyBands': [
+            dict(
+                {'year': year + 1, 'investment': round(float(invested[year]), 2)},
+                **{label: round(float(bands[index, year]), 2) for index, label in enumerate(labels)},
+                **{f'{label}InflationAdjusted': round(float(bands[index, year] / deflators[year]), 2)
+                   for index, label in enumerate(labels)},
+            )
+            for year in range(years)
+        ],
+        'final': {label: round(float(bands[index, -1]), 2) for index, label in enumerate(labels)},
+        'finalInflationAdjusted': {
+            label: round(float(bands[index, -1] / deflators[-1]), 2) for index, label in enumerate(labels)
+        },
+        'xirr': {
+            label: None if np.isnan(rate) else round(float(rate * 100), 4) for label, rate in zip(labels, implied)
+        },
+        'meanFutureValue': round(float(yearly[-1].mean()), 2),
+        'totalInvestment': round(float(invested[-1]), 2),
+    }
+    if target is not None:
+        result['probabilityOfTarget'] = round(float((yearly[-1] >= target).mean()), 4)
+    return result
+
+
+def parse_monte_carlo(data):
+    """Keyword arguments for ``monte_carlo`` from request data (single scenario only)."""
+    options = {}
+    for field, name in (('monthlyInvestment', 'monthly'), ('annualReturn', 'annual_return'),
+                        ('years', 'years'), ('inflationRate', 'inflation'), ('stepUp', 'step_up')):
+        values = _values(data, field, *GRID_FIELDS[field])
+        if len(values) != 1:
+            raise SIPError(f'{field} must be a single number for Monte Carlo')
+        options[name] = values[0]
+    options['years'] = int(options['years'])
+    options['volatility'] = _values(data, 'volatility', 15, 0, 200)[0]
+    options['paths'] = int(_values(data, 'paths', DEFAULT_PATHS, 1000, MAX_PATHS)[0])
+    options['percentiles'] = _values(data, 'percentiles', list(DEFAULT_PERCENTILES), 0, 100)
+    if data.get('target') is not None:
+        options['target'] = _values(data, 'target', None, 0, 1e15)[0]
+    if data.get('seed') is not None:
+        options['seed'] = int(_values(data, 'seed', None, 0, 2 ** 32)[0])
+    return options
@@ -0,0 +1,68 @@
+"""
+Deterministic stand-ins for the moneycontrol best-funds page and AMFI NAV
+reports, for benchmarks and offline runs when no recorded fixture is available.
+"""
+import random
+
+import numpy as np
+
+CATEGORIES = ['Large Cap Fund', 'Mid Cap Fund', 'Small Cap Fund', 'Flexi Cap Fund', 'ELSS', 'Sectoral/Thematic']
+PLANS = ['Direct Plan', 'Regular Plan']
+
+
+def synthetic_fund_page(rows=2000, seed=0):
+    rng = random.Random(seed)
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Best Mutual Funds</title></head><body>',
+        '<div class="nav">' + ''.join(f'<a href="/section/{i}">Section {i}</a>' for i in range(200)) + '</div>',
+        '<table class="mctable1"><thead><tr><th>Scheme Name</th><th>Plan</th><th>Category Name</th>'
+        '<th>Crisil Rank</th><th>AuM (Cr)</th><th>1W</th><th>1M</th><th>3M</th><th>6M</th><th>YTD</th>'
+        '<th>1Y</th><th>2Y</th><th>3Y</th><th>5Y</th><th>10Y</th></tr></thead><tbody>',
+    ]
+    for i in range(rows):
+        returns = ''.join(
+            f'<td>{rng.uniform(-15, 45):.2f}%</td>' if rng.random() > 0.1 else '<td>-</td>'
+            for _ in range(10)
+        )
+        parts.append(
+            f'<tr class="INF{i:09d} ranked"><td><a href="/mutual-funds/nav/fund-{i}">Synthetic Fund {i} - Growth</a></td>'
+            f'<td>{rng.choice(PLANS)}</td><td>{rng.choice(CATEGORIES)}</td>'
+            f'<td><span class="stars">{rng.randint(1, 5)}</span></td>'
+            f'<td>{rng.uniform(10, 60000):,.2f}</td>{returns}</tr>'
+        )
+    parts.append('</tbody></table><footer>' + 'x' * 5000 + '</footer></body></html>')
+    return ''.join(parts).encode()
+
+
+def synthetic_nav_report(schemes=200, years=10, seed=0, end=None):
+    """An AMFI historical NAV report for ``schemes`` random-walk schemes over ``years`` of weekdays.
+
+    Schemes launch at staggered dates, so some are younger than the longer
+    return windows.
+    """
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(end or 'today', 'D')
+    days = np.arange(end - 365 * years, end + 1)
+    days = days[np.is_busday(days)]
+    launches = rng.integers(0, len(days) // 2, schemes)
+    drift = rng.uniform(0.02, 0.18, schemes) / 252
+    volatility = rng.uniform(0.05, 0.25, schemes) / np.sqrt(252)
+    navs = 10 * np.exp(np.cumsum(drift[:, None] + volatility[:, None] * rng.standard_normal((schemes, len(days))), axis=1))
+    labels = [day.strftime('%d-%b-%Y') for day in days.astype(object)]
+
+    lines = [
+        'Scheme Code;Scheme Name;ISIN Div Payout/ISIN Growth;ISIN Div Reinvestment;'
+        'Net Asset Value;Repurchase Price;Sale Price;Date',
+        '',
+        'Open Ended Schemes(Equity Scheme - Flexi Cap Fund)',
+        '',
+        'Synthetic Mutual Fund',
+        '',
+    ]
+    for scheme in range(schemes):
+        name = f'Synthetic Fund {scheme} - Direct Plan - Growth'
+        lines.extend(
+            f'{100000 + scheme};{name};INF{scheme:09d};-;{navs[scheme, day]:.4f};;;{labels[day]}'
+            for day in range(launches[scheme], len(days))
+        )
+    return '\n'.join(lines) + '\n'
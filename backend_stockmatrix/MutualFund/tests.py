@@ -1,3 +1,460 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import math
+import statistics
+from datetime import date
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from backend_stockmatrix import ratelimit
+
+from . import export
+from .export import ExportError, export_chunks
+from .extractor import RECORD_COLUMNS, extract_funds, typed_fund
+from .ingest import aingest_funds, ingest_funds, latest_snapshot, store_funds
+from .management.commands.bench_fund_extractor import legacy_parse
+from .models import FundSnapshot, MutualFund
+from .nav import NAV_DTYPE, NAVError, NAVPanel, parse_analytics_params
+from .scraper import EQUITY_FUNDS_URL, FundParseError
+from .screener import ScreenerError, decode_cursor, filter_funds, parse_sort, screen_funds, seek
+from .sip import SIPError, parse_grid, project, sip_values, solve_rates, xirr
+from .synthetic import synthetic_fund_page
+
+
+FUND_PAGE = Path(__file__).resolve().parent / 'fixtures' / 'best_funds_sample.html'
+
+
+class ExtractFundsTests(SimpleTestCase):
+    def setUp(self):
+        self.content = FUND_PAGE.read_bytes()
+
+    def legacy_records(self):
+        """The old scraper's string cells, typed the way the extractor types them."""
+        records = legacy_parse(self.content).to_dict('records')
+        return [typed_fund(None, [record[column] for _, column in RECORD_COLUMNS]) for record in records]
+
+    def extracted(self, chunks, backend):
+        return [{**fund, 'isin': None} for fund in extract_funds(chunks, backend=backend)]
+
+    def test_matches_the_old_scraper(self):
+        expected = self.legacy_records()
+        self.assertEqual(len(expected), 5)
+        for backend in ('html.parser', 'lxml'):
+            for chunk_size in (len(self.content), 64, 7):
+                chunks = [self.content[i:i + chunk_size] for i in range(0, len(self.content), chunk_size)]
+                with self.subTest(backend=backend, chunk_size=chunk_size):
+                    self.assertEqual(self.extracted(chunks, backend), expected)
+
+    def test_typed_values(self):
+        funds = list(extract_funds(self.content))
+        self.assertEqual(
+            [fund['isin'] for fund in funds],
+            ['INF179K01BE2', 'INF846K01EW2', 'INF109K016L0', 'INF200K01RJ1', 'INF204K01XI3'],
+        )
+        axis, icici = funds[1], funds[2]
+        self.assertEqual(axis['scheme_name'], 'Axis Small Cap Fund - Direct Plan - Growth\nNEW')
+        self.assertEqual((axis['plan'], axis['crisil_rank'], axis['aum_cr']), ('Direct Plan', 4, 22051.7))
+        self.assertEqual((axis['return_1w'], axis['return_3m'], axis['return_ytd'], axis['return_10y']), (-2.08, None, None, None))
+        self.assertEqual(icici['scheme_name'], 'ICICI Prudential Equity & Debt Fund - Growth')
+        self.assertEqual((icici['crisil_rank'], icici['aum_cr'], icici['return_2y']), (None, 36987.0, None))
+        self.assertEqual((funds[3]['aum_cr'], funds[3]['return_1m'], funds[3]['return_3m']), (None, 2.5, 5.0))
+        self.assertEqual((funds[4]['crisil_rank'], funds[4]['aum_cr']), (4, 105312.44))
+
+
+class StoreFundsTests(TestCase):
+    def setUp(self):
+        self.funds = list(extract_funds([synthetic_fund_page(20)]))
+        self.good = store_funds(EQUITY_FUNDS_URL, self.funds)
+
+    def test_stores_a_new_latest_snapshot(self):
+        snapshot = store_funds(EQUITY_FUNDS_URL, self.funds[:5], keep=1)
+        self.assertEqual(latest_snapshot(), snapshot)
+        self.assertEqual(snapshot.funds.count(), 5)
+        self.assertEqual(FundSnapshot.objects.count(), 1)
+
+    def test_empty_scrape_keeps_the_previous_snapshot(self):
+        with self.assertRaises(FundParseError):
+            store_funds(EQUITY_FUNDS_URL, [], keep=1)
+        self.assertEqual(latest_snapshot(), self.good)
+        self.assertEqual(FundSnapshot.objects.count(), 1)
+
+    def test_ingest_rejects_a_page_without_funds(self):
+        with mock.patch('MutualFund.ingest.scrape_funds', return_value=[]):
+            with self.assertRaises(FundParseError):
+                ingest_funds(keep=1)
+        self.assertEqual(latest_snapshot(), self.good)
+
+    def test_async_ingest_rejects_a_page_without_funds(self):
+        with mock.patch('MutualFund.ingest.ascrape_funds', mock.AsyncMock(return_value=[])):
+            with self.assertRaises(FundParseError):
+                async_to_sync(aingest_funds)(keep=1)
+        self.assertEqual(latest_snapshot(), self.good)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        snapshot = store_funds(EQUITY_FUNDS_URL, list(extract_funds([synthetic_fund_page(20)])))
+        self.queryset = snapshot.funds.order_by('id')
+        self.columns = [column for _, column in RECORD_COLUMNS]
+        self.rows = list(self.queryset.values_list(*[field for field, _ in RECORD_COLUMNS]))
+        # Several batches, the last one short
+        patcher = mock.patch.object(export, 'BATCH_SIZE', 8)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, export_format, compress=False):
+        return b''.join(export_chunks(self.queryset, export_format, compress=compress))
+
+    def test_csv_round_trip(self):
+        header, *rows = csv.reader(io.StringIO(self.export('csv').decode()))
+        self.assertEqual(header, self.columns)
+        self.assertEqual(rows, [['' if value is None else str(value) for value in row] for row in self.rows])
+
+    def test_ndjson_round_trip(self):
+        lines = self.export('ndjson').decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [dict(zip(self.columns, row)) for row in self.rows])
+
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(io.BytesIO(self.export('parquet')))
+        self.assertEqual(parquet.num_row_groups, 3)
+        self.assertEqual(parquet.read().to_pylist(), [dict(zip(self.columns, row)) for row in self.rows])
+
+    def test_gzip_wraps_every_format(self):
+        for export_format in ('csv', 'ndjson', 'parquet'):
+            with self.subTest(export_format=export_format):
+                self.assertEqual(gzip.decompress(self.export(export_format, compress=True)), self.export(export_format))
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaisesMessage(ExportError, 'Unsupported export format xlsx'):
+            export_chunks(self.queryset, 'xlsx')
+        for path in ('/api/mutualfunds/', '/api/async/mutualfunds/'):
+            response = self.client.get(path, {'download': 'xlsx'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Unsupported export format', response.json()['error'])
+
+    def test_view_streams_the_export(self):
+        response = self.client.get('/api/mutualfunds/', {'download': 'ndjson', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=mutual_funds.ndjson.gz')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), len(self.rows))
+
+
+def encode_payload(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class FundScreenerTests(TestCase):
+    # Duplicates and NULLs in both sort columns
+    AUM = [10.0, None, 5.0, 10.0, None, 7.0, 5.0, 10.0, 3.0, None, 7.0, 10.0]
+    RANKS = [3, 1, None, 3, 2, 1, None, 5, 3, 1, 2, None]
+
+    def setUp(self):
+        self.snapshot = FundSnapshot.objects.create(source_url=EQUITY_FUNDS_URL)
+        self.funds = [
+            MutualFund.objects.create(
+                snapshot=self.snapshot, scheme_name=f'Fund {n:02d}', plan='Direct Plan', category_name='Large Cap',
+                aum_cr=aum, crisil_rank=rank,
+            )
+            for n, (aum, rank) in enumerate(zip(self.AUM, self.RANKS))
+        ]
+
+    def expected(self, sort_keys):
+        """Scheme names in the screener's order: each key with NULLs last, then id."""
+        funds = sorted(self.funds, key=lambda fund: fund.id)
+        for field, descending in reversed(sort_keys):
+            present = [fund for fund in funds if getattr(fund, field) is not None]
+            missing = [fund for fund in funds if getattr(fund, field) is None]
+            funds = sorted(present, key=lambda fund: getattr(fund, field), reverse=descending) + missing
+        return [fund.scheme_name for fund in funds]
+
+    def page_through(self, sort, limit):
+        names, cursor = [], None
+        while True:
+            params = {'sort': sort, 'limit': str(limit)}
+            if cursor:
+                params['cursor'] = cursor
+            page = screen_funds(self.snapshot, params)
+            names += [row['Scheme Name'] for row in page['data']]
+            if not page['next']:
+                return names
+            cursor = page['next']
+
+    def test_pages_cover_every_fund_once_in_order(self):
+        for sort in ('aum_cr', '-aum_cr', 'crisil_rank,-aum_cr', '-crisil_rank,aum_cr', ''):
+            expected = self.expected(parse_sort({'sort': sort}))
+            for limit in (1, 2, 5, 12):
+                with self.subTest(sort=sort, limit=limit):
+                    self.assertEqual(self.page_through(sort, limit), expected)
+
+    def test_nulls_sort_last_in_both_directions(self):
+        for sort in ('aum_cr', '-aum_cr'):
+            data = screen_funds(self.snapshot, {'sort': sort})['data']
+            self.assertEqual([row['AuM (Cr)'] for row in data][-3:], [None] * 3)
+
+    def test_ties_are_broken_by_id(self):
+        data = screen_funds(self.snapshot, {'sort': '-aum_cr', 'limit': '4'})['data']
+        self.assertEqual([row['Scheme Name'] for row in data], ['Fund 00', 'Fund 03', 'Fund 07', 'Fund 11'])
+
+    def test_seek_starts_after_a_null_value(self):
+        sort_keys = parse_sort({'sort': 'aum_cr'})
+        queryset, _ = filter_funds(self.snapshot, {'sort': 'aum_cr'})
+        names = list(seek(queryset, sort_keys, [None], self.funds[4].id).values_list('scheme_name', flat=True))
+        self.assertEqual(names, ['Fund 09'])
+
+    def test_rejects_garbage_and_tampered_cursors(self):
+        cursor = screen_funds(self.snapshot, {'sort': 'aum_cr', 'limit': '2'})['next']
+        payload = json.loads(base64.urlsafe_b64decode(cursor))
+        tampered = [
+            'garbage', '!!!!', base64.urlsafe_b64encode(b'[1, 2]').decode(),
+            encode_payload(dict(payload, id='x')), encode_payload(dict(payload, v=[])),
+            encode_payload({key: value for key, value in payload.items() if key != 'v'}),
+        ]
+        for bad in tampered:
+            with self.subTest(cursor=bad), self.assertRaises(ScreenerError):
+                screen_funds(self.snapshot, {'sort': 'aum_cr', 'cursor': bad})
+
+    def test_rejects_a_cursor_from_another_sort(self):
+        cursor = screen_funds(self.snapshot, {'sort': 'aum_cr', 'limit': '2'})['next']
+        for sort in ('-aum_cr', 'crisil_rank', 'aum_cr,crisil_rank', ''):
+            with self.subTest(sort=sort), self.assertRaisesMessage(ScreenerError, 'Cursor does not match'):
+                decode_cursor(cursor, parse_sort({'sort': sort}))
+
+    def test_view_answers_bad_cursors_with_400(self):
+        cursor = screen_funds(self.snapshot, {'sort': 'aum_cr', 'limit': '2'})['next']
+        for query in ({'sort': 'aum_cr', 'cursor': 'garbage'}, {'sort': '-aum_cr', 'cursor': cursor}):
+            response = self.client.get('/api/mutualfunds/', query)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ursor', response.json()['error'])
+
+
+def simulate_sip(monthly, annual_return, years, step_up):
+    """Future value and amount invested, one month at a time."""
+    rate, value, invested = annual_return / 1200, 0.0, 0.0
+    for month in range(12 * years):
+        contribution = monthly * (1 + step_up / 100) ** (month // 12)
+        invested += contribution
+        value = (value + contribution) * (1 + rate)
+    return value, invested
+
+
+class SIPProjectionTests(SimpleTestCase):
+    def assertMatchesSimulation(self, monthly, annual_return, years, step_up):
+        future_value, invested, _ = sip_values(monthly, annual_return, years, 0, step_up)
+        expected_value, expected_invested = simulate_sip(monthly, annual_return, years, step_up)
+        self.assertAlmostEqual(float(future_value) / expected_value, 1, places=10)
+        self.assertAlmostEqual(float(invested) / expected_invested, 1, places=10)
+
+    def test_closed_form_matches_monthly_simulation(self):
+        for annual_return in (12, 0, -8, 35):
+            for step_up in (0, 10, 25):
+                for years in (1, 7, 30):
+                    with self.subTest(annual_return=annual_return, step_up=step_up, years=years):
+                        self.assertMatchesSimulation(5000, annual_return, years, step_up)
+
+    def test_step_up_equal_to_annual_growth(self):
+        # g == q takes the limit branch of the geometric series
+        step_up = ((1 + 12 / 1200) ** 12 - 1) * 100
+        for years in (1, 10, 40):
+            self.assertMatchesSimulation(5000, 12, years, step_up)
+        # and stays continuous with its neighbours
+        near, _, _ = sip_values(5000, 12, 10, 0, step_up + 1e-6)
+        at, _, _ = sip_values(5000, 12, 10, 0, step_up)
+        self.assertAlmostEqual(float(near) / float(at), 1, places=6)
+
+    def test_projection_xirr_is_the_effective_annual_rate(self):
+        scenario = project(parse_grid({'monthlyInvestment': 1000, 'annualReturn': 12, 'years': 5}))[0]
+        months = [date(2020 + month // 12, month % 12 + 1, 1) for month in range(61)]
+        cashflows = [{'date': str(day), 'amount': -1000} for day in months[:-1]]
+        cashflows.append({'date': str(months[-1]), 'amount': scenario['futureValue']})
+        # Day-count conventions differ, so only to within a few basis points
+        self.assertAlmostEqual(xirr(cashflows), scenario['xirr'], delta=0.05)
+
+
+class XIRRTests(SimpleTestCase):
+    def test_one_year_return(self):
+        cashflows = [{'date': '2021-01-01', 'amount': -1000}, {'date': '2022-01-01', 'amount': 1100}]
+        self.assertAlmostEqual(xirr(cashflows), 10.0, places=4)
+
+    def test_solve_rates_zeroes_the_npv_of_every_row(self):
+        rng = np.random.default_rng(3)
+        times = np.arange(6, dtype=float)
+        flows = np.column_stack([-rng.uniform(100, 1000, 200), rng.uniform(-50, 400, (200, 5))])
+        flows[0] = [-100, 0, 0, 0, 0, 1e6]  # Far from the initial guess
+        flows[1] = [-100, 0, 0, 0, 0, 0.01]  # Close to total loss
+        rates = solve_rates(times, flows)
+
+        bracketed = np.isfinite(rates)
+        self.assertTrue(bracketed[:2].all())
+        npv = (flows[bracketed] * (1 + rates[bracketed, None]) ** -times).sum(axis=1)
+        np.testing.assert_allclose(npv, 0, atol=1e-6 * np.abs(flows).sum(axis=1).max())
+
+    def test_rows_without_a_sign_change_are_nan(self):
+        self.assertTrue(np.isnan(solve_rates([0, 1], [[-100, -5]])[0]))
+
+    def test_rejects_invalid_cash_flows(self):
+        for cashflows in (None, [], [{'date': '2021-01-01', 'amount': -1}],
+                          [{'date': 'soon', 'amount': -1}, {'date': '2022-01-01', 'amount': 2}],
+                          [{'date': '2021-01-01', 'amount': 1}, {'date': '2022-01-01', 'amount': 2}]):
+            with self.assertRaises(SIPError):
+                xirr(cashflows)
+
+
+@override_settings(RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'))
+class SIPViewTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+
+    def post(self, data, **kwargs):
+        return self.client.post('/api/sip/', data, **kwargs)
+
+    def test_yearly_flag_is_parsed(self):
+        for value, expected in ((False, False), ('false', False), ('0', False), ('true', True), (True, True)):
+            with self.subTest(value=value):
+                response = self.post({'monthlyInvestment': 1000, 'yearly': value}, content_type='application/json')
+                self.assertEqual('yearlyData' in response.json()['scenarios'][0], expected)
+        response = self.post({'monthlyInvestment': 1000, 'yearly': 'sometimes'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_xirr_is_rate_limited(self):
+        cashflows = [{'date': '2021-01-01', 'amount': -1000}, {'date': '2022-01-01', 'amount': 1100}]
+        statuses = [
+            self.client.post('/api/sip/xirr/', {'cashflows': cashflows}, content_type='application/json').status_code
+            for _ in range(61)
+        ]
+        self.assertEqual(statuses, [200] * 60 + [429])
+
+
+def nav_history(days, navs):
+    history = np.empty(len(days), dtype=NAV_DTYPE)
+    history['date'], history['nav'] = days, navs
+    return history
+
+
+class NAVAnalyticsTests(SimpleTestCase):
+    # NAVs on the 15th of every month from January 2021 to January 2024, up 1% a month
+    MONTHS = [str(day) for day in np.arange('2021-01', '2024-02', dtype='datetime64[M]').astype('datetime64[D]') + 14]
+    STEADY = nav_history(MONTHS, [10 * 1.01 ** month for month in range(len(MONTHS))])
+    # Four months: +10%, -10%, flat, +30%
+    SWINGS = nav_history(MONTHS[-5:], [10, 11, 9.9, 9.9, 12.87])
+    # Quarterly over one year with a 10% drawdown from 110 to 99
+    QUARTERLY = nav_history(['2023-01-02', '2023-04-03', '2023-07-03', '2023-10-02', '2024-01-02'],
+                            [100, 110, 99, 108.9, 121])
+
+    def analytics(self, histories, **options):
+        records = NAVPanel(histories).analytics(**dict({'sip_years': 1, 'risk_years': 1}, **options))
+        return {record['scheme']: record for record in records}
+
+    def assertPercent(self, value, expected):
+        self.assertAlmostEqual(value, round(expected * 100, 4), places=4)
+
+    def test_trailing_returns(self):
+        steady, swings = self.analytics({'STEADY': self.STEADY, 'SWINGS': self.SWINGS}).values()
+        self.assertEqual((steady['asOf'], swings['asOf']), ('2024-01-15', '2024-01-15'))
+        # 1W and YTD fall back to the NAV of 2023-12-15
+        for key in ('1w', 'ytd', '1m'):
+            self.assertPercent(steady[f'return_{key}'], 0.01)
+        self.assertPercent(steady['return_3m'], 1.01 ** 3 - 1)
+        self.assertPercent(steady['return_6m'], 1.01 ** 6 - 1)
+        # Annualized beyond a year
+        for key in ('1y', '2y', '3y'):
+            self.assertPercent(steady[f'return_{key}'], 1.01 ** 12 - 1)
+        self.assertEqual((steady['return_5y'], steady['return_10y']), (None, None))
+
+        self.assertPercent(swings['return_1m'], 12.87 / 9.9 - 1)
+        self.assertPercent(swings['return_3m'], 12.87 / 11 - 1)
+        self.assertIsNone(swings['return_6m'])
+
+    def test_rolling_returns(self):
+        steady, swings = self.analytics({'STEADY': self.STEADY, 'SWINGS': self.SWINGS}, window_months=1).values()
+        self.assertEqual(
+            [swings[key] for key in ('rolling_windows', 'rolling_mean', 'rolling_median', 'rolling_min',
+                                     'rolling_max', 'rolling_negative')],
+            [4, 7.5, 5.0, -10.0, 30.0, 25.0],
+        )
+        self.assertEqual(steady['rolling_windows'], len(self.MONTHS) - 1)
+        self.assertEqual((steady['rolling_min'], steady['rolling_max']), (1.0, 1.0))
+
+        steady = self.analytics({'STEADY': self.STEADY}, window_months=24)['STEADY']
+        self.assertEqual(steady['rolling_windows'], len(self.MONTHS) - 24)
+        self.assertPercent(steady['rolling_mean'], 1.01 ** 12 - 1)
+
+    def test_sip_returns(self):
+        steady, swings = self.analytics({'STEADY': self.STEADY, 'SWINGS': self.SWINGS}).values()
+        # One unit a month for 12 months: the k-th installment grows by 1.01 ** (13 - k)
+        final = sum(1.01 ** months for months in range(1, 13))
+        self.assertPercent(steady['sip_return'], final / 12 - 1)
+        cashflows = [{'date': day, 'amount': -1} for day in self.MONTHS[-13:-1]]
+        cashflows.append({'date': self.MONTHS[-1], 'amount': final})
+        self.assertAlmostEqual(steady['sip_xirr'], xirr(cashflows), places=2)
+        # Younger than the SIP period
+        self.assertEqual((swings['sip_return'], swings['sip_xirr']), (None, None))
+
+    def test_risk_metrics(self):
+        quarterly = self.analytics({'QUARTERLY': self.QUARTERLY}, risk_free=0.06)['QUARTERLY']
+        log_returns = [math.log(b / a) for a, b in zip(self.QUARTERLY['nav'][:-1], self.QUARTERLY['nav'][1:])]
+        cagr = 1.21 ** (365.25 / 365) - 1
+        volatility = statistics.stdev(log_returns) * math.sqrt(252)
+        downside = math.sqrt(sum(min(r, 0) ** 2 for r in log_returns) / len(log_returns) * 252)
+
+        self.assertPercent(quarterly['cagr'], cagr)
+        self.assertPercent(quarterly['volatility'], volatility)
+        self.assertPercent(quarterly['max_drawdown'], -0.1)
+        self.assertAlmostEqual(quarterly['sharpe'], round((cagr - 0.06) / volatility, 4), places=4)
+        self.assertAlmostEqual(quarterly['sortino'], round((cagr - 0.06) / downside, 4), places=4)
+
+    def test_ratios_without_volatility_are_null(self):
+        steady = self.analytics({'STEADY': self.STEADY})['STEADY']
+        self.assertEqual((steady['volatility'], steady['max_drawdown']), (0.0, 0.0))
+        self.assertEqual((steady['sharpe'], steady['sortino']), (None, None))
+
+
+@override_settings(RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'))
+class NAVAnalyticsParamsTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+
+    def test_defaults(self):
+        options, schemes, sort_keys, limit = parse_analytics_params({})
+        self.assertEqual(options, {'window_months': 36, 'sip_years': 5, 'risk_years': 3, 'risk_free': 0.06})
+        self.assertEqual((schemes, sort_keys, limit), ([], [], 50))
+        options, schemes, sort_keys, _ = parse_analytics_params(
+            {'window': '6m', 'schemes': 'INF1, 2', 'sort': '-sharpe,name'},
+        )
+        self.assertEqual((options['window_months'], schemes), (6, ['INF1', '2']))
+        self.assertEqual(sort_keys, [('sharpe', True), ('name', False)])
+
+    def test_invalid_parameters_are_rejected_with_400(self):
+        for params, message in (
+            ({'window': '11Y'}, 'window must look like'),
+            ({'window': '0M'}, 'window must look like'),
+            ({'window': '3 years'}, 'window must look like'),
+            ({'sip_years': 'five'}, 'sip_years must be a number'),
+            ({'sip_years': '11'}, 'sip_years must be between 1 and 10'),
+            ({'risk_years': '0'}, 'risk_years must be between 1 and 10'),
+            ({'risk_free': '51'}, 'risk_free must be between -10 and 50'),
+            ({'sort': 'sharpe,-isin'}, 'Cannot sort by isin'),
+            ({'limit': '501'}, 'limit must be between 1 and 500'),
+            ({'limit': '2.5'}, 'limit must be a number'),
+        ):
+            with self.subTest(params=params):
+                with self.assertRaisesMessage(NAVError, message):
+                    parse_analytics_params(params)
+                response = self.client.get('/api/mutualfunds/nav/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.json()['error'])
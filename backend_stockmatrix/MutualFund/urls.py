@@ -1,6 +1,14 @@
 from django.urls import path
-from .views import MutualFundsView
+from .views import (
+    AsyncMutualFundsView, MutualFundsView, NAVAnalyticsView, NAVHistoryView, SIPMonteCarloView, SIPView, XIRRView,
+)
 
 urlpatterns = [
     path('mutualfunds/', MutualFundsView.as_view(), name='mutual_funds'),
+    path('async/mutualfunds/', AsyncMutualFundsView.as_view(), name='mutual_funds_async'),
+    path('mutualfunds/nav/', NAVAnalyticsView.as_view(), name='mutual_fund_nav_analytics'),
+    path('mutualfunds/nav/<str:scheme>/', NAVHistoryView.as_view(), name='mutual_fund_nav_history'),
+    path('sip/', SIPView.as_view(), name='sip'),
+    path('sip/monte-carlo/', SIPMonteCarloView.as_view(), name='sip_monte_carlo'),
+    path('sip/xirr/', XIRRView.as_view(), name='sip_xirr'),
 ]
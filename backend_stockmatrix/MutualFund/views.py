@@ -1,104 +1,227 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import io
+import time
+
+from backend_stockmatrix.async_http import UPSTREAM_ERRORS
+from backend_stockmatrix.async_views import AsyncAPIView
+from backend_stockmatrix.conditional import conditional_response, make_etag, tagged
+from backend_stockmatrix.metrics import span
+from backend_stockmatrix.ratelimit import rate_limit
+from backend_stockmatrix.renderers import JSONBytesResponse
+from .export import EXPORT_FORMATS, ExportError, export_chunks
+from .ingest import aensure_snapshot, ensure_snapshot, fund_records
+from .nav import NAVError, get_nav_store, nav_analytics, parse_analytics_params, select_records
+from .scraper import FundParseError
+from .screener import ScreenerError, filter_funds, is_screener_request, screen_funds
+from .sip import SIPError, monte_carlo, parse_flag, parse_grid, parse_monte_carlo, project, xirr
+
+
+def download_format(params):
+    # download=true (CSV), csv, ndjson or parquet
+    download = params.get('download', '').lower()
+    if download == 'true':
+        return 'csv'
+    return '' if download == 'false' else download
+
+
+def export_response(snapshot, params, download):
+    if is_screener_request(params):
+        queryset, _ = filter_funds(snapshot, params)
+    else:
+        queryset = snapshot.funds.order_by('id')
+    # compress=gzip gzips the file
+    compress = params.get('compress', '').lower() == 'gzip'
+    chunks = export_chunks(queryset, download, compress=compress)
+    
+    content_type, extension = EXPORT_FORMATS[download]
+    filename = f'mutual_funds.{extension}'
+    if compress:
+        content_type, filename = 'application/gzip', f'{filename}.gz'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def funds_etag(snapshot, params):
+    # Snapshots never change, so the snapshot and the query identify the response
+    return make_etag('funds', snapshot.id, sorted(params.lists()))
+
+
+def funds_payload(snapshot, params):
+    if is_screener_request(params):
+        return screen_funds(snapshot, params)
+    return {"data": fund_records(snapshot)}
+
 
 class MutualFundsView(APIView):
     def get(self, request):
-        url = "https://www.moneycontrol.com/mutual-funds/best-funds/equity.html"
-        
+        # Funds are served from the latest ingested snapshot; moneycontrol is only
+        # contacted here if nothing has been ingested yet
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            with span('snapshot'):
+                snapshot = ensure_snapshot()
         except requests.exceptions.RequestException as e:
             return Response({"error": f"Request failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except FundParseError as e:
+            return Response({"error": f"Error parsing the data: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        params = request.query_params
+        download = download_format(params)
+        etag = funds_etag(snapshot, params)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
         
         try:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            rows = soup.find_all('tr', class_=lambda x: x and x.startswith('INF'))
+            if download:
+                return tagged(export_response(snapshot, params, download), etag)
             
-            # Define lists to hold each attribute
-            scheme_names = []
-            plans = []
-            categories = []
-            crisil_ranks = []
-            aum_cr = []
-            one_weeks = []
-            one_months = []
-            three_months = []
-            six_months = []
-            ytds = []
-            one_years = []
-            two_years = []
-            three_years = []
-            five_years = []
-            ten_years = []
-            
-            for row in rows:
-                columns = row.find_all('td')
-                
-                if len(columns) < 15:  # Ensure there are enough columns
-                    continue
-                
-                # Append the data to respective lists
-                scheme_names.append(columns[0].text.strip())
-                plans.append(columns[1].text.strip() if len(columns) > 1 else 'N/A')
-                categories.append(columns[2].text.strip() if len(columns) > 2 else 'N/A')
-                crisil_ranks.append(columns[3].text.strip() if len(columns) > 3 else 'N/A')
-                aum_cr.append(columns[4].text.strip() if len(columns) > 4 else 'N/A')
-                one_weeks.append(columns[5].text.strip() if len(columns) > 5 else 'N/A')
-                one_months.append(columns[6].text.strip() if len(columns) > 6 else 'N/A')
-                three_months.append(columns[7].text.strip() if len(columns) > 7 else 'N/A')
-                six_months.append(columns[8].text.strip() if len(columns) > 8 else 'N/A')
-                ytds.append(columns[9].text.strip() if len(columns) > 9 else 'N/A')
-                one_years.append(columns[10].text.strip() if len(columns) > 10 else 'N/A')
-                two_years.append(columns[11].text.strip() if len(columns) > 11 else 'N/A')
-                three_years.append(columns[12].text.strip() if len(columns) > 12 else 'N/A')
-                five_years.append(columns[13].text.strip() if len(columns) > 13 else 'N/A')
-                ten_years.append(columns[14].text.strip() if len(columns) > 14 else 'N/A')
-            
-            # Create a DataFrame with the data
-            df = pd.DataFrame({
-                'Scheme Name': scheme_names,
-                'Plan': plans,
-                'Category Name': categories,
-                'Crisil Rank': crisil_ranks,
-                'AuM (Cr)': aum_cr,
-                '1W': one_weeks,
-                '1M': one_months,
-                '3M': three_months,
-                '6M': six_months,
-                'YTD': ytds,
-                '1Y': one_years,
-                '2Y': two_years,
-                '3Y': three_years,
-                '5Y': five_years,
-                '10Y': ten_years
-            })
-            
-            # Check if the user wants to download the data as a CSV file
-            if 'download' in request.query_params and request.query_params['download'].lower() == 'true':
-                csv_buffer = io.StringIO()
-                df.to_csv(csv_buffer, index=False)
-                csv_buffer.seek(0)
-                response = HttpResponse(csv_buffer, content_type='text/csv')
-                response['Content-Disposition'] = 'attachment; filename=mutual_funds.csv'
-                return response
+            with span('query'):
+                payload = funds_payload(snapshot, params)
+            if not payload['data'] and 'next' not in payload:
+                return Response({"error": "No valid data found"}, status=status.HTTP_204_NO_CONTENT)
             
-            funds_data = df.to_dict(orient='records')
+            return tagged(Response(payload, status=status.HTTP_200_OK), etag)
+        
+        except (ScreenerError, ExportError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": f"Error reading the data: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def _async_chunks(chunks):
+    # The export generator reads the database, so it is advanced in the sync thread
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, None)) is not None:
+        yield chunk
+
+
+class AsyncMutualFundsView(AsyncAPIView):
+    """MutualFundsView for ASGI workers; a first-time scrape uses the pooled async client."""
+
+    async def get(self, request):
+        try:
+            with span('snapshot'):
+                snapshot = await aensure_snapshot()
+        except UPSTREAM_ERRORS as e:
+            return self.error(f"Request failed: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except FundParseError as e:
+            return self.error(f"Error parsing the data: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        params = request.GET
+        download = download_format(params)
+        etag = funds_etag(snapshot, params)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            if download:
+                response = await sync_to_async(export_response)(snapshot, params, download)
+                response.streaming_content = _async_chunks(response.streaming_content)
+                return tagged(response, etag)
             
-            if not funds_data:
-                return Response({"error": "No valid data found"}, status=status.HTTP_204_NO_CONTENT)
+            with span('query'):
+                payload = await sync_to_async(funds_payload)(snapshot, params)
+            if not payload['data'] and 'next' not in payload:
+                return self.error("No valid data found", status.HTTP_204_NO_CONTENT)
             
-            return Response({
-                "data": funds_data
-            }, status=status.HTTP_200_OK)
+            with span('render'):
+                response = JSONBytesResponse(payload, status=status.HTTP_200_OK)
+            return tagged(response, etag)
         
+        except (ScreenerError, ExportError) as e:
+            return self.error(str(e))
         except Exception as e:
-            return Response({"error": f"Error parsing the data: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return self.error(f"Error reading the data: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SIPView(APIView):
+    """Closed-form SIP projections; list-valued inputs are expanded into a scenario grid."""
+
+    @rate_limit('sip_api', limit=60, period=60)
+    def post(self, request):
+        try:
+            grid = parse_grid(request.data)
+            # Year-by-year breakdowns are on by default for a single scenario
+            yearly = parse_flag(request.data, 'yearly', len(grid['years']) == 1)
+        except SIPError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({"scenarios": project(grid, yearly=yearly)}, status=status.HTTP_200_OK)
+
+
+class SIPMonteCarloView(APIView):
+    @rate_limit('sip_monte_carlo_api', limit=20, period=60)
+    def post(self, request):
+        try:
+            options = parse_monte_carlo(request.data)
+        except SIPError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        started = time.perf_counter()
+        result = monte_carlo(**options)
+        result['tookMs'] = round((time.perf_counter() - started) * 1000, 3)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class XIRRView(APIView):
+    @rate_limit('xirr_api', limit=60, period=60)
+    def post(self, request):
+        try:
+            rate = xirr(request.data.get('cashflows'))
+        except SIPError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        if rate is None:
+            return Response({"error": "XIRR did not converge for these cash flows"}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response({"xirr": rate}, status=status.HTTP_200_OK)
+
 
+class NAVAnalyticsView(APIView):
+    """Trailing and rolling returns, SIP returns and risk metrics from the stored NAV history."""
+
+    @rate_limit('nav_analytics_api', limit=60, period=60)
+    def get(self, request):
+        try:
+            options, schemes, sort_keys, limit = parse_analytics_params(request.query_params)
+        except NAVError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        started = time.perf_counter()
+        panel, records = nav_analytics(**options)
+        if not records:
+            return Response({"error": "No NAV history has been loaded"}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            "count": len(records),
+            "asOf": str(panel.dates[-1]),
+            "data": select_records(records, schemes, sort_keys, limit),
+            "tookMs": round((time.perf_counter() - started) * 1000, 3),
+        }, status=status.HTTP_200_OK)
+
+
+class NAVHistoryView(APIView):
+    def get(self, request, scheme):
+        navs = get_nav_store().read(scheme)
+        try:
+            if request.query_params.get('start'):
+                navs = navs[navs['date'] >= np.datetime64(request.query_params['start'], 'D')]
+            if request.query_params.get('end'):
+                navs = navs[navs['date'] <= np.datetime64(request.query_params['end'], 'D')]
+        except ValueError:
+            return Response({"error": "start and end must be dates in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+        if not len(navs):
+            return Response({"error": "No NAV history for this scheme"}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            "scheme": scheme,
+            "name": get_nav_store().read_names().get(scheme, ''),
+            "data": [{"date": str(day), "nav": float(nav)} for day, nav in zip(navs['date'], navs['nav'])],
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,424 @@
+"""
+Vectorized backtests of indicator rules over stored daily bars.
+
+Closes for all symbols are aligned into one (symbols x days) matrix.  Every
+indicator is computed for the whole history with array operations:
+
+* moving averages and Bollinger bands come from cumulative sums
+* EMAs (MACD, signal line) and Wilder's RSI smoothing come from ``ema``.  It
+  solves the recursion in closed form one block of EMA_BLOCK days at a time,
+  so the Python loop runs once per block, not once per bar.
+
+Values match IndicatorState bar for bar.
+
+A strategy turns the indicators into a target position of 0 or 1 per symbol
+and day.  Rules with separate entry and exit conditions hold the position in
+between by forward-filling.  The target decided at a close is traded at the
+next bar, and every position change pays ``cost_bps``.  Built-in strategies:
+
+* ``ma_crossover``: long while SMA(fast) > SMA(slow)
+* ``rsi``: enter below ``lower``, exit above ``upper``
+* ``macd``: long while MACD > SignalLine
+* ``expression``: screener-style ``entry`` (and optional ``exit``)
+  expressions over Close, the indicator columns and any ``SMA<n>``/``EMA<n>``
+
+Results give each symbol's return, CAGR, volatility, Sharpe ratio, max
+drawdown and trade stats.  They also give the equal-weighted portfolio of all
+symbols.  Symbols are processed CHUNK_SYMBOLS at a time to bound memory.
+"""
+import re
+
+import numpy as np
+
+from .indicators import (
+    BOLLINGER_PERIOD, BOLLINGER_WIDTH, INDICATOR_NAMES, MACD_FAST, MACD_SIGNAL, MACD_SLOW,
+    MA_LONG, MA_SHORT, RSI_PERIOD, align_closes,
+)
+from .market_data import get_price_store
+from .screener import ScreenExpressionError, compile_expression, universe_symbols
+
+TRADING_DAYS = 252
+CHUNK_SYMBOLS = 256
+EMA_BLOCK = 128
+DEFAULT_COST_BPS = 10
+MAX_PERIOD = 500
+
+_DYNAMIC_COLUMN = re.compile(r'\b(SMA|EMA)(\d+)\b')
+
+
+class BacktestError(ValueError):
+    pass
+
+
+def forward_fill(values):
+    """Carry the last valid value forward along each row; leading NaNs stay NaN."""
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(len(values))[:, None], index]
+
+
+def left_align(values):
+    """Shift each row left so its first valid value is in column 0.
+
+    Returns the shifted rows and each row's original start column.  The shifted
+    tail repeats the row's last value, which cannot affect earlier columns of
+    causal indicators.
+    """
+    n_rows, n_cols = values.shape
+    valid = ~np.isnan(values)
+    starts = np.where(valid.any(axis=1), valid.argmax(axis=1), n_cols)
+    columns = np.minimum(np.arange(n_cols)[None, :] + starts[:, None], n_cols - 1)
+    return values[np.arange(n_rows)[:, None], columns], starts
+
+
+def restore(aligned, starts):
+    """Inverse of ``left_align``; columns before a row's start become NaN."""
+    n_rows, n_cols = aligned.shape
+    columns = np.arange(n_cols)[None, :] - starts[:, None]
+    restored = aligned[np.arange(n_rows)[:, None], np.clip(columns, 0, n_cols - 1)]
+    restored[columns < 0] = np.nan
+    return restored
+
+
+def ema(values, alpha, initial=None):
+    """``y[t] = y[t-1] + alpha * (x[t] - y[t-1])`` along each row, seeded with ``initial`` or ``x[:, 0]``.
+
+    Within a block ``y[j] = d**(j+1) * (y[-1] + alpha * sum(x[i] / d**(i+1) for i <= j))``
+    with ``d = 1 - alpha``, which is one cumulative sum per block.
+    """
+    if alpha == 1:
+        # EMA1 is the series itself; the block formula would divide by 0 ** n
+        return values.copy()
+    decay = 1.0 - alpha
+    out = np.empty_like(values)
+    previous = values[:, 0] if initial is None else initial
+    for start in range(0, values.shape[1], EMA_BLOCK):
+        block = values[:, start:start + EMA_BLOCK]
+        powers = decay ** np.arange(1, block.shape[1] + 1)
+        result = powers * (previous[:, None] + alpha * np.cumsum(block / powers, axis=1))
+        out[:, start:start + EMA_BLOCK] = result
+        previous = result[:, -1]
+    return out
+
+
+def rolling_mean(values, window):
+    sums = np.cumsum(values, axis=1)
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        out[:, window - 1] = sums[:, window - 1]
+        out[:, window:] = sums[:, window:] - sums[:, :-window]
+    return out / window
+
+
+class IndicatorSeries(dict):
+    """Full-history indicator matrices for a block of closes, computed on first use.
+
+    Keys are the IndicatorState names plus ``Close``, ``SMA<n>`` and ``EMA<n>``.
+    """
+
+    def __init__(self, closes):
+        super().__init__(Close=closes)
+        self.aligned, self.starts = left_align(closes)
+        self.count = np.arange(closes.shape[1]) + 1
+
+    def _ready(self, values, bars):
+        # NaN until a row has seen ``bars`` bars, the same as IndicatorState.snapshot
+        values = values.copy()
+        values[:, self.count < bars] = np.nan
+        return restore(values, self.starts)
+
+    def sma(self, window):
+        return self[f'SMA{window}']
+
+    def __missing__(self, name):
+        self[name] = value = self._compute(name)
+        return value
+
+    def _compute(self, name):
+        closes = self.aligned
+        dynamic = _DYNAMIC_COLUMN.fullmatch(name)
+        if dynamic:
+            kind, window = dynamic.group(1), int(dynamic.group(2))
+            if kind == 'SMA':
+                return restore(rolling_mean(closes, window), self.starts)
+            return self._ready(ema(closes, 2 / (window + 1)), window)
+        if name == 'MA50':
+            return self.sma(MA_SHORT)
+        if name == 'MA200':
+            return self.sma(MA_LONG)
+        if name in ('MACD', 'SignalLine'):
+            macd = ema(closes, 2 / (MACD_FAST + 1)) - ema(closes, 2 / (MACD_SLOW + 1))
+            self['MACD'] = self._ready(macd, MACD_SLOW)
+            self['SignalLine'] = self._ready(ema(macd, 2 / (MACD_SIGNAL + 1)), MACD_SLOW + MACD_SIGNAL - 1)
+            return self[name]
+        if name == 'RSI':
+            return self._ready(self._rsi(closes), RSI_PERIOD + 1)
+        if name.startswith('Bollinger'):
+            middle = rolling_mean(closes, BOLLINGER_PERIOD)
+            mean_square = rolling_mean(closes * closes, BOLLINGER_PERIOD)
+            width = BOLLINGER_WIDTH * np.sqrt(np.maximum(mean_square - middle ** 2, 0.0))
+            self['BollingerMiddle'] = restore(middle, self.starts)
+            self['BollingerUpper'] = restore(middle + width, self.starts)
+            self['BollingerLower'] = restore(middle - width, self.starts)
+            return self[name]
+        raise KeyError(name)
+
+    @staticmethod
+    def _rsi(closes):
+        # Averages of the first RSI_PERIOD changes, then Wilder smoothing
+        delta = np.diff(closes, axis=1)
+        averages = []
+        for moves in (np.maximum(delta, 0.0), np.maximum(-delta, 0.0)):
+            average = np.cumsum(moves, axis=1) / np.arange(1, moves.shape[1] + 1)
+            if moves.shape[1] > RSI_PERIOD:
+                seed = average[:, RSI_PERIOD - 1]
+                average[:, RSI_PERIOD:] = ema(moves[:, RSI_PERIOD:], 1 / RSI_PERIOD, initial=seed)
+            averages.append(average)
+        gain, loss = averages
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+        rsi = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), rsi)
+        return np.concatenate([np.full((len(closes), 1), np.nan), rsi], axis=1)
+
+
+def hold(entries, exits):
+    """Position 1 from an entry until the next exit (exits win on the same day)."""
+    signal = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    return np.nan_to_num(forward_fill(signal), nan=0.0)
+
+
+def ma_crossover(series, fast=MA_SHORT, slow=MA_LONG):
+    return (series.sma(fast) > series.sma(slow)).astype(float)
+
+
+def rsi_reversion(series, lower=30, upper=70):
+    rsi = series['RSI']
+    return hold(rsi < lower, rsi > upper)
+
+
+def macd_cross(series):
+    return (series['MACD'] > series['SignalLine']).astype(float)
+
+
+def expression_rule(series, entry, exit=None):
+    columns = expression_columns(entry, exit)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        entries = np.broadcast_to(compile_expression(entry, columns)(series), series['Close'].shape)
+        if exit is None:
+            return entries.astype(float)
+        return hold(entries, compile_expression(exit, columns)(series))
+
+
+STRATEGIES = {
+    # name: (rule, parameter defaults)
+    'ma_crossover': (ma_crossover, {'fast': MA_SHORT, 'slow': MA_LONG}),
+    'rsi': (rsi_reversion, {'lower': 30, 'upper': 70}),
+    'macd': (macd_cross, {}),
+    'expression': (expression_rule, {'entry': None, 'exit': None}),
+}
+
+
+def expression_columns(*expressions):
+    names = {'Close', *INDICATOR_NAMES}
+    for expression in expressions:
+        for kind, window in _DYNAMIC_COLUMN.findall(expression or ''):
+            if not 1 <= int(window) <= MAX_PERIOD:
+                raise BacktestError(f'{kind} period must be between 1 and {MAX_PERIOD}')
+            names.add(f'{kind}{int(window)}')
+    return frozenset(names)
+
+
+def strategy_params(strategy, params):
+    """Validated parameters for ``strategy`` with defaults filled in."""
+    if not isinstance(strategy, str) or strategy not in STRATEGIES:
+        raise BacktestError(f"Unknown strategy {strategy}; use one of {', '.join(STRATEGIES)}")
+    rule, defaults = STRATEGIES[strategy]
+    params = dict(params or {})
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise BacktestError(f"Unknown parameters for {strategy}: {', '.join(sorted(unknown))}")
+    merged = dict(defaults, **params)
+
+    if strategy == 'expression':
+        if not merged['entry']:
+            raise BacktestError('expression strategies need an entry expression')
+        try:
+            columns = expression_columns(merged['entry'], merged['exit'])
+            for expression in (merged['entry'], merged['exit']):
+                if expression:
+                    compile_expression(expression, columns)
+        except ScreenExpressionError as e:
+            raise BacktestError(str(e))
+        return merged
+
+    try:
+        merged = {name: float(value) for name, value in merged.items()}
+    except (TypeError, ValueError):
+        raise BacktestError(f'Parameters for {strategy} must be numbers')
+    if strategy == 'ma_crossover':
+        merged = {name: int(value) for name, value in merged.items()}
+        if not 1 <= merged['fast'] < merged['slow'] <= MAX_PERIOD:
+            raise BacktestError(f'ma_crossover needs 1 <= fast < slow <= {MAX_PERIOD}')
+    if strategy == 'rsi' and not 0 <= merged['lower'] < merged['upper'] <= 100:
+        raise BacktestError('rsi needs 0 <= lower < upper <= 100')
+    return merged
+
+
+def simulate(closes, target, cost):
+    """Daily strategy returns for next-bar execution of ``target`` positions."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.zeros(closes.shape)
+        returns[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    position = np.zeros(closes.shape)
+    position[:, 1:] = target[:, :-1]
+    turnover = np.abs(np.diff(position, axis=1, prepend=0.0))
+    return position, position * returns - turnover * cost
+
+
+def performance(returns, active):
+    """Return, risk and drawdown statistics per row of daily ``returns``; ``active`` marks counted days."""
+    returns = np.where(active, returns, 0.0)
+    days = active.sum(axis=1)
+    equity = np.cumprod(1 + returns, axis=1)
+    total = equity[:, -1] - 1
+    years = np.maximum(days, 1) / TRADING_DAYS
+
+    mean = returns.sum(axis=1) / np.maximum(days, 1)
+    variance = np.where(active, (returns - mean[:, None]) ** 2, 0.0).sum(axis=1) / np.maximum(days - 1, 1)
+    volatility = np.sqrt(variance * TRADING_DAYS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cagr = np.where(total > -1, (1 + total) ** (1 / years) - 1, -1.0)
+        sharpe = np.where(volatility > 0, mean * TRADING_DAYS / volatility, np.nan)
+    drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1).min(axis=1)
+    return {
+        'days': days,
+        'totalReturn': total * 100,
+        'cagr': cagr * 100,
+        'volatility': volatility * 100,
+        'sharpe': sharpe,
+        'maxDrawdown': drawdown * 100,
+    }, equity
+
+
+def trade_stats(position, returns, active):
+    """Trade count, win rate, average trade return and exposure per row; open trades are marked to the end."""
+    held = position > 0
+    previous = np.zeros_like(held)
+    previous[:, 1:] = held[:, :-1]
+    entries = held & ~previous
+    n_trades = entries.sum(axis=1)
+    total_trades = int(n_trades.sum())
+
+    # Trades are numbered across all rows; a trade owns its holding days plus
+    # the exit day, which pays the exit cost
+    in_trade = held | previous
+    trade_id = np.cumsum(entries, axis=1) + (np.cumsum(n_trades) - n_trades - 1)[:, None]
+    trade_returns = np.expm1(np.bincount(
+        trade_id[in_trade], weights=np.log1p(returns[in_trade]), minlength=total_trades,
+    ))
+    owner = np.repeat(np.arange(len(position)), n_trades)
+    wins = np.bincount(owner, weights=(trade_returns > 0).astype(float), minlength=len(position))
+    sums = np.bincount(owner, weights=trade_returns, minlength=len(position))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'trades': n_trades,
+            'winRate': np.where(n_trades > 0, wins / n_trades * 100, np.nan),
+            'avgTradeReturn': np.where(n_trades > 0, sums / n_trades * 100, np.nan),
+            'exposure': (held & active).sum(axis=1) / np.maximum(active.sum(axis=1), 1) * 100,
+        }
+
+
+def _round(value, digits=4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def stored_histories(symbols=None, store=None):
+    """``{symbol: bars}`` from the PriceStore; symbols without stored bars are left out."""
+    store = store or get_price_store()
+    histories = {}
+    for symbol in symbols or universe_symbols():
+        bars = store.read_bars(symbol)
+        if len(bars):
+            histories[symbol] = bars
+    return histories
+
+
+def run_backtest(histories, strategy, params=None, cost_bps=DEFAULT_COST_BPS, start=None, end=None):
+    """Backtest ``strategy`` over ``{symbol: bars}``.
+
+    Bars before ``start`` only warm up the indicators; positions, returns and
+    trades are counted from ``start`` to ``end``.
+    """
+    params = strategy_params(strategy, params)
+    rule = STRATEGIES[strategy][0]
+    symbols, dates, closes = align_closes(histories)
+    if not len(dates):
+        raise BacktestError('No stored bars for these symbols')
+    closes = forward_fill(closes)
+    window = np.ones(len(dates), dtype=bool)
+    if start:
+        window &= dates >= np.datetime64(start, 'D')
+    if end:
+        window &= dates <= np.datetime64(end, 'D')
+    if not window.any():
+        raise BacktestError('No bars in the requested date range')
+    first, last = np.flatnonzero(window)[[0, -1]]
+
+    results = []
+    portfolio_sum = np.zeros(last - first + 1)
+    portfolio_count = np.zeros(last - first + 1)
+    for offset in range(0, len(symbols), CHUNK_SYMBOLS):
+        block = closes[offset:offset + CHUNK_SYMBOLS, :last + 1]
+        series = IndicatorSeries(block)
+        with np.errstate(invalid='ignore'):
+            target = np.nan_to_num(rule(series, **params), nan=0.0)
+        target[np.isnan(block)] = 0.0
+        target[:, :first] = 0.0
+
+        position, returns = simulate(block, target, cost_bps / 10000)
+        position, returns, block = position[:, first:], returns[:, first:], block[:, first:]
+        active = ~np.isnan(block)
+        # A symbol's first day in the window has no return yet
+        active[:, 0] = False
+        stats, _ = performance(returns, active)
+        trades = trade_stats(position, returns, active)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            first_close = block[np.arange(len(block)), np.argmax(~np.isnan(block), axis=1)]
+            buy_and_hold = (block[:, -1] / first_close - 1) * 100
+
+        portfolio_sum += np.where(active, returns, 0.0).sum(axis=0)
+        portfolio_count += active.sum(axis=0)
+        for row, symbol in enumerate(symbols[offset:offset + CHUNK_SYMBOLS]):
+            record = {'symbol': symbol}
+            record.update({name: _round(values[row]) for name, values in stats.items()})
+            record.update({name: _round(values[row]) for name, values in trades.items()})
+            record['days'] = int(stats['days'][row])
+            record['trades'] = int(trades['trades'][row])
+            record['buyAndHoldReturn'] = _round(buy_and_hold[row])
+            results.append(record)
+
+    # Equal weight across the symbols trading each day, rebalanced daily
+    portfolio_active = portfolio_count > 0
+    portfolio_returns = np.where(portfolio_active, portfolio_sum / np.maximum(portfolio_count, 1), 0.0)
+    stats, equity = performance(portfolio_returns[None, :], portfolio_active[None, :])
+    portfolio = {name: _round(values[0]) for name, values in stats.items()}
+    portfolio['days'] = int(stats['days'][0])
+    portfolio['equity'] = [
+        {'date': str(day), 'value': round(float(value), 6)}
+        for day, value in zip(dates[first:last + 1], equity[0])
+    ]
+
+    results.sort(key=lambda record: -np.inf if record['totalReturn'] is None else record['totalReturn'], reverse=True)
+    return {
+        'strategy': strategy,
+        'params': params,
+        'costBps': cost_bps,
+        'start': str(dates[first]),
+        'end': str(dates[last]),
+        'symbols': len(symbols),
+        'portfolio': portfolio,
+        'results': results,
+    }
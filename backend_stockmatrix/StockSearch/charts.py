@@ -0,0 +1,245 @@
+"""
+Price chart images rendered off the request path.
+
+A chart is identified by a hash of the symbol, the date range, the indicator
+set and the bars themselves, so its image never changes once rendered and can
+be served with a long-lived Cache-Control header.  Building the stock payload
+only writes a small ``<key>.npz`` spec next to the images and queues the
+render in a process pool running matplotlib's Agg backend.
+``ChartImageView`` serves ``<key>.png``; if it is not there yet it queues the
+render from the spec (on any worker) and answers 503 with ``Retry-After``
+rather than holding a request thread for the render.  Repeat views are a file
+lookup.
+
+The last bar of a trading day keeps moving, so every refresh produces a new
+key.  After each render the directory is swept: charts older than ``MAX_AGE``
+seconds go, then the oldest beyond ``MAX_CHARTS``.  A chart is never swept
+while a cached stock payload may still link to it, i.e. for the stock
+response cache's ``TTL + STALE_TTL``.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.urls import reverse
+
+from backend_stockmatrix.response_cache import DEFAULT_NAMESPACE_SETTINGS, response_cache_setting
+from backend_stockmatrix.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CHART_INDICATORS = ('MA50', 'MA200', 'Bollinger')
+
+DEFAULTS = {
+    'IMAGE_DIR': '.cache/charts',
+    'DAYS': 180,
+    'WORKERS': 2,
+    'RENDER_TIMEOUT': 30,
+    'MAX_CHARTS': 2000,
+    'MAX_AGE': 7 * 24 * 3600,
+    'RETRY_AFTER': 2,
+}
+
+chart_flight = SingleFlight('charts')
+_render_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='chart-render')
+# Keys with a background render queued or running in this process
+_queued = set()
+_queued_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chart_setting(name):
+    value = getattr(settings, 'CHARTS', {}).get(name, DEFAULTS[name])
+    if name.endswith('_DIR'):
+        return Path(settings.BASE_DIR) / value
+    return value
+
+
+def _rolling_mean(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def _rolling_std(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1:] = windows.std(axis=1)
+    return out
+
+
+def render_chart(spec_path, image_path):
+    """Render the chart described by ``spec_path`` to ``image_path`` (runs in a pool process)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with np.load(spec_path) as spec:
+        dates, closes = spec['dates'], spec['closes']
+        indicators, title, days = [str(name) for name in spec['indicators']], str(spec['title']), int(spec['days'])
+
+    # Indicators are computed over the full history, then cut to the displayed range
+    shown = slice(max(len(closes) - days, 0), None)
+    fig, ax = plt.subplots(figsize=(10, 5), dpi=100)
+    ax.plot(dates[shown], closes[shown], label='Close', color='#1f77b4', linewidth=1.5)
+    if 'MA50' in indicators:
+        ax.plot(dates[shown], _rolling_mean(closes, 50)[shown], label='MA50', color='#ff7f0e', linewidth=1)
+    if 'MA200' in indicators:
+        ax.plot(dates[shown], _rolling_mean(closes, 200)[shown], label='MA200', color='#2ca02c', linewidth=1)
+    if 'Bollinger' in indicators:
+        middle, width = _rolling_mean(closes, 20), 2 * _rolling_std(closes, 20)
+        ax.fill_between(dates[shown], (middle - width)[shown], (middle + width)[shown],
+                        color='#7f7f7f', alpha=0.15, label='Bollinger Bands')
+    ax.set_title(title)
+    ax.set_ylabel('Price')
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='upper left')
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    tmp_path = f'{image_path}.{os.getpid()}.tmp'
+    fig.savefig(tmp_path, format='png')
+    plt.close(fig)
+    os.replace(tmp_path, image_path)
+    return str(image_path)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a threaded server process can copy locks held by other threads
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(
+                max_workers=chart_setting('WORKERS'), mp_context=multiprocessing.get_context(method),
+            )
+        return _pool
+
+
+def chart_key(symbol, bars, indicators=CHART_INDICATORS):
+    digest = hashlib.sha256()
+    digest.update(f"{symbol}|{bars['date'][0]}|{bars['date'][-1]}|{','.join(sorted(indicators))}|".encode())
+    digest.update(np.ascontiguousarray(bars['close']).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def chart_paths(key):
+    directory = chart_setting('IMAGE_DIR')
+    return directory / f'{key}.npz', directory / f'{key}.png'
+
+
+def payload_lifetime():
+    """Seconds a cached stock payload, and so its chart URL, may still be served."""
+    options = dict(DEFAULT_NAMESPACE_SETTINGS, **response_cache_setting('stock', {}))
+    return options['TTL'] + options['STALE_TTL']
+
+
+def prune_charts(now=None):
+    """Delete charts older than MAX_AGE, then the oldest beyond MAX_CHARTS; returns the number deleted.
+
+    Charts younger than ``payload_lifetime()`` are kept even beyond MAX_CHARTS.
+    """
+    directory = chart_setting('IMAGE_DIR')
+    now = time.time() if now is None else now
+    charts = {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        key, suffix = os.path.splitext(entry.name)
+        if suffix not in ('.npz', '.png') or key.startswith('.'):
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        # A chart is as old as its spec, the first of its files to be written
+        charts[key] = min(mtime, charts.get(key, mtime))
+
+    by_age = sorted(charts, key=charts.get)
+    min_age = payload_lifetime()
+    expired = [key for key in by_age if now - charts[key] > max(chart_setting('MAX_AGE'), min_age)]
+    live = by_age[len(expired):]
+    excess = [key for key in live if now - charts[key] > min_age][:max(len(live) - chart_setting('MAX_CHARTS'), 0)]
+    stale = expired + excess
+    for key in stale:
+        for path in chart_paths(key):
+            path.unlink(missing_ok=True)
+    return len(stale)
+
+
+def render(key):
+    """Render ``key`` from its spec if the image does not exist yet; coalesced per key."""
+    spec_path, image_path = chart_paths(key)
+    if image_path.exists():
+        return image_path
+    if not spec_path.exists():
+        return None
+
+    def run():
+        if not image_path.exists():
+            _get_pool().submit(render_chart, str(spec_path), str(image_path)).result(
+                timeout=chart_setting('RENDER_TIMEOUT')
+            )
+            prune_charts()
+        return image_path
+    return chart_flight.do(key, run)
+
+
+def _render_in_background(key):
+    try:
+        render(key)
+    except Exception as e:
+        logger.error(f"Chart render failed for {key}: {str(e)}")
+    finally:
+        with _queued_lock:
+            _queued.discard(key)
+
+
+def queue_render(key):
+    """Queue a background render of ``key``; False if there is no spec to render it from."""
+    spec_path, image_path = chart_paths(key)
+    if not spec_path.exists():
+        return image_path.exists()
+    with _queued_lock:
+        if key in _queued:
+            return True
+        _queued.add(key)
+    _render_executor.submit(_render_in_background, key)
+    return True
+
+
+def chart_url(symbol, bars, title=None, indicators=CHART_INDICATORS):
+    """URL of the chart image for ``bars``, queueing the render if it does not exist yet."""
+    if not len(bars):
+        return ''
+    # Keep enough history for MA200 to be defined across the displayed range
+    days = chart_setting('DAYS')
+    bars = bars[-(days + 200):]
+    key = chart_key(symbol, bars, indicators)
+    spec_path, image_path = chart_paths(key)
+
+    if not image_path.exists() and not spec_path.exists():
+        spec_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = spec_path.with_name(f'.{key}.{os.getpid()}.{threading.get_ident()}.npz')
+        np.savez(
+            tmp_path,
+            dates=bars['date'], closes=bars['close'], indicators=np.array(indicators),
+            title=np.array(title or symbol), days=np.array(days),
+        )
+        os.replace(tmp_path, spec_path)
+        queue_render(key)
+
+    return reverse('stock-chart', args=[key])
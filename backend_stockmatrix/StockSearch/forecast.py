@@ -0,0 +1,240 @@
+"""
+Daily price-forecast models.
+
+Each symbol gets one log-linear trend model per trading day, fitted on the
+last ``LOOKBACK_DAYS`` completed closes: ``log(close) = intercept + slope * t``
+with ``t = 0`` at the as-of bar.  Fitting is closed-form least squares done
+for every symbol at once on a ``(symbols, lookback)`` matrix, and the fitted
+parameters are saved per as-of date so requests only evaluate them.
+
+Models are normally fitted in bulk by ``manage.py fit_forecasts`` after market
+close.  A request for a symbol without a model for its latest completed bar
+gets a flat ``pending`` forecast and schedules a fit in the background.
+"""
+import fcntl
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from backend_stockmatrix.singleflight import SingleFlight
+from .market_data import get_price_store
+
+logger = logging.getLogger(__name__)
+
+MODEL_DTYPE = np.dtype([
+    ('symbol', 'U32'),
+    ('as_of', 'datetime64[D]'),
+    ('intercept', 'f8'),
+    ('slope', 'f8'),
+    ('sigma', 'f8'),
+    ('observations', 'i4'),
+])
+
+DEFAULTS = {
+    'MODEL_DIR': 'market_data/forecasts',
+    'LOOKBACK_DAYS': 120,
+    'MIN_OBSERVATIONS': 20,
+    'HORIZON_DAYS': 30,
+}
+
+forecast_flight = SingleFlight('forecast')
+_fit_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='forecast-fit')
+
+
+def forecast_setting(name):
+    value = getattr(settings, 'FORECAST', {}).get(name, DEFAULTS[name])
+    if name.endswith('_DIR'):
+        return Path(settings.BASE_DIR) / value
+    return value
+
+
+def recent_closes(histories, lookback):
+    """Right-aligned ``(len(histories), lookback)`` matrix of the last completed closes.
+
+    The latest bar of each history is treated as still moving and left out.
+    Rows with fewer bars are NaN-padded on the left.
+    """
+    closes = np.full((len(histories), lookback), np.nan)
+    for row, bars in enumerate(histories):
+        completed = bars['close'][:-1][-lookback:]
+        if len(completed):
+            closes[row, lookback - len(completed):] = completed
+    return closes
+
+
+def fit_models(closes, min_observations=None):
+    """Fit every row of ``closes`` at once.
+
+    Returns ``(intercept, slope, sigma, observations)`` arrays; rows with
+    fewer than ``min_observations`` valid closes get NaN parameters.
+    """
+    min_observations = min_observations or forecast_setting('MIN_OBSERVATIONS')
+    lookback = closes.shape[1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log(closes)
+    valid = np.isfinite(y)
+    y = np.where(valid, y, 0.0)
+    x = np.where(valid, np.arange(1 - lookback, 1, dtype='f8'), 0.0)
+
+    n = valid.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+        residuals = np.where(valid, y - intercept[:, None] - slope[:, None] * x, 0.0)
+        sigma = np.sqrt((residuals * residuals).sum(axis=1) / (n - 2))
+
+    ready = n >= max(min_observations, 3)
+    nan = np.nan
+    return np.where(ready, intercept, nan), np.where(ready, slope, nan), np.where(ready, sigma, nan), n
+
+
+def forecast_dates(start, horizon):
+    """The ``horizon`` trading days after ``start``."""
+    return np.busday_offset(np.datetime64(start, 'D'), np.arange(1, horizon + 1), roll='forward')
+
+
+def predict(model, horizon, start=None):
+    """Forecast closes for the ``horizon`` trading days after ``start``.
+
+    ``start`` defaults to ``model['as_of']``; a later start (the still-moving
+    latest bar) evaluates the trend that many trading days further out.
+    """
+    dates = forecast_dates(model['as_of'] if start is None else start, horizon)
+    steps = np.busday_count(model['as_of'], dates)
+    prices = np.exp(model['intercept'] + model['slope'] * steps)
+    return prices, dates
+
+
+class ForecastStore:
+    """Fitted models in one ``<as_of>.npy`` file per trading day.
+
+    Loaded days are kept in memory as ``{symbol: model}`` and reloaded when
+    another worker rewrites the file.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def _path(self, as_of):
+        return self.directory / f'{as_of}.npy'
+
+    def _load(self, as_of):
+        path = self._path(as_of)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            cached = self._days.get(as_of)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            models = np.load(path)
+        except (FileNotFoundError, ValueError):
+            return {}
+        day = {str(model['symbol']): model for model in models}
+        with self._lock:
+            self._days[as_of] = (mtime, day)
+            # Only the most recent trading days are ever asked for
+            for stale in sorted(self._days)[:-3]:
+                del self._days[stale]
+        return day
+
+    def get(self, symbol, as_of):
+        return self._load(np.datetime64(as_of, 'D')).get(symbol)
+
+    def save(self, models):
+        """Merge ``models`` (a MODEL_DTYPE array) into their as-of day files."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for as_of in np.unique(models['as_of']):
+            day_models = models[models['as_of'] == as_of]
+            path = self._path(as_of)
+            with open(self.directory / '.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    existing = np.load(path)
+                    existing = existing[~np.isin(existing['symbol'], day_models['symbol'])]
+                    day_models = np.concatenate([existing, day_models])
+                except (FileNotFoundError, ValueError):
+                    pass
+                tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, np.sort(day_models, order='symbol'))
+                os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=None)
+def get_forecast_store():
+    return ForecastStore(forecast_setting('MODEL_DIR'))
+
+
+def fit_histories(histories, lookback=None):
+    """Fit ``{symbol: bars}`` in one batch; returns a MODEL_DTYPE array."""
+    lookback = lookback or forecast_setting('LOOKBACK_DAYS')
+    histories = {symbol: bars for symbol, bars in histories.items() if len(bars) > 1}
+    intercept, slope, sigma, observations = fit_models(recent_closes(list(histories.values()), lookback))
+
+    models = np.empty(len(histories), dtype=MODEL_DTYPE)
+    models['symbol'] = list(histories)
+    models['as_of'] = [bars['date'][-2] for bars in histories.values()]
+    models['intercept'], models['slope'], models['sigma'] = intercept, slope, sigma
+    models['observations'] = observations
+    return models[np.isfinite(models['slope'])]
+
+
+def fit_symbols(symbols, store=None, forecast_store=None):
+    """Fit and save models for ``symbols`` from the bars already in the PriceStore."""
+    store = store or get_price_store()
+    forecast_store = forecast_store or get_forecast_store()
+    models = fit_histories({symbol: store.read_bars(symbol) for symbol in symbols})
+    if len(models):
+        forecast_store.save(models)
+    return models
+
+
+def _fit_in_background(symbol):
+    try:
+        forecast_flight.do(symbol, lambda: fit_symbols([symbol]))
+    except Exception as e:
+        logger.error(f"Forecast fit failed for {symbol}: {str(e)}")
+
+
+def forecast_payload(symbol, bars, current_price):
+    """The ``forecast`` section of the stock payload, evaluated from the cached model."""
+    horizon = forecast_setting('HORIZON_DAYS')
+    model = get_forecast_store().get(symbol, bars['date'][-2]) if len(bars) > 1 else None
+
+    if model is None:
+        if len(bars) > 1:
+            _fit_executor.submit(_fit_in_background, symbol)
+        dates = forecast_dates(bars['date'][-1] if len(bars) else 'today', horizon)
+        return {
+            'futurePrices': [current_price] * horizon,
+            'forecastDates': [str(day) for day in dates],
+            'averageForecast': current_price,
+            'percentageChange': 0,
+            'status': 'pending',
+        }
+
+    # Both paths count the horizon from the latest bar
+    prices, dates = predict(model, horizon, start=bars['date'][-1])
+    average = float(prices.mean())
+    return {
+        'futurePrices': [round(float(price), 4) for price in prices],
+        'forecastDates': [str(day) for day in dates],
+        'averageForecast': round(average, 4),
+        'percentageChange': round((average / current_price - 1) * 100, 4) if isinstance(current_price, (int, float)) and current_price else 0,
+        'status': 'ready',
+        'asOf': str(model['as_of']),
+    }
@@ -0,0 +1,208 @@
+"""
+Vectorized technical indicators with O(1) rolling updates.
+
+IndicatorState keeps the rolling state of every indicator for a batch of
+symbols as NumPy arrays, one slot per symbol.  ``update`` folds one new daily
+close per symbol into all indicators in constant time, so warming a batch from
+history costs one vectorized step per trading day and a new bar costs a single
+step regardless of how much history came before it.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MA_SHORT = 50
+MA_LONG = 200
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2
+
+INDICATOR_NAMES = (
+    'RSI', 'MA50', 'MA200', 'MACD', 'SignalLine',
+    'BollingerUpper', 'BollingerMiddle', 'BollingerLower',
+)
+
+
+def _ema(prev, value, alpha, seed, valid):
+    # EMAs are seeded with the first observation (pandas ewm(adjust=False) convention)
+    return np.where(seed, value, np.where(valid, prev + alpha * (value - prev), prev))
+
+
+class IndicatorState:
+    """Rolling indicator state for ``size`` symbols.
+
+    A NaN close leaves that symbol's state untouched, so histories of different
+    lengths can be left-padded with NaN and warmed together.
+    """
+    window = MA_LONG
+
+    def __init__(self, size):
+        self.size = size
+        self.count = np.zeros(size, dtype=np.int64)
+        self.closes = np.zeros((size, self.window))
+        self.sum_short = np.zeros(size)
+        self.sum_long = np.zeros(size)
+        self.sum_bb = np.zeros(size)
+        self.sumsq_bb = np.zeros(size)
+        self.ema_fast = np.zeros(size)
+        self.ema_slow = np.zeros(size)
+        self.signal = np.zeros(size)
+        self.prev_close = np.zeros(size)
+        self.avg_gain = np.zeros(size)
+        self.avg_loss = np.zeros(size)
+        self._rows = np.arange(size)
+
+    @classmethod
+    def from_closes(cls, closes):
+        """Warm a state from a (symbols x days) matrix of closes, oldest first."""
+        closes = np.atleast_2d(np.asarray(closes, dtype='f8'))
+        state = cls(closes.shape[0])
+        for column in closes.T:
+            state.update(column)
+        return state
+
+    def copy(self):
+        other = object.__new__(type(self))
+        for name, value in self.__dict__.items():
+            other.__dict__[name] = value.copy() if isinstance(value, np.ndarray) else value
+        return other
+
+    def take(self, rows):
+        """A state for ``len(rows)`` symbols copied from ``rows`` of this one; a row of -1 starts empty."""
+        rows = np.asarray(rows, dtype=np.int64)
+        other = type(self)(len(rows))
+        present = rows >= 0
+        for name, value in self.__dict__.items():
+            if isinstance(value, np.ndarray) and name != '_rows':
+                getattr(other, name)[present] = value[rows[present]]
+        return other
+
+    def _dropped(self, length):
+        # Close that falls out of a window of ``length`` bars on this update
+        index = (self.count - length) % self.window
+        return np.where(self.count >= length, self.closes[self._rows, index], 0.0)
+
+    def update(self, close):
+        close = np.asarray(close, dtype='f8')
+        valid = ~np.isnan(close)
+        c = np.where(valid, close, 0.0)
+        n = self.count
+
+        # Moving-average and Bollinger windows are running sums over the ring buffer
+        self.sum_short += np.where(valid, c - self._dropped(MA_SHORT), 0.0)
+        self.sum_long += np.where(valid, c - self._dropped(MA_LONG), 0.0)
+        dropped_bb = self._dropped(BOLLINGER_PERIOD)
+        self.sum_bb += np.where(valid, c - dropped_bb, 0.0)
+        self.sumsq_bb += np.where(valid, c * c - dropped_bb * dropped_bb, 0.0)
+        self.closes[self._rows[valid], n[valid] % self.window] = c[valid]
+
+        first = valid & (n == 0)
+        self.ema_fast = _ema(self.ema_fast, c, 2 / (MACD_FAST + 1), first, valid)
+        self.ema_slow = _ema(self.ema_slow, c, 2 / (MACD_SLOW + 1), first, valid)
+        self.signal = _ema(self.signal, self.ema_fast - self.ema_slow, 2 / (MACD_SIGNAL + 1), first, valid)
+
+        # Wilder smoothing, seeded with the simple average of the first RSI_PERIOD changes
+        has_prev = valid & (n > 0)
+        delta = np.where(has_prev, c - self.prev_close, 0.0)
+        alpha = 1.0 / np.clip(n, 1, RSI_PERIOD)
+        self.avg_gain = np.where(has_prev, self.avg_gain + alpha * (np.maximum(delta, 0.0) - self.avg_gain), self.avg_gain)
+        self.avg_loss = np.where(has_prev, self.avg_loss + alpha * (np.maximum(-delta, 0.0) - self.avg_loss), self.avg_loss)
+        self.prev_close = np.where(valid, c, self.prev_close)
+
+        self.count = n + valid
+
+    def snapshot(self):
+        """Current indicator values per symbol; NaN until enough bars have been seen."""
+        n = self.count
+        nan = np.nan
+
+        bb_middle = self.sum_bb / BOLLINGER_PERIOD
+        bb_std = np.sqrt(np.maximum(self.sumsq_bb / BOLLINGER_PERIOD - bb_middle ** 2, 0.0))
+        bb_ready = n >= BOLLINGER_PERIOD
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        rsi = np.where(self.avg_loss == 0, np.where(self.avg_gain == 0, 50.0, 100.0), rsi)
+
+        return {
+            'RSI': np.where(n > RSI_PERIOD, rsi, nan),
+            'MA50': np.where(n >= MA_SHORT, self.sum_short / MA_SHORT, nan),
+            'MA200': np.where(n >= MA_LONG, self.sum_long / MA_LONG, nan),
+            'MACD': np.where(n >= MACD_SLOW, self.ema_fast - self.ema_slow, nan),
+            'SignalLine': np.where(n >= MACD_SLOW + MACD_SIGNAL - 1, self.signal, nan),
+            'BollingerUpper': np.where(bb_ready, bb_middle + BOLLINGER_WIDTH * bb_std, nan),
+            'BollingerMiddle': np.where(bb_ready, bb_middle, nan),
+            'BollingerLower': np.where(bb_ready, bb_middle - BOLLINGER_WIDTH * bb_std, nan),
+        }
+
+
+def align_closes(histories):
+    """Align ``{symbol: bars}`` on a shared date axis, NaN where a symbol has no bar."""
+    symbols = list(histories)
+    if not symbols:
+        return symbols, np.empty(0, dtype='datetime64[D]'), np.empty((0, 0))
+    dates = np.unique(np.concatenate([histories[s]['date'] for s in symbols]))
+    closes = np.full((len(symbols), len(dates)), np.nan)
+    for row, symbol in enumerate(symbols):
+        bars = histories[symbol]
+        closes[row, np.searchsorted(dates, bars['date'])] = bars['close']
+    return symbols, dates, closes
+
+
+def compute_indicators(histories):
+    """Latest indicators for a batch of ``{symbol: bars}``, computed in one pass."""
+    symbols, _, closes = align_closes(histories)
+    snapshot = IndicatorState.from_closes(closes).snapshot() if symbols else {}
+    return {
+        symbol: {name: _to_json(values[row]) for name, values in snapshot.items()}
+        for row, symbol in enumerate(symbols)
+    }
+
+
+def _to_json(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+class IndicatorBook:
+    """Per-symbol rolling states kept between requests.
+
+    Only completed bars are folded into the stored state.  The latest bar can
+    still move during the trading session, so it is applied to a copy.
+    """
+
+    def __init__(self, max_symbols=2048):
+        self.max_symbols = max_symbols
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def indicators(self, symbol, bars):
+        if not len(bars):
+            return {name: None for name in INDICATOR_NAMES}
+
+        with self._lock:
+            entry = self._states.get(symbol)
+            if entry is not None:
+                self._states.move_to_end(symbol)
+        state, last_date = (entry[0].copy(), entry[1]) if entry else (IndicatorState(1), None)
+
+        completed = bars[:-1]
+        start = 0 if last_date is None else np.searchsorted(completed['date'], last_date, side='right')
+        for close in completed['close'][start:]:
+            state.update([close])
+
+        if len(completed):
+            with self._lock:
+                self._states[symbol] = (state.copy(), completed['date'][-1])
+                self._states.move_to_end(symbol)
+                while len(self._states) > self.max_symbols:
+                    self._states.popitem(last=False)
+
+        state.update([bars['close'][-1]])
+        return {name: _to_json(values[0]) for name, values in state.snapshot().items()}
+
+
+indicator_book = IndicatorBook()
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from StockSearch.backtest import STRATEGIES, run_backtest
+from StockSearch.indicators import IndicatorState
+from StockSearch.synthetic import nse_symbols, random_walk_bars
+
+SCENARIOS = {
+    'ma_crossover': {},
+    'rsi': {},
+    'macd': {},
+    'expression': {'entry': 'Close > MA50 and RSI < 60', 'exit': 'Close < BollingerLower or RSI > 75'},
+}
+
+
+def loop_macd_backtest(closes, cost):
+    # Reference: one symbol and one bar at a time through IndicatorState
+    totals = []
+    for row in closes:
+        state = IndicatorState(1)
+        equity, position, target, previous = 1.0, 0.0, 0.0, None
+        for close in row:
+            day_return = close / previous - 1 if previous is not None else 0.0
+            equity *= 1 + target * day_return - abs(target - position) * cost
+            position, previous = target, close
+            state.update([close])
+            snapshot = state.snapshot()
+            target = 1.0 if snapshot['MACD'][0] > snapshot['SignalLine'][0] else 0.0
+        totals.append((equity - 1) * 100)
+    return np.array(totals)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized backtest engine on synthetic random-walk bars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=500)
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--loop-symbols', type=int, default=5)
+
+    def handle(self, *args, **options):
+        n_symbols, n_days = options['symbols'], options['years'] * 252
+        histories = {
+            symbol: random_walk_bars(n_days, seed=seed)
+            for seed, symbol in enumerate(nse_symbols(n_symbols))
+        }
+        self.stdout.write(f'symbols: {n_symbols}, history: {n_days} bars each')
+
+        results = {}
+        for strategy in STRATEGIES:
+            started = time.perf_counter()
+            results[strategy] = result = run_backtest(histories, strategy, SCENARIOS[strategy])
+            took = time.perf_counter() - started
+            portfolio = result['portfolio']
+            trades = sum(record['trades'] for record in result['results'])
+            self.stdout.write(
+                f'{strategy:13s} {took * 1000:8.1f} ms, {n_symbols * n_days / took:12,.0f} symbol-bars/s '
+                f"(portfolio CAGR {portfolio['cagr']:6.2f}%, max drawdown {portfolio['maxDrawdown']:6.2f}%, {trades} trades)"
+            )
+
+        n_loop = min(options['loop_symbols'], n_symbols)
+        if n_loop:
+            symbols = list(histories)[:n_loop]
+            closes = np.stack([histories[symbol]['close'] for symbol in symbols])
+            started = time.perf_counter()
+            expected = loop_macd_backtest(closes, results['macd']['costBps'] / 10000)
+            took = time.perf_counter() - started
+            actual = {record['symbol']: record['totalReturn'] for record in results['macd']['results']}
+            difference = max(abs(actual[symbol] - value) for symbol, value in zip(symbols, expected))
+            self.stdout.write(
+                f'per-bar loop (macd, {n_loop} symbols): {n_loop * n_days / took:12,.0f} symbol-bars/s, '
+                f'max total-return difference {difference:.2e} pp'
+            )
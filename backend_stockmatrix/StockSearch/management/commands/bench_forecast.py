@@ -0,0 +1,67 @@
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from StockSearch.forecast import ForecastStore, fit_histories, forecast_setting, predict
+from StockSearch.synthetic import nse_symbols, random_walk_bars
+
+
+def sklearn_fit(closes):
+    # Reference: one LinearRegression per symbol, as a per-request fit would do
+    from sklearn.linear_model import LinearRegression
+
+    x = np.arange(closes.shape[1]).reshape(-1, 1)
+    for row in closes:
+        LinearRegression().fit(x, np.log(row))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batched forecast fitting and cached-model prediction per symbol'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=400)
+        parser.add_argument('--sklearn-symbols', type=int, default=200)
+
+    def handle(self, *args, **options):
+        n_symbols = options['symbols']
+        lookback, horizon = forecast_setting('LOOKBACK_DAYS'), forecast_setting('HORIZON_DAYS')
+        histories = {
+            symbol: random_walk_bars(options['days'], seed=seed)
+            for seed, symbol in enumerate(nse_symbols(n_symbols))
+        }
+
+        started = time.perf_counter()
+        models = fit_histories(histories)
+        fit = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = ForecastStore(directory)
+            started = time.perf_counter()
+            store.save(models)
+            save = time.perf_counter() - started
+
+            as_of = models['as_of'][0]
+            store.get(models['symbol'][0], as_of)
+            started = time.perf_counter()
+            for symbol in models['symbol']:
+                predict(store.get(str(symbol), as_of), horizon)
+            evaluate = time.perf_counter() - started
+
+        self.stdout.write(f'symbols: {n_symbols}, lookback: {lookback} days, horizon: {horizon} days')
+        self.stdout.write(f'batched fit:     {fit * 1000:8.1f} ms total, {fit / n_symbols * 1e6:8.2f} us/symbol')
+        self.stdout.write(f'save models:     {save * 1000:8.1f} ms total')
+        self.stdout.write(f'cached predict:  {evaluate * 1000:8.1f} ms total, {evaluate / n_symbols * 1e6:8.2f} us/symbol')
+
+        n_reference = min(options['sklearn_symbols'], n_symbols)
+        if n_reference:
+            closes = np.stack([bars['close'][-lookback - 1:-1] for bars in list(histories.values())[:n_reference]])
+            started = time.perf_counter()
+            sklearn_fit(closes)
+            reference = time.perf_counter() - started
+            self.stdout.write(
+                f'sklearn per-symbol fit: {reference / n_reference * 1e6:8.2f} us/symbol '
+                f'({n_reference} symbols)'
+            )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from StockSearch.indicators import IndicatorState
+from StockSearch.synthetic import random_walk_closes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batch warm-up and O(1) daily updates of the technical-indicator engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=400)
+        parser.add_argument('--updates', type=int, default=250)
+
+    def handle(self, *args, **options):
+        n_symbols, n_days, n_updates = options['symbols'], options['days'], options['updates']
+        closes = random_walk_closes(n_symbols, n_days + n_updates)
+
+        started = time.perf_counter()
+        state = IndicatorState.from_closes(closes[:, :n_days])
+        state.snapshot()
+        warm = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for column in closes[:, n_days:].T:
+            state.update(column)
+            state.snapshot()
+        per_update = (time.perf_counter() - started) / n_updates
+
+        self.stdout.write(f'symbols: {n_symbols}, history: {n_days} days')
+        self.stdout.write(
+            f'warm-up:      {warm * 1000:8.1f} ms total, '
+            f'{n_symbols * n_days / warm:12,.0f} symbol-bars/s'
+        )
+        self.stdout.write(
+            f'daily update: {per_update * 1000:8.3f} ms per bar, '
+            f'{n_symbols / per_update:12,.0f} symbols/s'
+        )
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from backend_stockmatrix.metrics import _timing, render_metrics, span
+
+TIMING_MIDDLEWARE = 'backend_stockmatrix.metrics.TimingMiddleware'
+
+
+def per_request(n_requests):
+    client = Client()
+    client.get('/api/upstream/coalescing/')
+    started = time.perf_counter()
+    for _ in range(n_requests):
+        client.get('/api/upstream/coalescing/')
+    return (time.perf_counter() - started) / n_requests
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the overhead of timing spans, the timing middleware and a metrics scrape'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spans', type=int, default=200_000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        n_spans, n_requests = options['spans'], options['requests']
+
+        started = time.perf_counter()
+        for _ in range(n_spans):
+            with span('bench'):
+                pass
+        outside = (time.perf_counter() - started) / n_spans
+
+        token = _timing.set({})
+        try:
+            started = time.perf_counter()
+            for _ in range(n_spans):
+                with span('bench'):
+                    pass
+            inside = (time.perf_counter() - started) / n_spans
+        finally:
+            _timing.reset(token)
+
+        without_middleware = [name for name in settings.MIDDLEWARE if name != TIMING_MIDDLEWARE]
+        # Alternate the two stacks and keep the best round of each to damp noise
+        baseline = timed = float('inf')
+        for _ in range(options['rounds']):
+            with override_settings(MIDDLEWARE=without_middleware):
+                baseline = min(baseline, per_request(n_requests))
+            with override_settings(MIDDLEWARE=[TIMING_MIDDLEWARE, *without_middleware]):
+                timed = min(timed, per_request(n_requests))
+
+        started = time.perf_counter()
+        text = render_metrics()
+        scrape = time.perf_counter() - started
+
+        self.stdout.write(f'span outside a request:   {outside * 1e6:8.2f} us')
+        self.stdout.write(f'span inside a request:    {inside * 1e6:8.2f} us')
+        self.stdout.write(f'request without timing:   {baseline * 1e6:8.2f} us')
+        self.stdout.write(f'request with timing:      {timed * 1e6:8.2f} us (+{(timed - baseline) * 1e6:.2f} us)')
+        self.stdout.write(f'metrics scrape:           {scrape * 1000:8.2f} ms, {len(text.splitlines())} lines')
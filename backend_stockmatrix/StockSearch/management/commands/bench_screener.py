@@ -0,0 +1,68 @@
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from StockSearch.market_data import PriceStore
+from StockSearch.screener import FUNDAMENTAL_COLUMNS, StockUniverse
+from StockSearch.synthetic import nse_symbols, random_walk_bars
+
+EXPRESSIONS = [
+    'PE < 20 and RSI < 30 and MA50 > MA200',
+    'MACD > SignalLine and Price > BollingerMiddle',
+    '(PB < 3 or ROE > 0.2) and Change > 1 and Volume > 500000',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark screen evaluation and incremental refresh over a synthetic universe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=300)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        n_symbols, n_days = options['symbols'], options['days']
+        symbols = nse_symbols(n_symbols)
+        rng = np.random.default_rng(0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = PriceStore(directory)
+            histories = {}
+            for seed, symbol in enumerate(symbols):
+                bars = random_walk_bars(n_days + 1, seed=seed)
+                histories[symbol] = bars
+                store.write_bars(symbol, bars[:-1])
+                store.write_meta(symbol, {'info': {
+                    key: float(rng.uniform(0.05, 60)) for key in FUNDAMENTAL_COLUMNS.values()
+                }})
+
+            universe = StockUniverse(symbols)
+            started = time.perf_counter()
+            universe.refresh(store=store)
+            initial = time.perf_counter() - started
+
+            # One new daily bar per symbol
+            for symbol, bars in histories.items():
+                store.write_bars(symbol, bars)
+            started = time.perf_counter()
+            universe.refresh(store=store)
+            incremental = time.perf_counter() - started
+
+        self.stdout.write(f'universe: {n_symbols} symbols, {n_days} days of bars')
+        self.stdout.write(f'initial refresh:     {initial * 1000:9.1f} ms')
+        self.stdout.write(f'incremental refresh: {incremental * 1000:9.1f} ms (one new bar per symbol)')
+
+        for expression in EXPRESSIONS:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                count, _ = universe.screen(expression, sort='-RSI', limit=50)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f'screen p50 {timings[len(timings) // 2] * 1000:7.3f} ms  '
+                f'max {timings[-1] * 1000:7.3f} ms  {count:5d} matches  {expression}'
+            )
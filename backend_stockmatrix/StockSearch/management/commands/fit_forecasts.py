@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from StockSearch.forecast import fit_symbols
+from StockSearch.screener import universe_symbols
+
+
+class Command(BaseCommand):
+    help = (
+        'Fit the daily forecast model of every symbol in the market data store (or the given symbols). '
+        'Run it after refresh_screener so requests only evaluate cached models.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        symbols = options['symbols'] or universe_symbols()
+        batch_size = options['batch_size']
+        fitted = 0
+        for start in range(0, len(symbols), batch_size):
+            fitted += len(fit_symbols(symbols[start:start + batch_size]))
+        self.stdout.write(self.style.SUCCESS(f'Fitted {fitted} of {len(symbols)} symbols'))
@@ -0,0 +1,236 @@
+import itertools
+import json
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from backend_stockmatrix import ratelimit
+from backend_stockmatrix.authentication import get_claims_cache, issue_token
+from backend_stockmatrix.ratelimit import RateLimitBackend, RateLimitResult
+from backend_stockmatrix.stub_upstream import StubUpstream
+from MutualFund.ingest import store_funds
+from MutualFund.scraper import EQUITY_FUNDS_URL, scrape_funds
+from StockSearch import charts, market_data, news
+from StockSearch.synthetic import nse_symbols
+
+SCENARIOS = ('stock', 'funds', 'funds-screener', 'auth')
+# A baseline is only compared with runs that used the same options
+CONFIG_OPTIONS = ('requests', 'concurrency', 'symbols', 'users', 'latency', 'error_rate')
+SCREENER_QUERIES = ('sort=-return_1y&limit=50', 'plan=Direct Plan&sort=-aum_cr&limit=100', 'crisil_rank_min=4&limit=20')
+
+
+class UnlimitedBackend(RateLimitBackend):
+    """Rate-limit backend that allows everything, so the load test measures the views."""
+
+    def hit_many(self, limits):
+        return [RateLimitResult(True, limit, 0) for _, limit, _ in limits]
+
+
+def percentiles(latencies):
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2)}
+
+
+def run_load(send, n_requests, concurrency):
+    """``n_requests`` calls of ``send(client, i)`` from ``concurrency`` threads; latencies and statuses."""
+    sequence = itertools.count()
+    lock = threading.Lock()
+    latencies, statuses = [], Counter()
+
+    def worker():
+        client = Client()
+        while True:
+            with lock:
+                i = next(sequence)
+            if i >= n_requests:
+                return
+            started = time.perf_counter()
+            status_code = send(client, i).status_code
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status_code] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def _clear_accessors():
+    for accessor in (market_data.get_provider, market_data.get_price_store, news.get_news_source,
+                     ratelimit.get_backend, get_claims_cache):
+        accessor.cache_clear()
+
+
+@contextmanager
+def offline(stub, directory):
+    """Point market data and news at the stub, with throwaway caches, rate limits and database."""
+    news_dir = directory / 'news'
+    news_dir.mkdir()
+    with override_settings(
+        # The test client sends Host: testserver
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        MARKET_DATA=dict(
+            getattr(settings, 'MARKET_DATA', {}),
+            PROVIDER='StockSearch.market_data.YahooChartProvider',
+            CHART_URL=stub.chart_url,
+            STORE_DIR=directory / 'market_data',
+        ),
+        NEWS=dict(getattr(settings, 'NEWS', {}), SOURCE='StockSearch.news.FixtureNewsSource', FIXTURE_DIR=news_dir),
+        CACHES=dict(settings.CACHES, responses={
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'loadtest-responses',
+        }),
+        RATE_LIMIT=dict(getattr(settings, 'RATE_LIMIT', {}), BACKEND=f'{__name__}.UnlimitedBackend'),
+        CHARTS=dict(getattr(settings, 'CHARTS', {}), IMAGE_DIR=directory / 'charts'),
+    ):
+        _clear_accessors()
+        databases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        logging.disable(logging.ERROR)
+        try:
+            # The views serve funds from the latest snapshot of the moneycontrol URL
+            store_funds(EQUITY_FUNDS_URL, scrape_funds(stub.funds_url))
+            yield
+        finally:
+            # Let the chart renders queued by get-stock finish before their directory goes
+            charts._render_executor.shutdown(wait=True)
+            logging.disable(logging.NOTSET)
+            teardown_databases(databases, verbosity=0)
+            _clear_accessors()
+
+
+def scenario_requests(name, options):
+    """``send(client, i)`` issuing the scenario's ``i``-th request."""
+    if name == 'stock':
+        symbols = nse_symbols(options['symbols'])
+        return lambda client, i: client.post(
+            '/api/get-stock/', {'symbol': symbols[i % len(symbols)]}, content_type='application/json',
+        )
+    if name == 'funds':
+        return lambda client, i: client.get('/api/mutualfunds/')
+    if name == 'funds-screener':
+        return lambda client, i: client.get(f'/api/mutualfunds/?{SCREENER_QUERIES[i % len(SCREENER_QUERIES)]}')
+
+    # Each virtual user sends its own bearer token, verified by JWTAuthentication
+    # before the screener query runs
+    headers = [
+        {'HTTP_AUTHORIZATION': 'Bearer ' + issue_token(
+            SimpleNamespace(id=n, email=f'user{n}@example.com', username=f'user{n}')
+        )}
+        for n in range(options['users'])
+    ]
+    return lambda client, i: client.get(f'/api/mutualfunds/?{SCREENER_QUERIES[0]}', **headers[i % len(headers)])
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the get-stock, mutual funds and authenticated request paths in process, against '
+        'local stubs of Yahoo Finance and moneycontrol, and compare with a saved baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f"Any of {', '.join(SCENARIOS)} (default: all)")
+        parser.add_argument('--requests', type=int, default=500, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight')
+        parser.add_argument('--symbols', type=int, default=100, help='Distinct symbols requested by get-stock')
+        parser.add_argument('--users', type=int, default=100, help='Distinct tokens sent by the auth scenario')
+        parser.add_argument('--latency', type=float, default=0.05, help='Stub upstream latency in seconds')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses that are 503s')
+        parser.add_argument('--fixtures', help='Recorded market data (record_market_fixtures) served by the stub')
+        parser.add_argument('--fund-page', help='Saved moneycontrol page served by the stub')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'loadtest_baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Record this run as the new baseline')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Fail if p95 grows or throughput drops by more than this fraction of the baseline',
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if not 0 <= options['error_rate'] < 1:
+            raise CommandError('--error-rate must be in [0, 1)')
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        config = {name: options[name] for name in CONFIG_OPTIONS}
+        stub = StubUpstream(
+            latency=options['latency'], error_rate=options['error_rate'],
+            fixture_dir=options['fixtures'], fund_page=options['fund_page'],
+        )
+        with stub, tempfile.TemporaryDirectory() as directory, offline(stub, Path(directory)):
+            self.stdout.write(
+                f"stub upstream at {stub.base_url}, {options['requests']} requests per scenario, "
+                f"{options['concurrency']} in flight, "
+                f"stub latency {options['latency'] * 1000:.0f} ms, error rate {options['error_rate']:.0%}"
+            )
+            results = {}
+            for scenario in scenarios:
+                send = scenario_requests(scenario, options)
+                upstream_before = stub.requests
+                run_load(send, options['warmup'], options['concurrency'])
+                latencies, statuses, elapsed = run_load(send, options['requests'], options['concurrency'])
+                results[scenario] = result = {
+                    **config,
+                    'rps': round(len(latencies) / elapsed, 1),
+                    **percentiles(latencies),
+                    'errors': sum(count for code, count in statuses.items() if code >= 400),
+                }
+                self.stdout.write(
+                    f"{scenario:<15} {result['rps']:8.1f} req/s   p50 {result['p50']:7.1f} ms   "
+                    f"p95 {result['p95']:7.1f} ms   p99 {result['p99']:7.1f} ms   "
+                    f"{result['errors']} errors, {stub.requests - upstream_before} upstream calls"
+                )
+
+        self.compare(results, options)
+
+    def compare(self, results, options):
+        path = Path(options['baseline'])
+        if options['save_baseline']:
+            saved = json.loads(path.read_text()) if path.exists() else {}
+            path.write_text(json.dumps(dict(saved, **results), indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {path}'))
+            return
+        if not path.exists():
+            self.stdout.write(f'No baseline at {path}; run with --save-baseline to record one')
+            return
+
+        baseline = json.loads(path.read_text())
+        tolerance = options['tolerance']
+        regressions = []
+        for scenario, result in results.items():
+            base = baseline.get(scenario)
+            if base is None:
+                continue
+            if any(base.get(name) != result[name] for name in CONFIG_OPTIONS):
+                self.stdout.write(f'{scenario:<15} baseline was recorded with different options; not compared')
+                continue
+            rps_change = result['rps'] / base['rps'] - 1
+            p95_change = result['p95'] / base['p95'] - 1
+            self.stdout.write(
+                f"{scenario:<15} vs baseline: throughput {rps_change:+7.1%}, p95 {p95_change:+7.1%}, "
+                f"p99 {result['p99'] / base['p99'] - 1:+7.1%}"
+            )
+            if rps_change < -tolerance or p95_change > tolerance:
+                regressions.append(scenario)
+
+        if regressions:
+            raise CommandError(f"Regressed beyond {tolerance:.0%} of the baseline: {', '.join(regressions)}")
@@ -0,0 +1,82 @@
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from backend_stockmatrix.async_http import aclose_client
+from backend_stockmatrix.stub_upstream import StubUpstream
+from StockSearch.market_data import PriceStore, YahooChartProvider
+from StockSearch.synthetic import nse_symbols
+
+
+def summary(label, latencies, elapsed):
+    latencies = np.array(latencies) * 1000
+    return (
+        f'{label:<28} {len(latencies) / elapsed:8.1f} req/s   '
+        f'p50 {np.percentile(latencies, 50):7.1f} ms   p95 {np.percentile(latencies, 95):7.1f} ms'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare sync (thread per request) and async (one event loop) throughput of the stock '
+        'data path against a local stub of the Yahoo chart API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--latency', type=float, default=0.1, help='Stub upstream latency in seconds')
+        parser.add_argument('--threads', type=int, default=8, help='Threads of the sync worker')
+        parser.add_argument('--concurrency', type=int, default=200, help='In-flight requests of the async worker')
+
+    def handle(self, *args, **options):
+        n_requests = options['requests']
+
+        with StubUpstream(latency=options['latency']) as stub:
+            provider = YahooChartProvider(stub.chart_url)
+            self.stdout.write(
+                f"{n_requests} uncached quotes (info + history = 2 upstream calls each), "
+                f"stub latency {options['latency'] * 1000:.0f} ms"
+            )
+
+            with tempfile.TemporaryDirectory() as directory:
+                store = PriceStore(directory)
+
+                def quote(symbol):
+                    started = time.perf_counter()
+                    store.get_info(symbol, provider)
+                    store.get_history(symbol, provider)
+                    return time.perf_counter() - started
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                    latencies = list(executor.map(quote, nse_symbols(n_requests)))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(summary(f"sync, {options['threads']} threads", latencies, elapsed))
+
+            with tempfile.TemporaryDirectory() as directory:
+                store = PriceStore(directory)
+                slots = options['concurrency']
+
+                async def run():
+                    semaphore = asyncio.Semaphore(slots)
+
+                    async def quote(symbol):
+                        async with semaphore:
+                            started = time.perf_counter()
+                            await store.aget_info(symbol, provider)
+                            await store.aget_history(symbol, provider)
+                            return time.perf_counter() - started
+
+                    try:
+                        return await asyncio.gather(*(quote(symbol) for symbol in nse_symbols(n_requests)))
+                    finally:
+                        await aclose_client()
+
+                started = time.perf_counter()
+                latencies = asyncio.run(run())
+                elapsed = time.perf_counter() - started
+                self.stdout.write(summary(f'async, {slots} in flight', latencies, elapsed))
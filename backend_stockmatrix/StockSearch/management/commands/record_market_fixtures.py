@@ -0,0 +1,42 @@
+import csv
+import json
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from StockSearch.market_data import market_data_setting
+
+
+class Command(BaseCommand):
+    help = 'Record info and daily bars from a live provider into the FixtureProvider directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='+', help='Symbols to record, e.g. RELIANCE.NS TCS.NS')
+        parser.add_argument('--days', type=int, default=market_data_setting('HISTORY_DAYS'))
+        parser.add_argument('--provider', default='StockSearch.market_data.YahooProvider')
+        parser.add_argument('--output', default=market_data_setting('FIXTURE_DIR'))
+
+    def handle(self, *args, **options):
+        provider = import_string(options['provider'])()
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+
+        end = date.today() + timedelta(days=1)
+        start = end - timedelta(days=options['days'])
+
+        for symbol in options['symbols']:
+            info = provider.get_info(symbol)
+            bars = provider.get_history(symbol, start, end)
+
+            with open(output / f'{symbol}.json', 'w') as f:
+                json.dump(info, f, indent=2, default=str)
+
+            with open(output / f'{symbol}.csv', 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+                for bar in bars:
+                    writer.writerow([str(bar['date']), bar['open'], bar['high'], bar['low'], bar['close'], bar['volume']])
+
+            self.stdout.write(self.style.SUCCESS(f'Recorded {symbol}: {len(bars)} bars'))
@@ -0,0 +1,27 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from StockSearch.news import news_setting
+
+
+class Command(BaseCommand):
+    help = 'Record headlines from a live news source into the FixtureNewsSource directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='+', help='Symbols to record, e.g. RELIANCE.NS TCS.NS')
+        parser.add_argument('--source', default='StockSearch.news.YahooNewsSource')
+        parser.add_argument('--output', default=news_setting('FIXTURE_DIR'))
+
+    def handle(self, *args, **options):
+        source = import_string(options['source'])()
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+
+        for symbol in options['symbols']:
+            headlines = source.get_headlines(symbol)
+            with open(output / f'{symbol}.json', 'w') as f:
+                json.dump(headlines, f, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f'Recorded {symbol}: {len(headlines)} headlines'))
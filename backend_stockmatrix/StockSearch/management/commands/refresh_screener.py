@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from StockSearch.screener import StockUniverse, universe_symbols
+
+
+class Command(BaseCommand):
+    help = (
+        'Pull missing daily bars and info for every screener symbol into the market data store. '
+        'Run it after market close so web workers only fold in the new bars.'
+    )
+
+    def handle(self, *args, **options):
+        universe = StockUniverse(universe_symbols())
+        universe.refresh(fetch=True)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {len(universe.symbols)} symbols'))
@@ -0,0 +1,497 @@
+"""
+Market data providers and the on-disk OHLCV price store used by StockView.
+
+Providers know how to talk to one upstream (Yahoo via yfinance, Yahoo's chart
+API over plain HTTP, or a local fixture directory).  The PriceStore keeps one
+memory-mapped ``.npy`` file of daily bars per symbol plus a small JSON sidecar
+describing which date range has already been fetched, so repeat requests only
+ask the provider for the dates that are still missing.  Every provider and the store also have async
+methods (``aget_*``) for the ASGI views.
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from backend_stockmatrix.upstream import get_upstream
+
+logger = logging.getLogger(__name__)
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+DEFAULTS = {
+    'PROVIDER': 'StockSearch.market_data.YahooProvider',
+    'CHART_URL': 'https://query2.finance.yahoo.com/v8/finance/chart',
+    'STORE_DIR': 'market_data',
+    'FIXTURE_DIR': 'StockSearch/fixtures/market_data',
+    'HISTORY_DAYS': 400,
+    'REFRESH_SECONDS': 300,
+    'INFO_TTL': 300,
+    'MAX_CONCURRENCY': 8,
+    'MAX_BATCH_SYMBOLS': 100,
+    'BATCH_TIMEOUT': 30,
+}
+
+
+def market_data_setting(name):
+    value = getattr(settings, 'MARKET_DATA', {}).get(name, DEFAULTS[name])
+    if name.endswith('_DIR'):
+        return Path(settings.BASE_DIR) / value
+    return value
+
+
+def empty_bars():
+    return np.empty(0, dtype=BAR_DTYPE)
+
+
+def frame_to_bars(df):
+    # Convert a yfinance history DataFrame into a BAR_DTYPE array
+    if df is None or df.empty:
+        return empty_bars()
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = df.index.strftime('%Y-%m-%d').to_numpy().astype('datetime64[D]')
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        bars[column] = df[column.capitalize()].to_numpy(dtype='f8')
+    return bars
+
+
+def merge_bars(existing, new):
+    # Newer bars win when both arrays contain the same date
+    if not len(existing):
+        combined = np.asarray(new)
+    else:
+        combined = np.concatenate([new, existing])
+    _, first = np.unique(combined['date'], return_index=True)
+    return combined[first]
+
+
+_provider_slots = {}
+_provider_slots_guard = threading.Lock()
+
+
+def provider_slot(provider):
+    """Semaphore capping concurrent upstream calls per provider in this process."""
+    with _provider_slots_guard:
+        if provider.name not in _provider_slots:
+            _provider_slots[provider.name] = threading.BoundedSemaphore(market_data_setting('MAX_CONCURRENCY'))
+        return _provider_slots[provider.name]
+
+
+class MarketDataProvider:
+    """Base class for upstream market data sources.
+
+    ``get_history`` returns daily bars in ``[start, end)`` as a BAR_DTYPE array.
+    Providers without a native async client run the blocking calls in a thread
+    for ``aget_info``/``aget_history``.
+    """
+    name = 'base'
+
+    def get_info(self, symbol):
+        raise NotImplementedError
+
+    def get_history(self, symbol, start, end):
+        raise NotImplementedError
+
+    async def aget_info(self, symbol):
+        return await asyncio.to_thread(self.get_info, symbol)
+
+    async def aget_history(self, symbol, start, end):
+        return await asyncio.to_thread(self.get_history, symbol, start, end)
+
+
+def yfinance_errors():
+    """The yfinance errors worth retrying: network failures, timeouts and Yahoo's rate limiting.
+
+    The requests and curl_cffi exceptions yfinance raises are all OSErrors, and
+    HTTP errors other than 429/5xx are still not retried.  Anything else (an
+    unknown symbol, a payload yfinance cannot parse) means Yahoo answered, so it
+    propagates at once without counting against the breaker.
+    """
+    from yfinance.exceptions import YFRateLimitError
+
+    return (OSError, YFRateLimitError)
+
+
+class YahooProvider(MarketDataProvider):
+    """Yahoo via yfinance, which manages its own session; calls go through the 'yfinance' breaker.
+
+    yfinance (and pandas with it) is imported on first use, as it dominates
+    worker startup time.
+    """
+    name = 'yahoo'
+
+    def __init__(self):
+        self.upstream = get_upstream('yfinance')
+
+    def get_info(self, symbol):
+        import yfinance as yf
+
+        return self.upstream.call(lambda: yf.Ticker(symbol).info, retry_on=yfinance_errors())
+
+    def get_history(self, symbol, start, end):
+        import yfinance as yf
+
+        df = self.upstream.call(lambda: yf.Ticker(symbol).history(
+            start=start.isoformat(), end=end.isoformat(), interval='1d', auto_adjust=False
+        ), retry_on=yfinance_errors())
+        return frame_to_bars(df)
+
+
+def _epoch(day):
+    return int(datetime.combine(day, dt_time(), tzinfo=timezone.utc).timestamp())
+
+
+def _chart_result(payload):
+    chart = payload.get('chart') or {}
+    if chart.get('error'):
+        raise ValueError(f"Chart API error: {chart['error']}")
+    results = chart.get('result') or []
+    return results[0] if results else {}
+
+
+def chart_info(payload):
+    """Info dict (yfinance key names) from a chart API response's metadata."""
+    meta = _chart_result(payload).get('meta') or {}
+    info = {
+        'symbol': meta.get('symbol'),
+        'longName': meta.get('longName'),
+        'shortName': meta.get('shortName'),
+        'currency': meta.get('currency'),
+        'exchange': meta.get('exchangeName'),
+        'currentPrice': meta.get('regularMarketPrice'),
+        'previousClose': meta.get('chartPreviousClose', meta.get('previousClose')),
+        'dayHigh': meta.get('regularMarketDayHigh'),
+        'dayLow': meta.get('regularMarketDayLow'),
+        'volume': meta.get('regularMarketVolume'),
+        'fiftyTwoWeekHigh': meta.get('fiftyTwoWeekHigh'),
+        'fiftyTwoWeekLow': meta.get('fiftyTwoWeekLow'),
+    }
+    return {key: value for key, value in info.items() if value is not None}
+
+
+def chart_bars(payload):
+    """BAR_DTYPE array from a chart API response; bars without a close are dropped."""
+    result = _chart_result(payload)
+    timestamps = result.get('timestamp') or []
+    if not timestamps:
+        return empty_bars()
+    quote = (result.get('indicators') or {}).get('quote', [{}])[0]
+    offset = (result.get('meta') or {}).get('gmtoffset', 0)
+
+    bars = np.empty(len(timestamps), dtype=BAR_DTYPE)
+    # Shift to exchange time before truncating so each bar lands on its trading day
+    bars['date'] = ((np.array(timestamps, dtype='i8') + offset) // 86400).astype('datetime64[D]')
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        bars[column] = np.array(quote.get(column) or [None] * len(timestamps), dtype='f8')
+    bars = bars[~np.isnan(bars['close'])]
+    return merge_bars(empty_bars(), bars[::-1])
+
+
+class YahooChartProvider(MarketDataProvider):
+    """Yahoo's public chart API over plain HTTP, with a native async client.
+
+    Info is limited to what the chart metadata carries (names, exchange, last
+    price and day range), but no cookie/crumb handshake is needed and the async
+    path shares the pooled client of the running event loop.
+    """
+    name = 'yahoo-chart'
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or market_data_setting('CHART_URL')).rstrip('/')
+        self.upstream = get_upstream(self.base_url)
+
+    def _url(self, symbol):
+        return f'{self.base_url}/{symbol}'
+
+    def _history_params(self, start, end):
+        return {'period1': _epoch(start), 'period2': _epoch(end), 'interval': '1d'}
+
+    def _get(self, symbol, params):
+        return self.upstream.get(self._url(symbol), params=params).json()
+
+    async def _aget(self, symbol, params):
+        return await self.upstream.afetch(
+            self._url(symbol), lambda response: response.json(content_type=None), params=params
+        )
+
+    def get_info(self, symbol):
+        return chart_info(self._get(symbol, {'range': '5d', 'interval': '1d'}))
+
+    def get_history(self, symbol, start, end):
+        return chart_bars(self._get(symbol, self._history_params(start, end)))
+
+    async def aget_info(self, symbol):
+        return chart_info(await self._aget(symbol, {'range': '5d', 'interval': '1d'}))
+
+    async def aget_history(self, symbol, start, end):
+        return chart_bars(await self._aget(symbol, self._history_params(start, end)))
+
+
+def symbol_path(directory, symbol, suffix):
+    """``<directory>/<symbol><suffix>``; raises ValueError if it would resolve outside ``directory``."""
+    path = Path(directory) / f'{symbol}{suffix}'
+    # abspath collapses ``..`` without touching the disk
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory):
+        raise ValueError(f'Symbol {symbol!r} does not name a file in {directory}')
+    return path
+
+
+class FixtureProvider(MarketDataProvider):
+    """Serves recorded data from ``<FIXTURE_DIR>/<symbol>.json`` and ``<symbol>.csv``.
+
+    Use ``manage.py record_market_fixtures`` to capture fixtures from a live provider.
+    """
+    name = 'fixture'
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or market_data_setting('FIXTURE_DIR'))
+
+    def get_info(self, symbol):
+        path = symbol_path(self.directory, symbol, '.json')
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def get_history(self, symbol, start, end):
+        path = symbol_path(self.directory, symbol, '.csv')
+        if not path.exists():
+            return empty_bars()
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        bars = np.empty(len(rows), dtype=BAR_DTYPE)
+        bars['date'] = [row['Date'] for row in rows]
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            bars[column] = [float(row[column.capitalize()]) for row in rows]
+        mask = (bars['date'] >= np.datetime64(start)) & (bars['date'] < np.datetime64(end))
+        return np.sort(bars[mask], order='date')
+
+
+class PriceStore:
+    """Persistent per-symbol store of daily bars with incremental refresh."""
+
+    def __init__(self, directory, refresh_seconds=300, info_ttl=300):
+        self.directory = Path(directory)
+        self.refresh_seconds = refresh_seconds
+        self.info_ttl = info_ttl
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._async_locks = weakref.WeakKeyDictionary()
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _async_lock(self, symbol):
+        # asyncio locks belong to one event loop
+        locks = self._async_locks.setdefault(asyncio.get_running_loop(), {})
+        return locks.setdefault(symbol, asyncio.Lock())
+
+    # The second guard after normalize_symbol: nothing outside the store is read or written
+    def _bars_path(self, symbol):
+        return symbol_path(self.directory, symbol, '.npy')
+
+    def _meta_path(self, symbol):
+        return symbol_path(self.directory, symbol, '.json')
+
+    def _write_atomic(self, path, write):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def read_meta(self, symbol):
+        try:
+            with open(self._meta_path(symbol)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_meta(self, symbol, meta):
+        self._write_atomic(self._meta_path(symbol), lambda f: f.write(json.dumps(meta, default=str).encode()))
+
+    def read_bars(self, symbol):
+        try:
+            return np.load(self._bars_path(symbol), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return empty_bars()
+
+    def write_bars(self, symbol, bars):
+        self._write_atomic(self._bars_path(symbol), lambda f: np.save(f, bars))
+
+    def version(self, symbol):
+        """Cheap change marker for a symbol's stored bars and metadata."""
+        versions = []
+        for path in (self._bars_path(symbol), self._meta_path(symbol)):
+            try:
+                versions.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                versions.append(0)
+        return tuple(versions)
+
+    def missing_ranges(self, meta, start, end, today=None, now=None):
+        """Return the ``[start, end)`` ranges not yet covered by the stored bars."""
+        today = today or date.today()
+        now = now or time.time()
+        if not meta.get('start'):
+            return [(start, end)]
+
+        have_start = date.fromisoformat(meta['start'])
+        have_end = date.fromisoformat(meta['end'])
+        ranges = []
+        if start < have_start:
+            ranges.append((start, have_start))
+        # Today's bar is still moving, so it is only trusted for refresh_seconds
+        if end > have_end and (have_end < today or now - meta.get('fetched_at', 0) >= self.refresh_seconds):
+            ranges.append((have_end, end))
+        return ranges
+
+    def get_bars(self, symbol, start, end, provider):
+        with self._lock(symbol):
+            meta = self.read_meta(symbol)
+            ranges = self.missing_ranges(meta, start, end)
+            bars = self.read_bars(symbol)
+
+            if ranges:
+                try:
+                    for range_start, range_end in ranges:
+                        logger.info(f"Fetching {symbol} bars {range_start} -> {range_end} from {provider.name}")
+                        with provider_slot(provider):
+                            fetched = provider.get_history(symbol, range_start, range_end)
+                        bars = merge_bars(bars, fetched)
+                except Exception as e:
+                    return self._stale_bars(symbol, bars, start, end, e)
+                self._save_bars(symbol, meta, bars, start, end)
+
+        return self._slice(bars, start, end)
+
+    async def aget_bars(self, symbol, start, end, provider):
+        # Async callers are bounded by the HTTP client's pool rather than provider_slot
+        async with self._async_lock(symbol):
+            # File reads and writes run in a thread so they never stall the event loop
+            meta = await asyncio.to_thread(self.read_meta, symbol)
+            ranges = self.missing_ranges(meta, start, end)
+            bars = await asyncio.to_thread(self.read_bars, symbol)
+
+            if ranges:
+                try:
+                    for range_start, range_end in ranges:
+                        logger.info(f"Fetching {symbol} bars {range_start} -> {range_end} from {provider.name}")
+                        fetched = await provider.aget_history(symbol, range_start, range_end)
+                        bars = merge_bars(bars, fetched)
+                except Exception as e:
+                    return self._stale_bars(symbol, bars, start, end, e)
+                await asyncio.to_thread(self._save_bars, symbol, meta, bars, start, end)
+
+        return self._slice(bars, start, end)
+
+    def _save_bars(self, symbol, meta, bars, start, end):
+        self.write_bars(symbol, bars)
+
+        covered_start, covered_end = start, min(end, date.today())
+        if meta.get('start'):
+            covered_start = min(covered_start, date.fromisoformat(meta['start']))
+            covered_end = max(covered_end, date.fromisoformat(meta['end']))
+        meta.update({
+            'start': covered_start.isoformat(),
+            'end': covered_end.isoformat(),
+            'fetched_at': time.time(),
+        })
+        self.write_meta(symbol, meta)
+
+    def _stale_bars(self, symbol, bars, start, end, error):
+        # Stored bars are still worth serving while the upstream is down
+        if not len(bars):
+            raise error
+        logger.warning(f"Serving stored bars for {symbol}; refresh failed: {str(error)}")
+        return self._slice(bars, start, end)
+
+    def _slice(self, bars, start, end):
+        lo, hi = np.searchsorted(bars['date'], [np.datetime64(start), np.datetime64(end)])
+        return bars[lo:hi]
+
+    def _cached_info(self, meta):
+        if meta.get('info') and time.time() - meta.get('info_fetched_at', 0) < self.info_ttl:
+            return meta['info']
+        return None
+
+    def _stale_info(self, symbol, meta, error):
+        if not meta.get('info'):
+            raise error
+        logger.warning(f"Serving stored info for {symbol}; refresh failed: {str(error)}")
+        return meta['info']
+
+    def _save_info(self, symbol, meta, info):
+        if info:
+            meta.update({'info': info, 'info_fetched_at': time.time()})
+            self.write_meta(symbol, meta)
+        return info
+
+    def get_info(self, symbol, provider):
+        with self._lock(symbol):
+            meta = self.read_meta(symbol)
+            cached = self._cached_info(meta)
+            if cached is not None:
+                return cached
+
+            try:
+                with provider_slot(provider):
+                    info = provider.get_info(symbol)
+            except Exception as e:
+                return self._stale_info(symbol, meta, e)
+            return self._save_info(symbol, meta, info)
+
+    async def aget_info(self, symbol, provider):
+        async with self._async_lock(symbol):
+            meta = await asyncio.to_thread(self.read_meta, symbol)
+            cached = self._cached_info(meta)
+            if cached is not None:
+                return cached
+            try:
+                info = await provider.aget_info(symbol)
+            except Exception as e:
+                return self._stale_info(symbol, meta, e)
+            return await asyncio.to_thread(self._save_info, symbol, meta, info)
+
+    def _history_range(self, days):
+        end = date.today() + timedelta(days=1)
+        return end - timedelta(days=days or market_data_setting('HISTORY_DAYS')), end
+
+    def get_history(self, symbol, provider, days=None):
+        return self.get_bars(symbol, *self._history_range(days), provider)
+
+    async def aget_history(self, symbol, provider, days=None):
+        return await self.aget_bars(symbol, *self._history_range(days), provider)
+
+
+@lru_cache(maxsize=None)
+def get_provider():
+    return import_string(market_data_setting('PROVIDER'))()
+
+
+@lru_cache(maxsize=None)
+def get_price_store():
+    return PriceStore(
+        market_data_setting('STORE_DIR'),
+        refresh_seconds=market_data_setting('REFRESH_SECONDS'),
+        info_ttl=market_data_setting('INFO_TTL'),
+    )
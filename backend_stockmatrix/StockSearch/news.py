@@ -0,0 +1,112 @@
+"""
+News headline sources and the ``sentimentAnalysis`` section of the stock payload.
+
+Sources follow the market data provider pattern: ``NEWS['SOURCE']`` names a
+class with ``get_headlines(symbol)`` returning ``{'title', 'source', 'link',
+'published'}`` dicts.  YahooNewsSource reads ``yfinance.Ticker.news`` and
+FixtureNewsSource serves ``<FIXTURE_DIR>/<symbol>.json`` for offline use.
+Headline lists are cached per symbol in the response cache and scored through
+the shared per-headline sentiment cache.
+"""
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from backend_stockmatrix.response_cache import ResponseCache
+from backend_stockmatrix.upstream import get_upstream
+from .market_data import symbol_path, yfinance_errors
+from .sentiment import sentiment_scorer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SOURCE': 'StockSearch.news.YahooNewsSource',
+    'FIXTURE_DIR': 'StockSearch/fixtures/news',
+    'MAX_HEADLINES': 10,
+}
+
+news_cache = ResponseCache('news')
+
+
+def news_setting(name):
+    value = getattr(settings, 'NEWS', {}).get(name, DEFAULTS[name])
+    if name.endswith('_DIR'):
+        return Path(settings.BASE_DIR) / value
+    return value
+
+
+class NewsSource:
+    """Base class for headline sources."""
+    name = 'base'
+
+    def get_headlines(self, symbol):
+        raise NotImplementedError
+
+
+class YahooNewsSource(NewsSource):
+    name = 'yahoo'
+
+    def get_headlines(self, symbol):
+        import yfinance as yf
+
+        # Shares the yfinance circuit breaker with the market data provider
+        news = get_upstream('yfinance').call(lambda: yf.Ticker(symbol).news, retry_on=yfinance_errors())
+        headlines = []
+        for item in news or []:
+            # Newer yfinance releases nest the article under 'content'
+            content = item.get('content', item)
+            provider = content.get('provider') or {}
+            link = (content.get('canonicalUrl') or {}).get('url') or content.get('link', '')
+            headlines.append({
+                'title': content.get('title', ''),
+                'source': provider.get('displayName') or content.get('publisher', ''),
+                'link': link,
+                'published': content.get('pubDate') or content.get('providerPublishTime'),
+            })
+        return [headline for headline in headlines if headline['title']]
+
+
+class FixtureNewsSource(NewsSource):
+    """Serves recorded headlines from ``<FIXTURE_DIR>/<symbol>.json``."""
+    name = 'fixture'
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or news_setting('FIXTURE_DIR'))
+
+    def get_headlines(self, symbol):
+        path = symbol_path(self.directory, symbol, '.json')
+        if not path.exists():
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_news_source():
+    return import_string(news_setting('SOURCE'))()
+
+
+def fetch_headlines(symbol):
+    return news_cache.get(symbol, lambda: get_news_source().get_headlines(symbol)[:news_setting('MAX_HEADLINES')])
+
+
+def sentiment_payload(symbol):
+    # News is optional for the stock payload, so upstream failures degrade to no headlines
+    try:
+        headlines = fetch_headlines(symbol)
+    except Exception as e:
+        logger.warning(f"Error fetching news for {symbol}: {str(e)}")
+        headlines = []
+    if not headlines:
+        return {'averageSentiment': 0, 'headlines': []}
+
+    scores = sentiment_scorer.score([headline['title'] for headline in headlines])
+    return {
+        'averageSentiment': round(float(np.mean(scores)), 4),
+        'headlines': [dict(headline, sentiment=score) for headline, score in zip(headlines, scores)],
+    }
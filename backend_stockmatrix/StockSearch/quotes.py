@@ -0,0 +1,245 @@
+"""
+Builds the stock payload returned by StockView and the batch quote endpoint.
+"""
+import asyncio
+import logging
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from rest_framework import status
+
+from backend_stockmatrix.async_http import UPSTREAM_ERRORS
+from backend_stockmatrix.metrics import span
+from backend_stockmatrix.response_cache import ResponseCache
+from backend_stockmatrix.singleflight import SingleFlight
+from .charts import chart_url
+from .forecast import forecast_payload
+from .indicators import indicator_book
+from .market_data import empty_bars, get_price_store, get_provider, market_data_setting
+from .news import sentiment_payload
+
+logger = logging.getLogger(__name__)
+
+# Yahoo tickers such as RELIANCE, M&M, BAJAJ-AUTO or ^NSEI, optionally with an exchange suffix
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9&^.-]{1,20}')
+
+stock_flight = SingleFlight('stock')
+stock_cache = ResponseCache('stock')
+
+
+class StockDataError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class InvalidSymbolError(StockDataError, ValueError):
+    def __init__(self, symbol):
+        super().__init__(f'Invalid stock symbol: {symbol[:40]!r}', status.HTTP_400_BAD_REQUEST)
+
+
+def normalize_symbol(symbol):
+    """Upper-case ``symbol`` with an exchange suffix (.NS by default); raises InvalidSymbolError.
+
+    Symbols name files in the price store and fixture directories, so only
+    ticker characters are accepted.
+    """
+    normalized = str(symbol).strip().upper()
+    if not SYMBOL_PATTERN.fullmatch(normalized) or '..' in normalized:
+        raise InvalidSymbolError(str(symbol))
+    # Handle NSE/BSE suffix
+    if not normalized.endswith('.NS') and not normalized.endswith('.BO'):
+        normalized += '.NS'
+    return normalized
+
+
+def fetch_stock_data(symbol):
+    """Return the StockView payload for a normalized symbol or raise StockDataError.
+
+    Payloads are served from the response cache; on a miss, concurrent
+    requests for the same symbol share a single upstream fetch.
+    """
+    return fetch_tagged_stock_data(symbol)[0]
+
+
+def fetch_tagged_stock_data(symbol):
+    """``(payload, etag)`` for a normalized symbol; the ETag changes only with the payload."""
+    return stock_cache.get_tagged(symbol, lambda: stock_flight.do(symbol, lambda: _build_stock_data(symbol)))
+
+
+async def afetch_tagged_stock_data(symbol):
+    """Async variant of ``fetch_tagged_stock_data`` for the ASGI views."""
+    return await stock_cache.aget_tagged(
+        symbol, lambda: stock_flight.ado(symbol, lambda: _abuild_stock_data(symbol)),
+    )
+
+
+def _info_unavailable(symbol, error):
+    logger.error(f"Error fetching stock info: {str(error)}")
+    return StockDataError(
+        f'Unable to fetch data for {symbol}. The service might be temporarily unavailable.',
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+def _check_info(symbol, stock_info):
+    if not stock_info or len(stock_info) < 5:
+        raise StockDataError(
+            f'No data available for {symbol}. Please check the symbol and try again.',
+            status.HTTP_404_NOT_FOUND,
+        )
+
+
+def _unexpected_error(error):
+    if isinstance(error, StockDataError):
+        return error
+    if isinstance(error, (requests.exceptions.RequestException, *UPSTREAM_ERRORS)):
+        logger.error(f"Request exception: {str(error)}")
+        return StockDataError(
+            'Failed to fetch stock data. The service might be temporarily unavailable.',
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    logger.error(f"Unexpected error: {str(error)}")
+    logger.error(traceback.format_exc())
+    return StockDataError(
+        'An unexpected error occurred while processing your request.',
+        status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
+
+
+def _build_stock_data(symbol):
+    logger.info(f"Processing symbol: {symbol}")
+
+    try:
+        provider = get_provider()
+        store = get_price_store()
+
+        # First try to get basic info with timeout
+        try:
+            with span('info'):
+                stock_info = store.get_info(symbol, provider)
+        except Exception as e:
+            raise _info_unavailable(symbol, e)
+        _check_info(symbol, stock_info)
+
+        # Daily bars come from the local store; only missing dates hit the provider
+        try:
+            with span('history'):
+                history = store.get_history(symbol, provider)
+        except Exception as e:
+            logger.warning(f"Error fetching price history for {symbol}: {str(e)}")
+            history = empty_bars()
+
+        with span('news'):
+            sentiment = sentiment_payload(symbol)
+        return _stock_payload(symbol, stock_info, history, sentiment)
+
+    except Exception as e:
+        raise _unexpected_error(e)
+
+
+async def _abuild_stock_data(symbol):
+    logger.info(f"Processing symbol: {symbol}")
+
+    try:
+        provider = get_provider()
+        store = get_price_store()
+
+        try:
+            with span('info'):
+                stock_info = await store.aget_info(symbol, provider)
+        except Exception as e:
+            raise _info_unavailable(symbol, e)
+        _check_info(symbol, stock_info)
+
+        try:
+            with span('history'):
+                history = await store.aget_history(symbol, provider)
+        except Exception as e:
+            logger.warning(f"Error fetching price history for {symbol}: {str(e)}")
+            history = empty_bars()
+
+        # News sources are blocking clients, so they run in a thread
+        with span('news'):
+            sentiment = await asyncio.to_thread(sentiment_payload, symbol)
+        return _stock_payload(symbol, stock_info, history, sentiment)
+
+    except Exception as e:
+        raise _unexpected_error(e)
+
+
+def _stock_payload(symbol, stock_info, history, sentiment):
+    with span('compute'):
+        return _compute_payload(symbol, stock_info, history, sentiment)
+
+
+def _compute_payload(symbol, stock_info, history, sentiment):
+    # Get current price or use a default
+    last_close = float(history['close'][-1]) if len(history) else 0
+    current_price = stock_info.get('currentPrice', stock_info.get('previousClose', last_close))
+
+    # Only bars this worker has not seen yet are folded into the rolling state
+    technical_indicators = indicator_book.indicators(symbol, history)
+
+    # Get company name
+    company_name = stock_info.get('longName', stock_info.get('shortName', symbol))
+
+    return {
+        'symbol': symbol,
+        'details': {
+            'longName': company_name,
+            'shortName': stock_info.get('shortName', symbol),
+            'industry': stock_info.get('industry', 'N/A'),
+            'sector': stock_info.get('sector', 'N/A'),
+            'country': stock_info.get('country', 'N/A'),
+        },
+        'stock': {
+            'currentPrice': current_price,
+            'previousClose': stock_info.get('previousClose', 'N/A'),
+            'dayLow': stock_info.get('dayLow', 'N/A'),
+            'dayHigh': stock_info.get('dayHigh', 'N/A'),
+        },
+        'technicalIndicators': technical_indicators,
+        # URL of an immutable image rendered outside the request
+        'graph': chart_url(symbol, history, title=f'{company_name} ({symbol})'),
+        'analysis': f"Basic analysis for {company_name} ({symbol}).\n\nThis is a simplified response. For detailed analysis, please try again later.",
+        # Evaluated from the model fitted for the latest completed bar; never fitted here
+        'forecast': forecast_payload(symbol, history, current_price),
+        'sentimentAnalysis': sentiment,
+    }
+
+
+def fetch_stock_batch(symbols, timeout=None):
+    """Fetch many normalized symbols concurrently.
+
+    Returns ``(results, errors)`` keyed by symbol.  Upstream calls are still
+    bounded by the provider's concurrency cap, so the pool size only limits how
+    many symbols are in progress at once.
+    """
+    timeout = timeout or market_data_setting('BATCH_TIMEOUT')
+    results, errors = {}, {}
+    if not symbols:
+        return results, errors
+
+    executor = ThreadPoolExecutor(max_workers=min(len(symbols), market_data_setting('MAX_CONCURRENCY')))
+    try:
+        futures = {executor.submit(fetch_stock_data, symbol): symbol for symbol in symbols}
+        done, not_done = wait(futures, timeout=timeout)
+        for future in done:
+            symbol = futures[future]
+            try:
+                results[symbol] = future.result()
+            except StockDataError as e:
+                errors[symbol] = {'error': e.message, 'status': e.status_code}
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = {
+                'error': 'Timed out waiting for upstream data.',
+                'status': status.HTTP_504_GATEWAY_TIMEOUT,
+            }
+    finally:
+        executor.shutdown(wait=False)
+    return results, errors
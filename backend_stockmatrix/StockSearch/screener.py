@@ -0,0 +1,366 @@
+"""
+Columnar in-memory stock screener.
+
+StockUniverse keeps one NumPy array per column (fundamentals, latest price
+data and technical indicators) with one slot per symbol.  Screen expressions
+such as ``PE < 20 and RSI < 30 and MA50 > MA200`` are parsed once with
+``ast`` and evaluated as vectorized boolean masks over those arrays.
+
+Refreshing is incremental: the universe owns one batched IndicatorState and
+only folds in the daily bars that arrived in the PriceStore since the last
+refresh, then swaps in a new set of columns so screens never see a half-built
+snapshot.  When symbols join or leave the universe, the rows of the symbols
+that stay are carried over and only the new symbols are read in full.
+
+The process-wide universe is built in a background thread, started at worker
+boot by ``warm_universe`` (listed in ``PRELOAD['CALLABLES']``) or by the first
+``get_universe`` call, which returns None until that build is done.
+"""
+import ast
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .indicators import IndicatorState
+from .market_data import get_price_store, get_provider
+
+logger = logging.getLogger(__name__)
+
+# Screener column -> key in the provider's info payload
+FUNDAMENTAL_COLUMNS = {
+    'PE': 'trailingPE',
+    'ForwardPE': 'forwardPE',
+    'PB': 'priceToBook',
+    'EPS': 'trailingEps',
+    'MarketCap': 'marketCap',
+    'DividendYield': 'dividendYield',
+    'Beta': 'beta',
+    'ROE': 'returnOnEquity',
+    'DebtToEquity': 'debtToEquity',
+}
+
+
+def screener_setting(name, default=None):
+    return getattr(settings, 'SCREENER', {}).get(name, default)
+
+
+class ScreenExpressionError(ValueError):
+    pass
+
+
+_COMPARISONS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+_ARITHMETIC = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+
+
+# Bounds the size, and so the nesting depth, of a compiled screen
+MAX_EXPRESSION_NODES = 200
+
+_CONDITIONS = (ast.BoolOp, ast.Compare)
+
+
+def _is_condition(node):
+    return isinstance(node, _CONDITIONS) or (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not))
+
+
+def _compile_condition(node, columns):
+    # A bare value such as ``PE`` would treat every non-zero and NaN row as a match
+    if not _is_condition(node):
+        raise ScreenExpressionError('Expected a comparison such as PE < 20')
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_condition(value, columns) for value in node.values]
+        reduce = np.logical_and.reduce if isinstance(node.op, ast.And) else np.logical_or.reduce
+        return lambda data: reduce([part(data) for part in parts])
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_condition(node.operand, columns)
+        return lambda data: np.logical_not(operand(data))
+
+    operands = [_compile_value(node.left, columns)] + [_compile_value(c, columns) for c in node.comparators]
+    ops = []
+    for op in node.ops:
+        if type(op) not in _COMPARISONS:
+            raise ScreenExpressionError(f'Unsupported comparison {type(op).__name__}')
+        ops.append(_COMPARISONS[type(op)])
+
+    def compare(data):
+        values = [operand(data) for operand in operands]
+        return np.logical_and.reduce([op(values[i], values[i + 1]) for i, op in enumerate(ops)])
+    return compare
+
+
+def _compile_value(node, columns):
+    if _is_condition(node):
+        raise ScreenExpressionError('Comparisons can only be combined with and, or and not')
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        operand = _compile_value(node.operand, columns)
+        return lambda data: np.negative(operand(data))
+    if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        left, right = _compile_value(node.left, columns), _compile_value(node.right, columns)
+        op = _ARITHMETIC[type(node.op)]
+        return lambda data: op(left(data), right(data))
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ScreenExpressionError(f'Unknown column {node.id}')
+        name = node.id
+        return lambda data: data[name]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda data: value
+    raise ScreenExpressionError(f'Unsupported expression: {ast.dump(node)[:60]}')
+
+
+@lru_cache(maxsize=256)
+def compile_expression(expression, columns):
+    """Compile a screen expression into ``fn(columns) -> bool mask``.
+
+    ``columns`` is the frozenset of valid column names.  Rows where a referenced
+    value is missing (NaN) never match a comparison.
+    """
+    text = re.sub(r'\b(AND|OR|NOT)\b', lambda m: m.group().lower(), expression)
+    try:
+        tree = ast.parse(text, mode='eval')
+    except (SyntaxError, RecursionError, MemoryError):
+        raise ScreenExpressionError('Invalid screen expression')
+    # ast.walk is iterative, so this is safe before anything recurses over the tree
+    if sum(1 for _ in ast.walk(tree)) > MAX_EXPRESSION_NODES:
+        raise ScreenExpressionError('Screen expression is too long')
+    return _compile_condition(tree.body, columns)
+
+
+class StockUniverse:
+    def __init__(self, symbols):
+        self.symbols = np.array(symbols, dtype=object)
+        self.state = IndicatorState(len(symbols))
+        self.last_date = np.full(len(symbols), np.datetime64('NaT'), dtype='datetime64[D]')
+        self.latest = np.full((3, len(symbols)), np.nan)  # close, previous close, volume
+        self.fundamentals = {name: np.full(len(symbols), np.nan) for name in FUNDAMENTAL_COLUMNS}
+        self.versions = [None] * len(symbols)
+        self.columns = {}
+        self.refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_columns(cls, symbols, columns):
+        universe = cls(symbols)
+        universe.columns = {name: np.asarray(values, dtype='f8') for name, values in columns.items()}
+        universe.refreshed_at = time.time()
+        return universe
+
+    def with_symbols(self, symbols):
+        """A universe over ``symbols`` that keeps this one's rows for the symbols in both.
+
+        Call ``refresh`` on the result: symbols kept carry their indicator state,
+        versions and columns over and only fold in new bars, while added symbols
+        are read from scratch.
+        """
+        universe = StockUniverse(symbols)
+        index = {symbol: row for row, symbol in enumerate(self.symbols)}
+        with self._refresh_lock:
+            old_rows = np.array([index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+            kept = np.flatnonzero(old_rows >= 0)
+            universe.state = self.state.take(old_rows)
+            universe.last_date[kept] = self.last_date[old_rows[kept]]
+            universe.latest[:, kept] = self.latest[:, old_rows[kept]]
+            for name, values in self.fundamentals.items():
+                universe.fundamentals[name][kept] = values[old_rows[kept]]
+            for row in kept:
+                universe.versions[row] = self.versions[old_rows[row]]
+        return universe
+
+    def refresh(self, store=None, fetch=False):
+        """Fold newly stored bars into the indicator state and rebuild the columns.
+
+        With ``fetch=True`` missing bars and stale info are first pulled through
+        the provider; otherwise only what is already in the PriceStore is used.
+        """
+        store = store or get_price_store()
+        provider = get_provider() if fetch else None
+        n = len(self.symbols)
+
+        with self._refresh_lock:
+            started = time.perf_counter()
+            rows, dates, closes = [], [], []
+            latest, fundamentals = self.latest, self.fundamentals
+            # Versions and last dates are committed once the new bars are in the state,
+            # so a failed read or refresh is retried next time instead of skipped
+            versions, last_date = list(self.versions), self.last_date.copy()
+
+            for row, symbol in enumerate(self.symbols):
+                if fetch:
+                    try:
+                        store.get_info(symbol, provider)
+                        store.get_history(symbol, provider)
+                    except Exception as e:
+                        logger.warning(f"Screener refresh could not fetch {symbol}: {str(e)}")
+
+                # Symbols whose files have not changed since the last refresh are skipped
+                bars_version, meta_version = store.version(symbol)
+                previous_bars_version, previous_meta_version = versions[row] or (None, None)
+                try:
+                    bars = store.read_bars(symbol) if bars_version != previous_bars_version else ()
+                    info = None
+                    if meta_version != previous_meta_version:
+                        info = store.read_meta(symbol).get('info') or {}
+                except Exception as e:
+                    logger.warning(f"Screener refresh could not read {symbol}: {str(e)}")
+                    continue
+
+                if len(bars):
+                    # The latest bar can still change, so only earlier bars are committed
+                    completed = bars[:-1]
+                    if not np.isnat(last_date[row]):
+                        completed = completed[completed['date'] > last_date[row]]
+                    if len(completed):
+                        rows.append(np.full(len(completed), row))
+                        dates.append(completed['date'])
+                        closes.append(completed['close'])
+                        last_date[row] = completed['date'][-1]
+                    latest[0, row] = bars['close'][-1]
+                    latest[1, row] = bars['close'][-2] if len(bars) > 1 else np.nan
+                    latest[2, row] = bars['volume'][-1]
+
+                if info is not None:
+                    for name, key in FUNDAMENTAL_COLUMNS.items():
+                        value = info.get(key)
+                        fundamentals[name][row] = value if isinstance(value, (int, float)) else np.nan
+                versions[row] = (bars_version, meta_version)
+
+            if rows:
+                rows, dates, closes = np.concatenate(rows), np.concatenate(dates), np.concatenate(closes)
+                unique_dates, date_index = np.unique(dates, return_inverse=True)
+                matrix = np.full((n, len(unique_dates)), np.nan)
+                matrix[rows, date_index] = closes
+                for column in matrix.T:
+                    self.state.update(column)
+            self.versions, self.last_date = versions, last_date
+
+            peek = self.state.copy()
+            peek.update(latest[0])
+            columns = {name: values.copy() for name, values in fundamentals.items()}
+            columns.update(peek.snapshot())
+            with np.errstate(divide='ignore', invalid='ignore'):
+                columns['Change'] = (latest[0] / latest[1] - 1) * 100
+            columns['Price'] = latest[0].copy()
+            columns['Volume'] = latest[2].copy()
+
+            self.columns = columns
+            self.refreshed_at = time.time()
+            logger.info(f"Screener refreshed {n} symbols in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def screen(self, expression, sort=None, limit=50, fields=None):
+        """Symbols matching ``expression`` as ``(total, rows)``."""
+        columns = self.columns
+        mask = compile_expression(expression, frozenset(columns))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matched = np.flatnonzero(np.broadcast_to(mask(columns), len(self.symbols)))
+
+        if sort:
+            name = sort.lstrip('-')
+            if name not in columns:
+                raise ScreenExpressionError(f'Unknown column {name}')
+            keys = columns[name][matched]
+            # NaN sorts last in both directions
+            order = np.argsort(-keys if sort.startswith('-') else keys, kind='stable')
+            matched = matched[order]
+
+        fields = fields or sorted(columns)
+        page = matched[:limit]
+        results = []
+        for row in page:
+            record = {'symbol': self.symbols[row]}
+            for name in fields:
+                value = columns[name][row]
+                record[name] = None if np.isnan(value) else round(float(value), 4)
+            results.append(record)
+        return len(matched), results
+
+
+def universe_symbols():
+    """Symbols from SCREENER['UNIVERSE_FILE'] plus everything already in the PriceStore."""
+    symbols = []
+    universe_file = screener_setting('UNIVERSE_FILE')
+    if universe_file and Path(universe_file).exists():
+        symbols += [line.strip() for line in Path(universe_file).read_text().splitlines() if line.strip()]
+    store_dir = get_price_store().directory
+    if store_dir.exists():
+        symbols += sorted(path.stem for path in store_dir.glob('*.npy'))
+    return list(dict.fromkeys(symbols))
+
+
+_universe = None
+_background_refresh_lock = threading.Lock()
+
+
+def _after_fork_in_child():
+    # A build running in the parent (e.g. gunicorn --preload) does not exist in
+    # the child, so its lock must not stay held there
+    global _background_refresh_lock
+    _background_refresh_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _background_refresh(universe):
+    global _universe
+    try:
+        symbols = universe_symbols()
+        if universe is None:
+            replacement = StockUniverse(symbols)
+            replacement.refresh()
+            _universe = replacement
+        elif symbols == list(universe.symbols):
+            universe.refresh()
+        else:
+            # Membership changed: carry the unchanged rows over and swap in when ready
+            replacement = universe.with_symbols(symbols)
+            replacement.refresh()
+            _universe = replacement
+    except Exception as e:
+        logger.error(f"Screener refresh failed: {str(e)}")
+    finally:
+        _background_refresh_lock.release()
+
+
+def _start_refresh(universe):
+    if _background_refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_background_refresh, args=(universe,), daemon=True).start()
+
+
+def warm_universe():
+    """Start building the process-wide universe in the background, if it is not built yet."""
+    if _universe is None:
+        _start_refresh(None)
+
+
+def get_universe():
+    """The process-wide universe, or None while its first build is still running.
+
+    Once it is older than SCREENER['REFRESH_SECONDS'] the current columns keep
+    being served while one background thread refreshes them.
+    """
+    universe = _universe
+    if universe is None:
+        warm_universe()
+        return None
+    if time.time() - universe.refreshed_at > screener_setting('REFRESH_SECONDS', 300):
+        _start_refresh(universe)
+    return universe
@@ -0,0 +1,114 @@
+"""
+Batched lexicon sentiment scoring for news headlines.
+
+Headlines are tokenized and mapped to a fixed vocabulary of finance terms;
+the scores of a whole batch are then computed at once with ``np.add.at`` over
+(headline, weight) pairs.  A negation ("not", "no", "isn't", ...) flips the
+sign of the first term within the next NEGATION_SCOPE tokens.  Each
+headline's score is normalized into ``[-1, 1]`` VADER-style as
+``s / sqrt(s**2 + ALPHA)``.
+
+Scores are memoized in the response cache alias under a hash of the headline
+text, so a headline is scored once however many symbols or users it shows up
+for.
+"""
+import hashlib
+import re
+import threading
+
+import numpy as np
+from django.core.cache import caches
+
+from backend_stockmatrix.response_cache import response_cache_setting
+
+ALPHA = 15.0
+NEGATION_SCOPE = 3
+SCORE_TTL = 30 * 24 * 3600
+
+LEXICON = {
+    # Positive
+    'beat': 2.0, 'beats': 2.0, 'surge': 2.5, 'surges': 2.5, 'soar': 2.5, 'soars': 2.5,
+    'jump': 1.8, 'jumps': 1.8, 'rally': 2.0, 'rallies': 2.0, 'gain': 1.5, 'gains': 1.5,
+    'rise': 1.2, 'rises': 1.2, 'up': 0.6, 'high': 0.8, 'record': 1.2, 'growth': 1.5,
+    'profit': 1.5, 'profits': 1.5, 'strong': 1.6, 'upgrade': 2.0, 'upgrades': 2.0,
+    'outperform': 2.0, 'buy': 1.2, 'bullish': 2.2, 'boost': 1.6, 'boosts': 1.6,
+    'expands': 1.2, 'expansion': 1.2, 'wins': 1.6, 'win': 1.4, 'approval': 1.5,
+    'approves': 1.5, 'dividend': 1.0, 'buyback': 1.2, 'robust': 1.6, 'recovery': 1.4,
+    'optimistic': 1.8, 'positive': 1.5, 'upbeat': 1.8, 'tops': 1.5, 'best': 1.5,
+    # Negative
+    'miss': -2.0, 'misses': -2.0, 'plunge': -2.5, 'plunges': -2.5, 'crash': -3.0,
+    'slump': -2.2, 'slumps': -2.2, 'fall': -1.5, 'falls': -1.5, 'drop': -1.5,
+    'drops': -1.5, 'decline': -1.5, 'declines': -1.5, 'down': -0.6, 'low': -0.8,
+    'loss': -1.8, 'losses': -1.8, 'weak': -1.6, 'downgrade': -2.0, 'downgrades': -2.0,
+    'underperform': -2.0, 'sell': -1.2, 'bearish': -2.2, 'cut': -1.2, 'cuts': -1.2,
+    'probe': -1.8, 'fraud': -3.0, 'lawsuit': -2.0, 'penalty': -1.8, 'fine': -1.0,
+    'debt': -0.8, 'default': -2.5, 'layoffs': -2.0, 'warning': -1.8, 'warns': -1.8,
+    'concern': -1.4, 'concerns': -1.4, 'risk': -1.0, 'volatile': -1.0, 'worst': -2.0,
+    'pessimistic': -1.8, 'negative': -1.5, 'slowdown': -1.6, 'halt': -1.6, 'resigns': -1.5,
+}
+NEGATIONS = {'not', 'no', 'never', 'without', 'fails', 'failed'}
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+_TERMS = list(LEXICON)
+_TERM_INDEX = {term: index for index, term in enumerate(_TERMS)}
+_WEIGHTS = np.array([LEXICON[term] for term in _TERMS])
+
+
+def headline_hash(text):
+    return hashlib.sha1(' '.join(text.lower().split()).encode()).hexdigest()
+
+
+def score_headlines(texts):
+    """Sentiment in ``[-1, 1]`` for each text, computed for the whole batch at once."""
+    rows, terms, signs = [], [], []
+    for row, text in enumerate(texts):
+        negated_until = -1
+        for position, token in enumerate(_TOKEN.findall(text.lower())):
+            if token in NEGATIONS or token.endswith("n't"):
+                negated_until = position + NEGATION_SCOPE
+                continue
+            index = _TERM_INDEX.get(token)
+            if index is not None:
+                rows.append(row)
+                terms.append(index)
+                signs.append(-1.0 if position <= negated_until else 1.0)
+                negated_until = -1
+
+    raw = np.zeros(len(texts))
+    if rows:
+        np.add.at(raw, np.array(rows), _WEIGHTS[np.array(terms)] * np.array(signs))
+    return raw / np.sqrt(raw * raw + ALPHA)
+
+
+class SentimentScorer:
+    """Scores headlines through a shared per-headline cache."""
+
+    def __init__(self):
+        self.scored = 0
+        self.cached = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[response_cache_setting('ALIAS', 'default')]
+
+    def score(self, texts):
+        keys = [f'sentiment:{headline_hash(text)}' for text in texts]
+        known = self.cache.get_many(keys)
+        missing = [index for index, key in enumerate(keys) if key not in known]
+        if missing:
+            scores = score_headlines([texts[index] for index in missing])
+            fresh = {keys[index]: round(float(score), 4) for index, score in zip(missing, scores)}
+            self.cache.set_many(fresh, SCORE_TTL)
+            known.update(fresh)
+        with self._lock:
+            self.scored += len(missing)
+            self.cached += len(keys) - len(missing)
+        return [known[key] for key in keys]
+
+    def stats(self):
+        return {'scored': self.scored, 'cached': self.cached}
+
+
+sentiment_scorer = SentimentScorer()
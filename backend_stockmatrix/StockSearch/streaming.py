@@ -0,0 +1,334 @@
+"""
+Live quote streaming over Server-Sent Events and WebSocket (ASGI only).
+
+Subscribers never poll upstream themselves.  Each event loop has one
+QuoteHub.  The hub runs one poller task per subscribed symbol.  The poller
+asks the market data provider for the symbol's info every ``POLL_SECONDS``
+and pushes changed quotes to every subscriber's queue.  It is cancelled when
+the last subscriber leaves.  Upstream traffic therefore grows with the number
+of distinct symbols being watched, not with the number of connected clients.
+
+A subscriber queue is bounded.  A client that falls behind loses its oldest
+quotes, so it never holds up the poller or the other subscribers.  A new
+subscriber gets the last known quote at once.
+
+Events are dicts with a ``type`` of ``quote`` or ``error``:
+
+* ``GET /api/stream/quotes/?symbols=TCS,INFY`` streams them as SSE.
+* ``ws://<host>/ws/quotes/?symbols=TCS`` sends them as JSON text frames.
+  Clients may also send ``{"subscribe": [...]}`` or ``{"unsubscribe": [...]}``
+  with a list of symbol strings.
+
+Each worker's hub serves at most ``MAX_CONNECTIONS_PER_CLIENT`` streams per
+client address and polls at most ``MAX_HUB_SYMBOLS`` symbols.  WebSocket
+connects are rate limited per address and only accepted from the page's own
+origin or one of ``ALLOWED_ORIGINS``, since browsers apply no CORS checks to
+WebSockets.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend_stockmatrix.metrics import register_collector
+from backend_stockmatrix.ratelimit import check_rate_limit
+from backend_stockmatrix.renderers import dumps
+from .market_data import get_provider
+from .quotes import InvalidSymbolError, normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLL_SECONDS': 5,
+    'HEARTBEAT_SECONDS': 15,
+    'QUEUE_SIZE': 32,
+    'MAX_SYMBOLS': 20,
+    'MAX_CONNECTIONS_PER_CLIENT': 5,
+    'MAX_HUB_SYMBOLS': 500,
+    'ALLOWED_ORIGINS': (),
+    'CONNECT_RATE_LIMIT': 30,
+}
+
+WEBSOCKET_PATH = '/ws/quotes/'
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def streaming_setting(name):
+    return getattr(settings, 'STREAMING', {}).get(name, DEFAULTS[name])
+
+
+class SubscriptionError(ValueError):
+    pass
+
+
+class StreamCapacityError(SubscriptionError):
+    """The client or the hub already has as many streams or symbols as allowed."""
+
+
+def parse_symbols(values):
+    """Normalized, de-duplicated symbols from a list of comma-separated strings."""
+    symbols = []
+    for value in values:
+        for symbol in str(value).split(','):
+            if symbol.strip():
+                try:
+                    symbol = normalize_symbol(symbol)
+                except InvalidSymbolError as e:
+                    raise SubscriptionError(e.message)
+                if symbol not in symbols:
+                    symbols.append(symbol)
+    return symbols
+
+
+def command_symbols(command, action):
+    """Symbols listed under ``action`` in a WebSocket command."""
+    values = command.get(action, [])
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f'{action} must be a list of stock symbols')
+    return parse_symbols(values)
+
+
+def quote_from_info(symbol, info):
+    price = info.get('currentPrice', info.get('regularMarketPrice'))
+    previous_close = info.get('previousClose')
+    change = price - previous_close if price is not None and previous_close else None
+    return {
+        'type': 'quote',
+        'symbol': symbol,
+        'price': price,
+        'previousClose': previous_close,
+        'change': round(change, 4) if change is not None else None,
+        'changePercent': round(change / previous_close * 100, 4) if change is not None else None,
+        'dayHigh': info.get('dayHigh'),
+        'dayLow': info.get('dayLow'),
+        'volume': info.get('volume'),
+    }
+
+
+def offer(queue, event):
+    # Slow consumers lose their oldest events instead of blocking the poller
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class QuoteHub:
+    """Fans out one poller per symbol to any number of subscriber queues."""
+
+    def __init__(self, provider=None, poll_seconds=None):
+        self.provider = provider or get_provider()
+        self.poll_seconds = poll_seconds or streaming_setting('POLL_SECONDS')
+        self.polls = 0
+        self._subscribers = {}
+        self._pollers = {}
+        self._last = {}
+        self._connections = Counter()
+
+    def connect(self, client):
+        if self._connections[client] >= streaming_setting('MAX_CONNECTIONS_PER_CLIENT'):
+            raise StreamCapacityError('Too many quote streams from this address')
+        self._connections[client] += 1
+
+    def disconnect(self, client):
+        self._connections[client] -= 1
+        if self._connections[client] <= 0:
+            del self._connections[client]
+
+    def subscribe(self, symbol, queue):
+        if symbol not in self._pollers and len(self._pollers) >= streaming_setting('MAX_HUB_SYMBOLS'):
+            raise StreamCapacityError('Quote streaming is at capacity; please try again later')
+        subscribers = self._subscribers.setdefault(symbol, set())
+        subscribers.add(queue)
+        if symbol in self._last:
+            offer(queue, self._last[symbol])
+        if symbol not in self._pollers:
+            logger.info(f"Starting quote poller for {symbol}")
+            self._pollers[symbol] = asyncio.get_running_loop().create_task(self._poll(symbol))
+
+    def unsubscribe(self, symbol, queue):
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            logger.info(f"Stopping quote poller for {symbol}")
+            del self._subscribers[symbol]
+            self._last.pop(symbol, None)
+            self._pollers.pop(symbol).cancel()
+
+    def _publish(self, symbol, event):
+        for queue in self._subscribers.get(symbol, ()):
+            offer(queue, event)
+
+    async def _poll(self, symbol):
+        while True:
+            self.polls += 1
+            try:
+                event = quote_from_info(symbol, await self.provider.aget_info(symbol))
+            except Exception as e:
+                logger.warning(f"Quote poll for {symbol} failed: {str(e)}")
+                event = {'type': 'error', 'symbol': symbol, 'error': 'Quote temporarily unavailable'}
+
+            # Unchanged quotes are not re-sent
+            last = self._last.get(symbol)
+            if last is None or dict(last, time=None) != dict(event, time=None):
+                self._last[symbol] = dict(event, time=time.time())
+                self._publish(symbol, self._last[symbol])
+            await asyncio.sleep(self.poll_seconds)
+
+    def stats(self):
+        return {
+            'connections': sum(self._connections.values()),
+            'symbols': len(self._pollers),
+            'subscribers': sum(len(queues) for queues in self._subscribers.values()),
+            'polls': self.polls,
+        }
+
+
+@register_collector
+def _quote_hub_metrics():
+    stats = [hub.stats() for hub in list(_hubs.values())]
+    return [
+        ('stockmatrix_quote_stream_symbols', 'gauge', 'Symbols with a running quote poller.', [
+            ({}, sum(hub['symbols'] for hub in stats)),
+        ]),
+        ('stockmatrix_quote_stream_subscribers', 'gauge', 'Symbol subscriptions across connected quote streams.', [
+            ({}, sum(hub['subscribers'] for hub in stats)),
+        ]),
+        ('stockmatrix_quote_stream_polls_total', 'counter', 'Upstream quote polls by live hubs.', [
+            ({}, sum(hub['polls'] for hub in stats)),
+        ]),
+        ('stockmatrix_quote_stream_connections', 'gauge', 'Connected quote streams.', [
+            ({}, sum(hub['connections'] for hub in stats)),
+        ]),
+    ]
+
+
+def get_quote_hub():
+    """The QuoteHub for the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = QuoteHub()
+    return _hubs[loop]
+
+
+class QuoteSubscription:
+    """One client's queue and set of subscribed symbols on a hub."""
+
+    def __init__(self, client, hub=None):
+        self.hub = hub or get_quote_hub()
+        self.hub.connect(client)
+        self.client = client
+        self.queue = asyncio.Queue(streaming_setting('QUEUE_SIZE'))
+        self.symbols = set()
+        self.closed = False
+
+    def subscribe(self, symbols):
+        if len(self.symbols | set(symbols)) > streaming_setting('MAX_SYMBOLS'):
+            raise SubscriptionError(f"At most {streaming_setting('MAX_SYMBOLS')} symbols per connection")
+        for symbol in symbols:
+            if symbol not in self.symbols:
+                self.hub.subscribe(symbol, self.queue)
+                self.symbols.add(symbol)
+
+    def unsubscribe(self, symbols):
+        for symbol in symbols:
+            if symbol in self.symbols:
+                self.symbols.discard(symbol)
+                self.hub.unsubscribe(symbol, self.queue)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.unsubscribe(list(self.symbols))
+            self.hub.disconnect(self.client)
+
+
+async def sse_events(subscription):
+    """SSE body for ``subscription``; unsubscribes when the client goes away."""
+    heartbeat = streaming_setting('HEARTBEAT_SECONDS')
+    try:
+        # Browsers reconnect after this many milliseconds if the stream drops
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {dumps(event).decode()}\n\n"
+    finally:
+        subscription.close()
+
+
+def origin_allowed(scope):
+    """Whether a WebSocket handshake comes from this site or one of ``ALLOWED_ORIGINS``."""
+    headers = dict(scope.get('headers', ()))
+    origin = headers.get(b'origin')
+    # Only browsers send Origin, and only browser pages can ride on a user's session
+    if origin is None:
+        return True
+    origin = origin.decode('latin-1')
+    return (
+        urlsplit(origin).netloc == headers.get(b'host', b'').decode('latin-1')
+        or origin in streaming_setting('ALLOWED_ORIGINS')
+    )
+
+
+async def quote_websocket(scope, receive, send):
+    """Raw ASGI handler for ``WEBSOCKET_PATH``."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    client = (scope.get('client') or (None,))[0]
+    if not origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': 1008, 'reason': 'Origin not allowed'})
+        return
+    result = await sync_to_async(check_rate_limit)('quote_websocket', client, limit=streaming_setting('CONNECT_RATE_LIMIT'))
+    if not result.allowed:
+        await send({'type': 'websocket.close', 'code': 1013, 'reason': 'Too many requests'})
+        return
+
+    try:
+        subscription = QuoteSubscription(client)
+    except StreamCapacityError as e:
+        await send({'type': 'websocket.close', 'code': 1013, 'reason': str(e)})
+        return
+    try:
+        subscription.subscribe(parse_symbols(parse_qs(scope.get('query_string', b'').decode()).get('symbols', [])))
+    except SubscriptionError as e:
+        subscription.close()
+        code = 1013 if isinstance(e, StreamCapacityError) else 1008
+        await send({'type': 'websocket.close', 'code': code, 'reason': str(e)})
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def forward():
+        while True:
+            event = await subscription.queue.get()
+            await send({'type': 'websocket.send', 'text': dumps(event).decode()})
+
+    forwarder = asyncio.get_running_loop().create_task(forward())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            try:
+                command = json.loads(message.get('text') or '')
+                if not isinstance(command, dict):
+                    raise ValueError('Expected a JSON object')
+                subscription.unsubscribe(command_symbols(command, 'unsubscribe'))
+                subscription.subscribe(command_symbols(command, 'subscribe'))
+            except (ValueError, SubscriptionError) as e:
+                offer(subscription.queue, {'type': 'error', 'error': str(e)})
+    finally:
+        forwarder.cancel()
+        subscription.close()
@@ -0,0 +1,31 @@
+"""
+Deterministic synthetic market data for benchmarks and offline experiments.
+"""
+import numpy as np
+
+from .market_data import BAR_DTYPE
+
+
+def nse_symbols(count):
+    return [f'SYM{i:04d}.NS' for i in range(count)]
+
+
+def random_walk_closes(n_symbols, n_days, seed=0, start_price=100.0, volatility=0.02):
+    """Geometric random-walk closes, shape (n_symbols, n_days)."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, volatility, size=(n_symbols, n_days))
+    return start_price * np.exp(np.cumsum(returns, axis=1))
+
+
+def random_walk_bars(n_days, seed=0, end=None):
+    """A single symbol's daily bars ending at ``end`` (defaults to today)."""
+    end = np.datetime64(end or 'today', 'D')
+    closes = random_walk_closes(1, n_days, seed=seed)[0]
+    bars = np.empty(n_days, dtype=BAR_DTYPE)
+    bars['date'] = end - np.arange(n_days)[::-1]
+    bars['close'] = closes
+    bars['open'] = np.concatenate([[closes[0]], closes[:-1]])
+    bars['high'] = np.maximum(bars['open'], closes) * 1.005
+    bars['low'] = np.minimum(bars['open'], closes) * 0.995
+    bars['volume'] = 1_000_000.0
+    return bars
@@ -1,4 +1,760 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
-#  will be added sooner
\ No newline at end of file
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+from backend_stockmatrix import ratelimit
+from . import charts, forecast, news, quotes, screener, sentiment, streaming
+from .backtest import IndicatorSeries
+from .indicators import INDICATOR_NAMES, IndicatorBook, IndicatorState, compute_indicators
+from .market_data import BAR_DTYPE, MarketDataProvider, PriceStore
+from .quotes import InvalidSymbolError, normalize_symbol
+from .screener import ScreenExpressionError, StockUniverse
+
+# Libraries that only the code paths using them may import
+LAZY_MODULES = ('yfinance', 'pandas', 'matplotlib', 'sklearn')
+
+# Seconds to import the URLconf after django.setup(); about 0.4 s today
+URLCONF_IMPORT_BUDGET = 0.75
+
+URLCONF_IMPORT = f"""
+import json, sys, time
+import django
+django.setup()
+started = time.perf_counter()
+import {settings.ROOT_URLCONF}
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'lazy': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def import_urlconf():
+    # A fresh interpreter, so nothing is already imported by the test run
+    result = subprocess.run(
+        [sys.executable, '-c', URLCONF_IMPORT],
+        cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class URLConfImportTests(SimpleTestCase):
+    def test_heavy_libraries_load_on_first_use(self):
+        self.assertEqual(import_urlconf()['lazy'], [])
+
+    def test_import_time_budget(self):
+        # Best of three, to keep a busy machine from failing the build
+        seconds = min(import_urlconf()['seconds'] for _ in range(3))
+        self.assertLess(
+            seconds, URLCONF_IMPORT_BUDGET,
+            f'Importing the URLconf took {seconds:.2f} s (budget {URLCONF_IMPORT_BUDGET} s)',
+        )
+
+
+def random_walk(n_days, seed=7):
+    return 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.02, n_days)))
+
+
+def make_bars(closes):
+    bars = np.zeros(len(closes), dtype=BAR_DTYPE)
+    bars['date'] = np.datetime64('2024-01-01') + np.arange(len(closes))
+    bars['close'] = closes
+    return bars
+
+
+def reference_ema(values, period):
+    # Seeded with the first value, as pandas ewm(adjust=False)
+    alpha = 2 / (period + 1)
+    out = [values[0]]
+    for value in values[1:]:
+        out.append(out[-1] + alpha * (value - out[-1]))
+    return out
+
+
+def reference_indicators(closes):
+    """Indicators of the last bar, one bar at a time in plain Python."""
+    closes = list(closes)
+    n = len(closes)
+    macd_line = [fast - slow for fast, slow in zip(reference_ema(closes, 12), reference_ema(closes, 26))]
+    signal = reference_ema(macd_line, 9)
+
+    rsi = None
+    if n > 14:
+        changes = [b - a for a, b in zip(closes, closes[1:])]
+        gain = sum(max(c, 0) for c in changes[:14]) / 14
+        loss = sum(max(-c, 0) for c in changes[:14]) / 14
+        for change in changes[14:]:
+            gain = (gain * 13 + max(change, 0)) / 14
+            loss = (loss * 13 + max(-change, 0)) / 14
+        rsi = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+
+    window = closes[-20:]
+    middle = sum(window) / 20
+    std = (sum((close - middle) ** 2 for close in window) / 20) ** 0.5
+    return {
+        'RSI': rsi,
+        'MA50': sum(closes[-50:]) / 50 if n >= 50 else None,
+        'MA200': sum(closes[-200:]) / 200 if n >= 200 else None,
+        'MACD': macd_line[-1] if n >= 26 else None,
+        'SignalLine': signal[-1] if n >= 34 else None,
+        'BollingerUpper': middle + 2 * std if n >= 20 else None,
+        'BollingerMiddle': middle if n >= 20 else None,
+        'BollingerLower': middle - 2 * std if n >= 20 else None,
+    }
+
+
+class IndicatorStateTests(SimpleTestCase):
+    def assertMatchesReference(self, snapshot, row, closes):
+        for name, expected in reference_indicators(closes).items():
+            actual = snapshot[name][row]
+            if expected is None:
+                self.assertTrue(np.isnan(actual), f'{name} should not be ready after {len(closes)} bars')
+            else:
+                self.assertAlmostEqual(actual, expected, places=8, msg=f'{name} after {len(closes)} bars')
+
+    def test_matches_reference_computation(self):
+        closes = random_walk(260)
+        for n_bars in (1, 10, 15, 20, 26, 34, 50, 120, 200, 260):
+            state = IndicatorState.from_closes(closes[:n_bars])
+            self.assertMatchesReference(state.snapshot(), 0, closes[:n_bars])
+
+    def test_nan_padded_histories_warm_together(self):
+        long, short = random_walk(240, seed=1), random_walk(40, seed=2)
+        padded = np.vstack([long, np.concatenate([np.full(200, np.nan), short])])
+        snapshot = IndicatorState.from_closes(padded).snapshot()
+        self.assertMatchesReference(snapshot, 0, long)
+        self.assertMatchesReference(snapshot, 1, short)
+
+    def test_short_history_gives_null_indicators(self):
+        indicators = IndicatorBook().indicators('SHORT.NS', make_bars(random_walk(10)))
+        for name in INDICATOR_NAMES:
+            self.assertIsNone(indicators[name], name)
+        # Nulls, not NaN, so the payload stays valid JSON
+        json.dumps(indicators, allow_nan=False)
+
+    def test_failed_fetch_gives_null_indicators(self):
+        self.assertEqual(IndicatorBook().indicators('NONE.NS', make_bars([])), {name: None for name in INDICATOR_NAMES})
+
+    def test_book_matches_a_fresh_computation_across_new_bars(self):
+        closes, book = random_walk(120), IndicatorBook()
+        for n_bars in (60, 61, 75, 120):
+            indicators = book.indicators('BOOK.NS', make_bars(closes[:n_bars]))
+            expected = compute_indicators({'BOOK.NS': make_bars(closes[:n_bars])})['BOOK.NS']
+            self.assertEqual(indicators, expected)
+
+
+class ForecastTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.forecast_store = forecast.ForecastStore(directory.name)
+        patcher = mock.patch.object(forecast, 'get_forecast_store', return_value=self.forecast_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Wednesday 2024-02-28 is the last completed bar, Thursday's is still moving
+        self.bars = make_bars(random_walk(60))
+
+    def test_ready_and_pending_forecasts_share_their_dates(self):
+        with mock.patch.object(forecast._fit_executor, 'submit') as submit:
+            pending = forecast.forecast_payload('TCS.NS', self.bars, 100.0)
+        submit.assert_called_once()
+        self.forecast_store.save(forecast.fit_histories({'TCS.NS': self.bars}))
+        ready = forecast.forecast_payload('TCS.NS', self.bars, 100.0)
+
+        self.assertEqual((pending['status'], ready['status']), ('pending', 'ready'))
+        self.assertEqual(ready['asOf'], '2024-02-28')
+        self.assertEqual(ready['forecastDates'], pending['forecastDates'])
+        self.assertEqual(ready['forecastDates'][:2], ['2024-03-01', '2024-03-04'])
+
+    def test_predictions_count_trading_days_from_the_model(self):
+        model = forecast.fit_histories({'TCS.NS': self.bars})[0]
+        prices, dates = forecast.predict(model, 3, start=self.bars['date'][-1])
+        # Friday, then Monday and Tuesday: two to four trading days after Wednesday
+        self.assertEqual([str(day) for day in dates], ['2024-03-01', '2024-03-04', '2024-03-05'])
+        np.testing.assert_allclose(prices, np.exp(model['intercept'] + model['slope'] * np.array([2, 3, 4])))
+
+
+class SentimentCacheTests(SimpleTestCase):
+    HEADLINES = ['Infosys beats estimates as profits surge', 'Regulator opens fraud probe into lender']
+
+    def setUp(self):
+        self.backend = LocMemCache('sentiment-tests', {})
+        self.backend.clear()
+        patcher = mock.patch.object(
+            sentiment.SentimentScorer, 'cache', new_callable=mock.PropertyMock, return_value=self.backend,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scorer = sentiment.SentimentScorer()
+
+    def score(self, texts):
+        """Scores plus the headlines that actually went through the scoring pass."""
+        with mock.patch.object(sentiment, 'score_headlines', wraps=sentiment.score_headlines) as scored:
+            scores = self.scorer.score(texts)
+        return scores, [text for call in scored.call_args_list for text in call.args[0]]
+
+    def test_repeated_headlines_are_served_from_the_cache(self):
+        first, scored = self.score(self.HEADLINES)
+        self.assertEqual(scored, self.HEADLINES)
+        self.assertGreater(first[0], 0)
+        self.assertLess(first[1], 0)
+
+        second, scored = self.score(list(reversed(self.HEADLINES)))
+        self.assertEqual((second, scored), (list(reversed(first)), []))
+        self.assertEqual(self.scorer.stats(), {'scored': 2, 'cached': 2})
+
+    def test_scores_are_recomputed_once_they_expire(self):
+        self.score(self.HEADLINES)
+        with mock.patch.object(time, 'time', return_value=time.time() + sentiment.SCORE_TTL + 1):
+            _, scored = self.score(self.HEADLINES[:1])
+        self.assertEqual(scored, self.HEADLINES[:1])
+
+    def test_key_follows_the_headline_text(self):
+        self.score(self.HEADLINES)
+        # Case and spacing do not change the key, any other edit does
+        _, scored = self.score(['INFOSYS beats estimates  as profits surge '])
+        self.assertEqual(scored, [])
+        _, scored = self.score(['Infosys misses estimates as profits surge', self.HEADLINES[1]])
+        self.assertEqual(scored, ['Infosys misses estimates as profits surge'])
+        self.assertNotEqual(
+            sentiment.headline_hash(self.HEADLINES[0]), sentiment.headline_hash('Infosys misses estimates as profits surge'),
+        )
+
+    def test_payload_scores_only_new_headlines(self):
+        headlines = [{'title': title, 'source': 'Wire'} for title in self.HEADLINES]
+        with mock.patch.object(news, 'sentiment_scorer', self.scorer), \
+                mock.patch.object(news, 'fetch_headlines', side_effect=lambda symbol: list(headlines)):
+            payload = news.sentiment_payload('INFY.NS')
+            headlines.append({'title': 'Lender shares plunge on default warning', 'source': 'Wire'})
+            updated = news.sentiment_payload('INFY.NS')
+
+        self.assertEqual([headline['sentiment'] for headline in updated['headlines'][:2]],
+                         [headline['sentiment'] for headline in payload['headlines']])
+        self.assertLess(updated['headlines'][2]['sentiment'], 0)
+        self.assertEqual(self.scorer.stats(), {'scored': 3, 'cached': 2})
+
+
+class ChartCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(CHARTS=dict(settings.CHARTS, IMAGE_DIR=self.directory, MAX_CHARTS=3))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_chart(self, key, age, now=1_000_000):
+        for path in charts.chart_paths(key):
+            path.write_bytes(b'')
+            os.utime(path, (now - age, now - age))
+
+    def remaining(self):
+        return sorted(path.stem for path in self.directory.glob('*.npz'))
+
+    def test_prunes_expired_then_oldest_beyond_the_cap(self):
+        lifetime = charts.payload_lifetime()
+        for n, age in enumerate((lifetime + 10, lifetime + 20, lifetime + 30, lifetime + 40,
+                                 settings.CHARTS['MAX_AGE'] + 1)):
+            self.make_chart(f'chart{n}', age)
+        self.assertEqual(charts.prune_charts(now=1_000_000), 2)
+        self.assertEqual(self.remaining(), ['chart0', 'chart1', 'chart2'])
+        self.assertEqual(len(list(self.directory.iterdir())), 6)
+
+    def test_keeps_charts_cached_payloads_may_still_link_to(self):
+        lifetime = charts.payload_lifetime()
+        self.assertEqual(lifetime, settings.RESPONSE_CACHE['stock']['TTL'] + settings.RESPONSE_CACHE['stock']['STALE_TTL'])
+        for n, age in enumerate((10, 20, 30, 40, lifetime + 1)):
+            self.make_chart(f'chart{n}', age)
+        # Only the chart no payload can point at any more goes, though five exceed the cap of three
+        self.assertEqual(charts.prune_charts(now=1_000_000), 1)
+        self.assertEqual(self.remaining(), ['chart0', 'chart1', 'chart2', 'chart3'])
+
+    def test_view_answers_503_while_a_chart_renders(self):
+        self.make_chart('pending', 0, now=time.time())
+        charts.chart_paths('pending')[1].unlink()
+        with mock.patch.object(charts._render_executor, 'submit') as submit:
+            first = self.client.get('/api/charts/pending.png')
+            second = self.client.get('/api/charts/pending.png')
+        self.assertEqual((first.status_code, first['Retry-After'], first['Cache-Control']), (503, '2', 'no-store'))
+        self.assertEqual(second.status_code, 503)
+        # One background render per key however often it is asked for
+        submit.assert_called_once_with(charts._render_in_background, 'pending')
+        charts._queued.discard('pending')
+
+        self.assertEqual(self.client.get('/api/charts/missing.png').status_code, 404)
+        charts.chart_paths('pending')[1].write_bytes(b'\x89PNG')
+        response = self.client.get('/api/charts/pending.png')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (200, b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_leaves_files_being_written(self):
+        self.make_chart('chart0', settings.CHARTS['MAX_AGE'] + 1)
+        (self.directory / '.chart1.1.2.npz').write_bytes(b'')
+        charts.prune_charts()
+        self.assertEqual([path.name for path in self.directory.iterdir()], ['.chart1.1.2.npz'])
+
+    def test_renders_in_a_spawned_pool(self):
+        bars = make_bars(random_walk(300))
+        key = charts.chart_url('RENDER.NS', bars).rsplit('/', 1)[-1].removesuffix('.png')
+        # Joins the render chart_url queued
+        image_path = charts.render(key)
+        self.assertEqual(image_path.read_bytes()[:8], b'\x89PNG\r\n\x1a\n')
+        self.assertNotEqual(charts._get_pool()._mp_context.get_start_method(), 'fork')
+
+
+class StubProvider(MarketDataProvider):
+    """Info for any symbol, except MISSING (no data), DOWN (connection error) and SLOW (waits for ``release``)."""
+    name = 'stub'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def get_info(self, symbol):
+        self.calls.append(symbol)
+        if symbol == 'MISSING.NS':
+            return {}
+        if symbol == 'DOWN.NS':
+            raise requests.ConnectionError('upstream down')
+        if symbol == 'SLOW.NS':
+            self.release.wait(5)
+        return {'longName': symbol, 'shortName': symbol, 'currentPrice': 100.0, 'previousClose': 99.0,
+                'dayLow': 98.0, 'dayHigh': 101.0}
+
+    def get_history(self, symbol, start, end):
+        return make_bars(random_walk(0))
+
+
+@override_settings(
+    RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'),
+    RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ALIAS='default'),
+    MARKET_DATA=dict(settings.MARKET_DATA, MAX_BATCH_SYMBOLS=4, BATCH_TIMEOUT=0.5),
+)
+class BatchStockViewTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.provider = StubProvider()
+        self.addCleanup(self.provider.release.set)
+        for name, value in (('get_provider', self.provider), ('get_price_store', PriceStore(directory.name)),
+                            ('sentiment_payload', {'averageSentiment': 0, 'headlines': []})):
+            patcher = mock.patch.object(quotes, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, symbols):
+        return self.client.post('/api/get-stocks/', {'symbols': symbols}, content_type='application/json')
+
+    def test_reports_errors_per_symbol(self):
+        response = self.post(['TCS', 'MISSING', 'DOWN'])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(list(body['results']), ['TCS.NS'])
+        self.assertEqual(body['results']['TCS.NS']['stock']['currentPrice'], 100.0)
+        self.assertEqual({symbol: error['status'] for symbol, error in body['errors'].items()},
+                         {'MISSING.NS': 404, 'DOWN.NS': 503})
+
+    def test_deduplicates_symbols_in_order(self):
+        response = self.post(['infy', 'TCS', 'INFY.NS', ' tcs ', ''])
+        self.assertEqual(list(response.json()['results']), ['INFY.NS', 'TCS.NS'])
+        self.assertEqual(sorted(self.provider.calls), ['INFY.NS', 'TCS.NS'])
+
+    def test_limits_the_batch_size_after_deduplication(self):
+        self.assertEqual(self.post(['A', 'B', 'C', 'D', 'a', 'b']).status_code, 200)
+        response = self.post(['A', 'B', 'C', 'D', 'E'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'A batch can contain at most 4 symbols')
+
+    def test_rejects_malformed_batches(self):
+        for symbols in ('TCS', [1, 2], [], ['', ' '], None):
+            with self.subTest(symbols=symbols):
+                self.assertEqual(self.post(symbols).status_code, 400)
+
+    def test_slow_symbols_time_out_without_holding_the_batch(self):
+        started = time.perf_counter()
+        response = self.post(['TCS', 'SLOW'])
+        self.assertLess(time.perf_counter() - started, 3)
+        body = response.json()
+        self.assertEqual(list(body['results']), ['TCS.NS'])
+        self.assertEqual(body['errors'], {'SLOW.NS': {'error': 'Timed out waiting for upstream data.', 'status': 504}})
+        # The abandoned fetch still finishes, and a later request joins it rather than starting another
+        self.provider.release.set()
+        self.assertEqual(quotes.fetch_stock_data('SLOW.NS')['symbol'], 'SLOW.NS')
+        self.assertEqual(self.provider.calls.count('SLOW.NS'), 1)
+
+
+class StaticQuotes:
+    async def aget_info(self, symbol):
+        return {'currentPrice': 101.0, 'previousClose': 100.0}
+
+
+class QuoteWebSocketTests(SimpleTestCase):
+    def setUp(self):
+        settings_override = override_settings(
+            RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'),
+            STREAMING=dict(settings.STREAMING, MAX_CONNECTIONS_PER_CLIENT=2, MAX_HUB_SYMBOLS=3, CONNECT_RATE_LIMIT=4),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+
+    async def open(self, symbols='AAA', origin=None, client='10.0.0.1'):
+        """Connect to the quote WebSocket; the first message sent back and the open connection."""
+        headers = [(b'host', b'api.example.com')]
+        if origin is not None:
+            headers.append((b'origin', origin.encode()))
+        scope = {
+            'type': 'websocket', 'path': streaming.WEBSOCKET_PATH, 'headers': headers,
+            'query_string': f'symbols={symbols}'.encode(), 'client': (client, 50000),
+        }
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.create_task(streaming.quote_websocket(scope, inbox.get, outbox.put))
+        return await outbox.get(), (inbox, outbox, task)
+
+    async def close(self, connection):
+        inbox, _, task = connection
+        await inbox.put({'type': 'websocket.disconnect'})
+        await task
+
+    def run_with_hub(self, scenario):
+        async def main():
+            hub = streaming.QuoteHub(provider=StaticQuotes(), poll_seconds=60)
+            streaming._hubs[asyncio.get_running_loop()] = hub
+            return await scenario(hub)
+        return asyncio.run(main())
+
+    def test_accepts_same_origin_and_allowed_origins(self):
+        async def scenario(hub):
+            for origin in (None, 'https://api.example.com', 'http://localhost:3000'):
+                message, connection = await self.open(origin=origin)
+                self.assertEqual(message['type'], 'websocket.accept', origin)
+                self.assertEqual(json.loads((await connection[1].get())['text'])['price'], 101.0)
+                await self.close(connection)
+            return hub.stats()
+        self.assertEqual(self.run_with_hub(scenario)['connections'], 0)
+
+    def test_rejects_foreign_origins(self):
+        async def scenario(hub):
+            message, _ = await self.open(origin='https://evil.example')
+            self.assertEqual((message['type'], message['code']), ('websocket.close', 1008))
+            return hub.stats()
+        self.assertEqual(self.run_with_hub(scenario), {'connections': 0, 'symbols': 0, 'subscribers': 0, 'polls': 0})
+
+    def test_caps_connections_per_client(self):
+        async def scenario(hub):
+            accepted = [await self.open() for _ in range(2)]
+            rejected, _ = await self.open()
+            other_client, connection = await self.open(client='10.0.0.2')
+            self.assertEqual([message['type'] for message, _ in accepted], ['websocket.accept'] * 2)
+            self.assertEqual((rejected['type'], rejected['code']), ('websocket.close', 1013))
+            self.assertEqual(other_client['type'], 'websocket.accept')
+            for _, open_connection in accepted + [(None, connection)]:
+                await self.close(open_connection)
+            return hub.stats()
+        self.assertEqual(self.run_with_hub(scenario)['connections'], 0)
+
+    def test_caps_symbols_polled_by_the_hub(self):
+        async def scenario(hub):
+            first, connection = await self.open('AAA,BBB')
+            second, _ = await self.open('CCC,DDD', client='10.0.0.2')
+            self.assertEqual(first['type'], 'websocket.accept')
+            self.assertEqual((second['type'], second['code']), ('websocket.close', 1013))
+            # The symbols subscribed before the cap was hit are released
+            self.assertEqual(hub.stats()['symbols'], 2)
+            await self.close(connection)
+            return hub.stats()
+        self.assertEqual(self.run_with_hub(scenario)['symbols'], 0)
+
+    def test_rejects_commands_that_are_not_symbol_lists(self):
+        async def scenario(hub):
+            _, connection = await self.open()
+            inbox, outbox, _ = connection
+            await outbox.get()
+            errors = []
+            for command in ({'subscribe': 'RELIANCE'}, {'subscribe': 5}, {'unsubscribe': ['AAA', 1]}, ['AAA'], 'x'):
+                await inbox.put({'type': 'websocket.receive', 'text': json.dumps(command)})
+                errors.append(json.loads((await outbox.get())['text']))
+            await inbox.put({'type': 'websocket.receive', 'text': json.dumps({'subscribe': ['BBB']})})
+            quote = json.loads((await outbox.get())['text'])
+            symbols = hub.stats()['symbols']
+            await self.close(connection)
+            return errors, quote, symbols
+        errors, quote, symbols = self.run_with_hub(scenario)
+        self.assertEqual([error['type'] for error in errors], ['error'] * 5)
+        self.assertEqual(errors[0]['error'], 'subscribe must be a list of stock symbols')
+        self.assertEqual(errors[2]['error'], 'unsubscribe must be a list of stock symbols')
+        self.assertEqual((quote['type'], quote['symbol'], symbols), ('quote', 'BBB.NS', 2))
+
+    def test_rate_limits_connects(self):
+        async def scenario(hub):
+            messages = []
+            for _ in range(5):
+                message, connection = await self.open()
+                messages.append(message)
+                if message['type'] == 'websocket.accept':
+                    await self.close(connection)
+            return messages
+        messages = self.run_with_hub(scenario)
+        self.assertEqual([message['type'] for message in messages], ['websocket.accept'] * 4 + ['websocket.close'])
+        self.assertEqual(messages[-1]['code'], 1013)
+
+
+class FlakyStore:
+    """PriceStore stand-in whose first ``failures`` bar reads fail."""
+
+    def __init__(self, bars, failures=1):
+        self.bars, self.failures = bars, failures
+
+    def version(self, symbol):
+        return (1, 1)
+
+    def read_bars(self, symbol):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('file is being replaced')
+        return self.bars
+
+    def read_meta(self, symbol):
+        return {'info': {'trailingPE': 12.5}}
+
+
+class MemoryStore:
+    """PriceStore stand-in over ``{symbol: bars}`` that counts bar reads."""
+
+    def __init__(self, histories):
+        self.histories = histories
+        self.reads = []
+
+    def version(self, symbol):
+        return (len(self.histories[symbol]), 1)
+
+    def read_bars(self, symbol):
+        self.reads.append(symbol)
+        return self.histories[symbol]
+
+    def read_meta(self, symbol):
+        return {'info': {'trailingPE': float(len(symbol))}}
+
+
+class ScreenerTests(SimpleTestCase):
+    def setUp(self):
+        self.universe = StockUniverse.from_columns(['AAA', 'BBB', 'CCC'], {
+            'PE': [10, np.nan, 30], 'RSI': [25, 40, np.nan],
+        })
+
+    def test_screens_with_comparisons(self):
+        total, rows = self.universe.screen('PE < 20 or RSI > 30', sort='-PE')
+        self.assertEqual(total, 2)
+        self.assertEqual([row['symbol'] for row in rows], ['AAA', 'BBB'])
+        self.assertIsNone(rows[1]['PE'])
+
+    def test_rejects_expressions_that_are_not_conditions(self):
+        for expression in ('PE', 'PE + 1', '-RSI', 'PE and RSI < 30', 'not PE', '(PE < 20) + 1 > 0', '1'):
+            with self.assertRaises(ScreenExpressionError, msg=expression):
+                self.universe.screen(expression)
+
+    def test_rejects_deeply_nested_expressions(self):
+        for expression in ('not ' * 5000 + 'PE < 20', '-' * 20000 + 'PE < 20', '(' * 1000 + 'PE' + ')' * 1000 + ' < 20',
+                           ' and '.join(['PE < 20'] * 100)):
+            with self.assertRaises(ScreenExpressionError, msg=expression[:20]):
+                self.universe.screen(expression)
+
+    def test_refresh_retries_symbols_whose_read_failed(self):
+        universe, store = StockUniverse(['AAA.NS']), FlakyStore(make_bars(random_walk(60)))
+        universe.refresh(store=store)
+        self.assertTrue(np.isnan(universe.columns['Price'][0]))
+        self.assertEqual(universe.versions, [None])
+
+        universe.refresh(store=store)
+        self.assertEqual(universe.columns['Price'][0], store.bars['close'][-1])
+        self.assertEqual(universe.columns['PE'][0], 12.5)
+        self.assertEqual(universe.versions, [(1, 1)])
+
+
+    def test_membership_changes_only_read_the_added_symbols(self):
+        histories = {symbol: make_bars(random_walk(250, seed=seed)) for seed, symbol in enumerate(('A', 'BB', 'CCC'))}
+        store = MemoryStore(histories)
+        universe = StockUniverse(['A', 'BB'])
+        universe.refresh(store=store)
+        store.reads.clear()
+
+        changed = universe.with_symbols(['BB', 'CCC'])
+        changed.refresh(store=store)
+        self.assertEqual(store.reads, ['CCC'])
+
+        rebuilt = StockUniverse(['BB', 'CCC'])
+        rebuilt.refresh(store=MemoryStore(histories))
+        self.assertEqual(sorted(changed.columns), sorted(rebuilt.columns))
+        for name, values in rebuilt.columns.items():
+            np.testing.assert_allclose(changed.columns[name], values, rtol=1e-12, err_msg=name)
+        # The old universe keeps serving its own rows meanwhile
+        self.assertEqual(list(universe.symbols), ['A', 'BB'])
+
+    @override_settings(RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'))
+    def test_first_build_runs_in_the_background(self):
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+        release = threading.Event()
+
+        def slow_symbols():
+            release.wait(5)
+            return ['A']
+
+        store = MemoryStore({'A': make_bars(random_walk(60))})
+        self.addCleanup(setattr, screener, '_universe', screener._universe)
+        screener._universe = None
+        with mock.patch.object(screener, 'universe_symbols', slow_symbols), \
+                mock.patch.object(screener, 'get_price_store', return_value=store):
+            response = self.client.get('/api/screener/', {'q': 'PE < 20'})
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '5'))
+            release.set()
+            # The build holds the refresh lock until it has swapped the universe in
+            self.assertTrue(screener._background_refresh_lock.acquire(timeout=5))
+            screener._background_refresh_lock.release()
+            response = self.client.get('/api/screener/', {'q': 'PE < 20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['symbol'], 'A')
+
+
+class BacktestIndicatorTests(SimpleTestCase):
+    def test_series_match_indicator_state_bar_for_bar(self):
+        long, short = random_walk(260, seed=4), random_walk(60, seed=5)
+        closes = np.vstack([long, np.concatenate([np.full(200, np.nan), short])])
+        series = IndicatorSeries(closes)
+        for bar in range(closes.shape[1]):
+            snapshot = IndicatorState.from_closes(closes[:, :bar + 1]).snapshot()
+            for name in INDICATOR_NAMES:
+                np.testing.assert_allclose(
+                    series[name][:, bar], snapshot[name], rtol=1e-9, atol=1e-9, err_msg=f'{name} at bar {bar}',
+                )
+
+    def test_ema_of_one_bar_is_the_close(self):
+        closes = random_walk(300)[None, :]
+        np.testing.assert_array_equal(IndicatorSeries(closes)['EMA1'], closes)
+
+    def test_dynamic_emas_match_the_reference(self):
+        closes = random_walk(300)
+        for window in (2, 9, 50):
+            expected = reference_ema(list(closes), window)
+            ema = IndicatorSeries(closes[None, :])[f'EMA{window}'][0]
+            np.testing.assert_allclose(ema[window - 1:], expected[window - 1:], rtol=1e-10)
+            self.assertTrue(np.isnan(ema[:window - 1]).all())
+
+
+@override_settings(RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'))
+class SymbolValidationTests(SimpleTestCase):
+    BAD_SYMBOLS = ('/tmp/x', '../../x', 'A/B', '..', 'X' * 21, 'TCS NS', 'a\x00b')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+
+    def test_normalizes_tickers(self):
+        for symbol, expected in (('reliance', 'RELIANCE.NS'), (' M&M ', 'M&M.NS'), ('BAJAJ-AUTO', 'BAJAJ-AUTO.NS'),
+                                 ('TCS.BO', 'TCS.BO'), ('^NSEI', '^NSEI.NS')):
+            self.assertEqual(normalize_symbol(symbol), expected)
+
+    def test_rejects_anything_but_ticker_characters(self):
+        for symbol in self.BAD_SYMBOLS + ('',):
+            with self.assertRaises(InvalidSymbolError, msg=symbol):
+                normalize_symbol(symbol)
+
+    def test_views_answer_400_for_bad_symbols(self):
+        for symbol in self.BAD_SYMBOLS:
+            with self.subTest(symbol=symbol):
+                response = self.client.post('/api/get-stock/', {'symbol': symbol}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post('/api/get-stocks/', {'symbols': ['TCS', symbol]},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post('/api/backtest/', {'strategy': 'macd', 'symbols': [symbol]},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        with self.assertRaises(streaming.SubscriptionError):
+            streaming.parse_symbols(['TCS,../x'])
+
+    def test_price_store_stays_inside_its_directory(self):
+        store = PriceStore(self.directory / 'store')
+        for symbol in ('../x', '/tmp/x', 'a/../../x'):
+            with self.assertRaises(ValueError, msg=symbol):
+                store.write_meta(symbol, {})
+            self.assertEqual(store.read_meta(symbol), {})
+        store.write_meta('TCS.NS', {'start': '2024-01-01'})
+        self.assertEqual(sorted(path.name for path in self.directory.rglob('*')), ['TCS.NS.json', 'store'])
+
+
+class AsyncProvider:
+    name = 'async-test'
+
+    def __init__(self, bars):
+        self.bars = bars
+
+    async def aget_info(self, symbol):
+        return {'symbol': symbol}
+
+    async def aget_history(self, symbol, start, end):
+        return self.bars
+
+
+class RecordingStore(PriceStore):
+    """PriceStore that records the thread of every file read and write."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.threads = []
+
+    def read_meta(self, symbol):
+        self.threads.append(threading.get_ident())
+        return super().read_meta(symbol)
+
+    def read_bars(self, symbol):
+        self.threads.append(threading.get_ident())
+        return super().read_bars(symbol)
+
+    def _write_atomic(self, path, write):
+        self.threads.append(threading.get_ident())
+        return super()._write_atomic(path, write)
+
+
+class PriceStoreAsyncTests(SimpleTestCase):
+    def test_async_reads_and_writes_stay_off_the_event_loop(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = RecordingStore(directory.name)
+        provider = AsyncProvider(make_bars(random_walk(30))[-5:])
+
+        async def scenario():
+            info = await store.aget_info('TCS.NS', provider)
+            await store.aget_history('TCS.NS', provider)
+            return threading.get_ident(), info
+
+        loop_thread, info = asyncio.run(scenario())
+        self.assertEqual(info, {'symbol': 'TCS.NS'})
+        self.assertEqual(store.read_meta('TCS.NS')['info'], info)
+        self.assertGreater(len(store.threads), 4)
+        self.assertNotIn(loop_thread, store.threads[:-1])
@@ -1,8 +1,13 @@
 # StockSearch/urls.py
 from django.urls import path
-from .views import StockView, TestAlphaVantageView
+from .views import StockView, AsyncStockView, BatchStockView, StockScreenerView, ChartImageView, QuoteStreamView, BacktestView
 
 urlpatterns = [
     path('get-stock/', StockView.as_view(), name='get-stock'),
-    path('test-api/', TestAlphaVantageView.as_view(), name='test-api'),
+    path('async/get-stock/', AsyncStockView.as_view(), name='get-stock-async'),
+    path('get-stocks/', BatchStockView.as_view(), name='get-stocks'),
+    path('screener/', StockScreenerView.as_view(), name='stock-screener'),
+    path('backtest/', BacktestView.as_view(), name='stock-backtest'),
+    path('stream/quotes/', QuoteStreamView.as_view(), name='quote-stream'),
+    path('charts/<slug:key>.png', ChartImageView.as_view(), name='stock-chart'),
 ]
@@ -1,77 +1,51 @@
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import io
-import base64
-from sklearn.linear_model import LinearRegression
-from datetime import datetime, timedelta
-import requests
+from datetime import datetime
 import time
-from json.decoder import JSONDecodeError
-from django.core.cache import cache
-import random
-from functools import wraps
 import logging
 import traceback
+from backend_stockmatrix.async_views import AsyncAPIView
+from backend_stockmatrix.conditional import conditional_response, tagged
+from backend_stockmatrix.metrics import span
+from backend_stockmatrix.ratelimit import rate_limit, global_rate_limit
+from backend_stockmatrix.renderers import JSONBytesResponse
+from .backtest import BacktestError, run_backtest, stored_histories
+from .charts import chart_paths, chart_setting, queue_render
+from .market_data import market_data_setting
+from .quotes import (
+    InvalidSymbolError, StockDataError, afetch_tagged_stock_data, fetch_stock_batch, fetch_tagged_stock_data,
+    normalize_symbol,
+)
+from .screener import ScreenExpressionError, get_universe, screener_setting
+from .streaming import QuoteSubscription, StreamCapacityError, SubscriptionError, parse_symbols, sse_events
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def rate_limit(key_prefix, limit=60, period=60):
-    def decorator(view_func):
-        @wraps(view_func)
-        def wrapped_view(self, request, *args, **kwargs):
-            client_ip = request.META.get('REMOTE_ADDR')
-            cache_key = f'ratelimit:{key_prefix}:{client_ip}'
-            
-            # Get current request count
-            requests = cache.get(cache_key, 0)
-            
-            if requests >= limit:
-                return Response(
-                    {'error': 'Too many requests. Please try again later.'},
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            
-            # Increment request count
-            cache.set(cache_key, requests + 1, period)
-            
-            return view_func(self, request, *args, **kwargs)
-        return wrapped_view
-    return decorator
-
-def global_rate_limit(limit=100, period=60):
-    def decorator(view_func):
-        @wraps(view_func)
-        def wrapped_view(self, request, *args, **kwargs):
-            cache_key = 'global_ratelimit'
-            requests = cache.get(cache_key, 0)
-            
-            if requests >= limit:
-                return Response(
-                    {'error': 'Global rate limit exceeded. Please try again later.'},
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            
-            # Increment request count
-            cache.set(cache_key, requests + 1, period)
-            
-            return view_func(self, request, *args, **kwargs)
-        return wrapped_view
-    return decorator
-
 class StockView(APIView):
+    """The stock payload for ``symbol``, POSTed as JSON or as a query parameter of a GET.
+
+    Responses carry a strong ETag, so a GET repeating it in ``If-None-Match``
+    gets a 304 until the cached payload changes.
+    """
+
+    @rate_limit('stock_api', limit=30, period=60)
+    @global_rate_limit(limit=100, period=60)
+    def get(self, request, *args, **kwargs):
+        return self.quote(request, request.query_params)
+
     @rate_limit('stock_api', limit=30, period=60)
     @global_rate_limit(limit=100, period=60)
     def post(self, request, *args, **kwargs):
-        symbol = request.data.get('symbol', '').strip()
-        file_format = request.data.get('format', '').strip().lower()
+        return self.quote(request, request.data)
+
+    def quote(self, request, params):
+        symbol = params.get('symbol', '').strip()
+        file_format = params.get('format', '').strip().lower()
         
         logger.info(f"Received request for symbol: {symbol}, format: {file_format}")
         
@@ -79,93 +53,230 @@ class StockView(APIView):
             return Response({'error': 'Stock symbol is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Handle NSE/BSE suffix
-            if not symbol.endswith('.NS') and not symbol.endswith('.BO'):
-                symbol += '.NS'
-            
-            logger.info(f"Processing symbol: {symbol}")
-            
-            # Basic implementation with proper error handling
-            try:
-                stock = yf.Ticker(symbol)
-                
-                # First try to get basic info with timeout
-                stock_info = {}
-                try:
-                    stock_info = stock.info
-                    if not stock_info or len(stock_info) < 5:
-                        return Response(
-                            {'error': f'No data available for {symbol}. Please check the symbol and try again.'},
-                            status=status.HTTP_404_NOT_FOUND
-                        )
-                except Exception as e:
-                    logger.error(f"Error fetching stock info: {str(e)}")
-                    return Response(
-                        {'error': f'Unable to fetch data for {symbol}. The service might be temporarily unavailable.'},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
-                
-                # Get current price or use a default
-                current_price = stock_info.get('currentPrice', stock_info.get('previousClose', 0))
-                
-                # Get company name
-                company_name = stock_info.get('longName', stock_info.get('shortName', symbol))
-                
-                # Return simplified response
-                return Response({
-                    'symbol': symbol,
-                    'details': {
-                        'longName': company_name,
-                        'shortName': stock_info.get('shortName', symbol),
-                        'industry': stock_info.get('industry', 'N/A'),
-                        'sector': stock_info.get('sector', 'N/A'),
-                        'country': stock_info.get('country', 'N/A'),
-                    },
-                    'stock': {
-                        'currentPrice': current_price,
-                        'previousClose': stock_info.get('previousClose', 'N/A'),
-                        'dayLow': stock_info.get('dayLow', 'N/A'),
-                        'dayHigh': stock_info.get('dayHigh', 'N/A'),
-                    },
-                    'technicalIndicators': {
-                        'RSI': 50,  # Placeholder values
-                        'MA50': 0,
-                        'MA200': 0,
-                        'MACD': 0,
-                        'SignalLine': 0,
-                    },
-                    'graph': '',  # Empty placeholder for graph
-                    'analysis': f"Basic analysis for {company_name} ({symbol}).\n\nThis is a simplified response. For detailed analysis, please try again later.",
-                    'forecast': {
-                        'futurePrices': [current_price] * 30,  # Placeholder
-                        'forecastDates': [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(30)],
-                        'averageForecast': current_price,
-                        'percentageChange': 0,
-                    },
-                    'sentimentAnalysis': {
-                        'averageSentiment': 0,
-                        'headlines': [],
-                    }
-                }, status=status.HTTP_200_OK)
-                
-            except requests.exceptions.RequestException as req_err:
-                logger.error(f"Request exception: {str(req_err)}")
-                return Response(
-                    {'error': 'Failed to fetch stock data. The service might be temporarily unavailable.'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-            except Exception as e:
-                logger.error(f"Unexpected error: {str(e)}")
-                logger.error(traceback.format_exc())
-                return Response(
-                    {'error': 'An unexpected error occurred while processing your request.'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
+            # Cache lookup plus, on a miss, the info/history/news/compute stages
+            with span('stock_data'):
+                payload, etag = fetch_tagged_stock_data(normalize_symbol(symbol))
+            return conditional_response(request, etag) or tagged(Response(payload, status=status.HTTP_200_OK), etag)
+        except StockDataError as e:
+            return Response({'error': e.message}, status=e.status_code)
         except Exception as e:
             logger.error(f"Outer exception: {str(e)}")
             logger.error(traceback.format_exc())
             return Response(
                 {'error': 'An unexpected error occurred. Please try again later.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class AsyncStockView(AsyncAPIView):
+    """StockView for ASGI workers: upstream calls are awaited instead of holding a thread."""
+
+    @rate_limit('stock_api', limit=30, period=60)
+    @global_rate_limit(limit=100, period=60)
+    async def get(self, request, *args, **kwargs):
+        return await self.quote(request, request.GET.get('symbol', '').strip())
+
+    @rate_limit('stock_api', limit=30, period=60)
+    @global_rate_limit(limit=100, period=60)
+    async def post(self, request, *args, **kwargs):
+        try:
+            symbol = str(self.json_body(request).get('symbol', '')).strip()
+        except ValueError:
+            return self.error('Request body must be a JSON object')
+        return await self.quote(request, symbol)
+
+    async def quote(self, request, symbol):
+        if not symbol:
+            return self.error('Stock symbol is required')
+        
+        try:
+            with span('stock_data'):
+                payload, etag = await afetch_tagged_stock_data(normalize_symbol(symbol))
+            not_modified = conditional_response(request, etag)
+            if not_modified is not None:
+                return not_modified
+            with span('render'):
+                response = JSONBytesResponse(payload, status=status.HTTP_200_OK)
+            return tagged(response, etag)
+        except StockDataError as e:
+            return self.error(e.message, e.status_code)
+        except Exception as e:
+            logger.error(f"Outer exception: {str(e)}")
+            logger.error(traceback.format_exc())
+            return self.error('An unexpected error occurred. Please try again later.', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QuoteStreamView(AsyncAPIView):
+    """Live quotes as Server-Sent Events; every viewer of a symbol shares one upstream poller."""
+
+    @rate_limit('quote_stream', limit=30, period=60)
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return self.error('Quote streaming requires the ASGI server', status.HTTP_501_NOT_IMPLEMENTED)
+        
+        try:
+            symbols = parse_symbols(request.GET.getlist('symbols'))
+        except SubscriptionError as e:
+            return self.error(str(e))
+        if not symbols:
+            return self.error('At least one symbol is required')
+        
+        try:
+            subscription = QuoteSubscription(request.META.get('REMOTE_ADDR'))
+        except StreamCapacityError as e:
+            return self.error(str(e), status.HTTP_429_TOO_MANY_REQUESTS)
+        try:
+            subscription.subscribe(symbols)
+        except SubscriptionError as e:
+            subscription.close()
+            if isinstance(e, StreamCapacityError):
+                return self.error(str(e), status.HTTP_429_TOO_MANY_REQUESTS)
+            return self.error(str(e))
+        
+        response = StreamingHttpResponse(sse_events(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class BatchStockView(APIView):
+    @rate_limit('stock_batch_api', limit=30, period=60)
+    @global_rate_limit(limit=100, period=60)
+    def post(self, request, *args, **kwargs):
+        symbols = request.data.get('symbols', [])
+        
+        if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+            return Response({'error': 'symbols must be a list of stock symbols'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Normalize and de-duplicate while keeping the caller's order
+        try:
+            symbols = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+        except InvalidSymbolError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        if not symbols:
+            return Response({'error': 'At least one stock symbol is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_symbols = market_data_setting('MAX_BATCH_SYMBOLS')
+        if len(symbols) > max_symbols:
+            return Response(
+                {'error': f'A batch can contain at most {max_symbols} symbols'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        logger.info(f"Received batch request for {len(symbols)} symbols")
+        
+        results, errors = fetch_stock_batch(symbols)
+        return Response({
+            'results': {symbol: results[symbol] for symbol in symbols if symbol in results},
+            'errors': errors,
+        }, status=status.HTTP_200_OK)
+
+
+class StockScreenerView(APIView):
+    @rate_limit('stock_screener_api', limit=60, period=60)
+    def get(self, request, *args, **kwargs):
+        expression = request.query_params.get('q', '').strip()
+        sort = request.query_params.get('sort', '').strip() or None
+        fields = [f.strip() for f in request.query_params.get('fields', '').split(',') if f.strip()] or None
+        
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < limit <= 500:
+            return Response({'error': 'limit must be between 1 and 500'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        universe = get_universe()
+        if universe is None:
+            response = Response({'error': 'The screener is still loading'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(screener_setting('RETRY_AFTER', 5))
+            return response
+        if not expression:
+            return Response(
+                {'error': 'A screen expression is required, e.g. q=PE < 20 and RSI < 30', 'columns': sorted(universe.columns)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        unknown = [f for f in fields or [] if f not in universe.columns]
+        if unknown:
+            return Response({'error': f'Unknown column {unknown[0]}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        started = time.perf_counter()
+        try:
+            count, results = universe.screen(expression, sort=sort, limit=limit, fields=fields)
+        except ScreenExpressionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'count': count,
+            'results': results,
+            'universeSize': len(universe.symbols),
+            'refreshedAt': datetime.fromtimestamp(universe.refreshed_at).isoformat(),
+            'tookMs': round((time.perf_counter() - started) * 1000, 3),
+        }, status=status.HTTP_200_OK)
+
+
+class BacktestView(APIView):
+    @rate_limit('backtest_api', limit=20, period=60)
+    def post(self, request, *args, **kwargs):
+        strategy = request.data.get('strategy')
+        params = request.data.get('params') or {}
+        symbols = request.data.get('symbols')
+        start, end = request.data.get('start'), request.data.get('end')
+        
+        if not isinstance(params, dict):
+            return Response({'error': 'params must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        if symbols is not None:
+            if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                return Response({'error': 'symbols must be a list of stock symbols'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                symbols = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+            except InvalidSymbolError as e:
+                return Response({'error': e.message}, status=e.status_code)
+        try:
+            cost_bps = float(request.data.get('costBps', 10))
+            for value in (start, end):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'costBps must be a number and start/end dates in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= cost_bps <= 1000:
+            return Response({'error': 'costBps must be between 0 and 1000'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        started = time.perf_counter()
+        # Bars before start are still loaded so the indicators are warmed up on day one
+        histories = stored_histories(symbols)
+        if not histories:
+            return Response({'error': 'No stored bars for these symbols'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            result = run_backtest(histories, strategy, params, cost_bps=cost_bps, start=start, end=end)
+        except BacktestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result['missing'] = [symbol for symbol in symbols or () if symbol not in histories]
+        result['tookMs'] = round((time.perf_counter() - started) * 1000, 3)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ChartImageView(APIView):
+    def get(self, request, key, *args, **kwargs):
+        _, image_path = chart_paths(key)
+        try:
+            # Chart keys hash their inputs, so an image never changes once rendered
+            response = FileResponse(open(image_path, 'rb'), content_type='image/png')
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return response
+        except FileNotFoundError:
+            pass
+        
+        # Rendering can take seconds, so the request thread is not held for it
+        if not queue_render(key):
+            return Response({'error': 'Chart not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = Response({'error': 'Chart is still rendering'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(chart_setting('RETRY_AFTER'))
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,80 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from api.models import User
+from backend_stockmatrix.authentication import JWTAuthentication, get_claims_cache, issue_token
+
+
+class ProtectedView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'user': request.user.id})
+
+
+class OpenView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response({'user': None})
+
+
+def per_request(view, requests):
+    started = time.perf_counter()
+    for request in requests:
+        response = view(request)
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - started) / len(requests)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JWT authentication overhead per request, with and without the verified-claims cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        n_requests = options['requests']
+        factory = APIRequestFactory()
+        users = [SimpleNamespace(id=i, email=f'user{i}@example.com', username=f'user{i}') for i in range(n_requests)]
+        tokens = [issue_token(user) for user in users]
+        protected, open_view = ProtectedView.as_view(), OpenView.as_view()
+
+        def bearer(token):
+            return factory.get('/bench/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        baseline = per_request(open_view, [factory.get('/bench/') for _ in range(n_requests)])
+
+        # Every token is new, so each request verifies a signature
+        get_claims_cache().clear()
+        cold = per_request(protected, [bearer(token) for token in tokens])
+
+        # One client repeating its token hits the cache
+        warm = per_request(protected, [bearer(tokens[0]) for _ in range(n_requests)])
+
+        self.stdout.write(f'requests: {n_requests}')
+        self.stdout.write(f'no authentication:         {baseline * 1e6:8.2f} us/request')
+        self.stdout.write(f'JWT, signature verified:   {cold * 1e6:8.2f} us/request (+{(cold - baseline) * 1e6:.2f} us)')
+        self.stdout.write(f'JWT, cached claims:        {warm * 1e6:8.2f} us/request (+{(warm - baseline) * 1e6:.2f} us)')
+
+        # What a per-request user lookup would add on top
+        try:
+            email = User.objects.values_list('email', flat=True).first() or 'nobody@example.com'
+            n_lookups = min(n_requests, 2000)
+            started = time.perf_counter()
+            for _ in range(n_lookups):
+                User.objects.filter(email=email).first()
+            lookup = (time.perf_counter() - started) / n_lookups
+            self.stdout.write(f'user lookup by email (DB): {lookup * 1e6:8.2f} us/request, avoided by JWTAuthentication')
+        except DatabaseError as e:
+            self.stdout.write(f'user lookup by email (DB): skipped ({str(e)})')
+        self.stdout.write(f'claims cache: {get_claims_cache().stats()}')
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def dedupe_emails(apps, schema_editor):
+    """Keep the oldest account for each email so 0006 can add the unique index.
+
+    Login looked users up with ``User.objects.get(email=...)``, so every
+    account sharing an email already failed to log in; the later duplicates
+    are deleted.
+    """
+    User = apps.get_model('api', 'User')
+    seen = set()
+    duplicates = []
+    for pk, email in User.objects.order_by('id').values_list('id', 'email'):
+        if email in seen:
+            duplicates.append(pk)
+        seen.add(email)
+    if duplicates:
+        User.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_delete_customuser'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails, migrations.RunPython.noop),
+    ]
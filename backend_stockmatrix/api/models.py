@@ -4,5 +4,6 @@ from djongo import models as djongo_models
 
 class User(djongo_models.Model):
     username=djongo_models.CharField(max_length=100)
-    email=djongo_models.EmailField(max_length=100)
+    # Unique and indexed: login and signup look users up by email
+    email=djongo_models.EmailField(max_length=100, unique=True)
     password=djongo_models.CharField(max_length=100)
\ No newline at end of file
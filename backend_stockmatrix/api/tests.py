@@ -1,3 +1,182 @@
-from django.test import TestCase
+import time
+from types import SimpleNamespace
 
-# Create your tests here.
+import jwt
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from backend_stockmatrix.authentication import (
+    ClaimsCache, JWTAuthentication, get_claims_cache, issue_token, jwt_setting, verify_token,
+)
+from .models import User
+from .views import UserViewSet
+
+USER = SimpleNamespace(id=7, email='ada@example.com', username='ada')
+
+
+class ProtectedView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'user': request.user.id})
+
+
+class PublicView(APIView):
+    def get(self, request):
+        return Response({'authenticated': request.user.is_authenticated})
+
+
+def bearer(value):
+    return APIRequestFactory().get('/', HTTP_AUTHORIZATION=value)
+
+
+class VerifyTokenTests(SimpleTestCase):
+    def setUp(self):
+        get_claims_cache().clear()
+        self.addCleanup(get_claims_cache().clear)
+
+    def test_valid_token_returns_its_claims(self):
+        claims = verify_token(issue_token(USER))
+        self.assertEqual((claims['id'], claims['email'], claims['username']), ('7', 'ada@example.com', 'ada'))
+
+    def test_expired_token_is_rejected(self):
+        token = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') - 60)
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'Token has expired'):
+            verify_token(token)
+
+    def test_expiry_allows_the_leeway(self):
+        token = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') // 2)
+        self.assertEqual(verify_token(token)['id'], '7')
+
+    def test_bad_signature_is_rejected(self):
+        token = jwt.encode({'id': '7', 'exp': int(time.time()) + 60}, 'not-the-secret', algorithm='HS256')
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'Invalid token'):
+            verify_token(token)
+        header, payload, signature = issue_token(USER).split('.')
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            verify_token('.'.join((header, payload, signature[::-1])))
+
+    def test_required_claims_and_garbage_are_rejected(self):
+        secret = jwt_setting('SECRET_KEY')
+        for token in (jwt.encode({'id': '7'}, secret, algorithm='HS256'),
+                      jwt.encode({'exp': int(time.time()) + 60}, secret, algorithm='HS256'),
+                      'not-a-token', ''):
+            with self.assertRaises(exceptions.AuthenticationFailed, msg=token):
+                verify_token(token)
+
+    def test_verified_claims_are_cached(self):
+        token = issue_token(USER)
+        verify_token(token)
+        cache = get_claims_cache()
+        hits = cache.hits
+        verify_token(token)
+        self.assertEqual(cache.hits, hits + 1)
+
+    def test_cached_claims_lapse_when_the_token_expires(self):
+        # Verified while valid, then looked up again after exp plus the leeway
+        token = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') - 60)
+        claims = jwt.decode(token, options={'verify_signature': False})
+        cache = get_claims_cache()
+        cache.set(token, claims, claims['exp'] + jwt_setting('LEEWAY_SECONDS'))
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'Token has expired'):
+            verify_token(token)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_claims_cache_is_a_bounded_lru(self):
+        cache = ClaimsCache(2)
+        expires_at = time.time() + 60
+        for token in ('a', 'b'):
+            cache.set(token, {'id': token}, expires_at)
+        cache.get('a')
+        cache.set('c', {'id': 'c'}, expires_at)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'id': 'a'})
+        self.assertIsNone(cache.get('a', now=expires_at))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class JWTAuthenticationTests(SimpleTestCase):
+    def setUp(self):
+        get_claims_cache().clear()
+        self.addCleanup(get_claims_cache().clear)
+        self.protected = ProtectedView.as_view()
+        self.public = PublicView.as_view()
+
+    def test_bearer_token_authenticates_without_the_database(self):
+        response = self.protected(bearer(f'Bearer {issue_token(USER)}'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'user': '7'})
+
+    def test_protected_view_rejects_bad_tokens_with_401(self):
+        expired = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') - 60)
+        for value in (f'Bearer {expired}', 'Bearer not-a-token', 'Bearer', 'Bearer a b', 'Bearer \xe9'):
+            with self.subTest(value=value):
+                response = self.protected(bearer(value))
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+    def test_protected_view_requires_a_token(self):
+        for value in ('', f'Token {issue_token(USER)}'):
+            self.assertEqual(self.protected(bearer(value)).status_code, 401)
+
+    def test_public_views_ignore_bad_tokens(self):
+        expired = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') - 60)
+        for value in (f'Bearer {expired}', 'Bearer not-a-token', 'Bearer a b', ''):
+            with self.subTest(value=value):
+                response = self.public(bearer(value))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data, {'authenticated': False})
+        response = self.public(bearer(f'Bearer {issue_token(USER)}'))
+        self.assertEqual(response.data, {'authenticated': True})
+
+
+class UserTokenTests(TestCase):
+    def setUp(self):
+        get_claims_cache().clear()
+        self.addCleanup(get_claims_cache().clear)
+
+    def test_user_endpoints_ignore_an_expired_token(self):
+        expired = issue_token(USER, lifetime=-jwt_setting('LEEWAY_SECONDS') - 60)
+        response = UserViewSet.as_view({'get': 'list'})(bearer(f'Bearer {expired}'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_user_keeps_access_until_the_token_expires(self):
+        # Tokens are stateless: deleting (or "revoking") a user cannot withdraw one early
+        user = User.objects.create(username='ada', email='ada@example.com', password='x')
+        token, user_id = issue_token(user, lifetime=120), str(user.id)
+        user.delete()
+        response = ProtectedView.as_view()(bearer(f'Bearer {token}'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'user': user_id})
+
+
+class DedupeEmailsMigrationTests(TransactionTestCase):
+    before = [('api', '0004_user_delete_customuser')]
+    after = [('api', '0006_user_email_unique')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_keeps_the_oldest_account_per_email_before_adding_the_index(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldUser = executor.loader.project_state(self.before).apps.get_model('api', 'User')
+        for username, email in (('a', 'a@example.com'), ('b', 'b@example.com'), ('a2', 'a@example.com'),
+                                ('a3', 'a@example.com')):
+            OldUser.objects.create(username=username, email=email, password='x')
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['a', 'b'])
+        with self.assertRaises(IntegrityError):
+            User.objects.create(username='c', email='b@example.com', password='x')
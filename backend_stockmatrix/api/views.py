@@ -6,7 +6,7 @@ from rest_framework import permissions
 from rest_framework.authtoken.models import Token
 from .serializers import UserProfileSerializer
 from .models import User
-import jwt
+from backend_stockmatrix.authentication import issue_token
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -29,7 +29,7 @@ class UserViewSet(viewsets.ModelViewSet):
         try:
             user = User.objects.get(email=email)
             if user.check_password(password):
-                token = jwt.encode({'id': str(user.id)}, 'your_secret_key', algorithm='HS256')
+                token = issue_token(user)
                 return Response({'token': token}, status=status.HTTP_200_OK)
             else:
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
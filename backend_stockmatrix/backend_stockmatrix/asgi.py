@@ -13,4 +13,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_stockmatrix.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup so the app registry is ready
+from backend_stockmatrix.preload import preload  # noqa: E402
+from StockSearch.streaming import WEBSOCKET_PATH, quote_websocket  # noqa: E402
+
+# Imports PRELOAD['MODULES'] and calls PRELOAD['CALLABLES'] before the first request
+preload()
+
+
+async def application(scope, receive, send):
+    # Django only speaks HTTP, so WebSocket connections are routed here
+    if scope['type'] == 'websocket':
+        if scope['path'] == WEBSOCKET_PATH:
+            return await quote_websocket(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 1008})
+    return await django_application(scope, receive, send)
@@ -0,0 +1,64 @@
+"""
+Shared, connection-pooled async HTTP client for upstream calls from async views.
+
+One ``aiohttp.ClientSession`` is kept per event loop (sessions cannot be
+shared across loops), with a bounded keep-alive connection pool and explicit
+timeouts, so a single worker can keep hundreds of upstream requests in flight
+over a bounded number of connections per host.
+
+Request failures surface as ``aiohttp.ClientError`` or ``asyncio.TimeoutError``;
+``UPSTREAM_ERRORS`` holds both for ``except`` clauses.
+"""
+import asyncio
+import weakref
+
+import aiohttp
+from django.conf import settings
+
+DEFAULTS = {
+    'MAX_CONNECTIONS': 500,
+    'MAX_CONNECTIONS_PER_HOST': 100,
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 10,
+    'TOTAL_TIMEOUT': 30,
+    'USER_AGENT': 'Mozilla/5.0 (compatible; StockMatrix/1.0)',
+}
+
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+_sessions = weakref.WeakKeyDictionary()
+
+
+def async_http_setting(name):
+    return getattr(settings, 'ASYNC_HTTP', {}).get(name, DEFAULTS[name])
+
+
+def _new_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=async_http_setting('MAX_CONNECTIONS'),
+            limit_per_host=async_http_setting('MAX_CONNECTIONS_PER_HOST'),
+        ),
+        timeout=aiohttp.ClientTimeout(
+            total=async_http_setting('TOTAL_TIMEOUT'),
+            sock_connect=async_http_setting('CONNECT_TIMEOUT'),
+            sock_read=async_http_setting('READ_TIMEOUT'),
+        ),
+        headers={'User-Agent': async_http_setting('USER_AGENT')},
+        raise_for_status=True,
+    )
+
+
+def get_async_client():
+    """The pooled session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = _new_session()
+    return session
+
+
+async def aclose_client():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -0,0 +1,33 @@
+"""
+Base class for the ASGI (``async def``) API views.
+
+DRF's APIView only runs synchronous handlers, so the async endpoints are plain
+Django views.  AsyncAPIView gives them the parts of APIView they rely on: CSRF
+exemption, a parsed JSON body and JSON error responses.
+"""
+import json
+
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+
+class AsyncAPIView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    @staticmethod
+    def json_body(request):
+        """Parsed JSON object from the request body; an empty body gives ``{}``."""
+        if not request.body:
+            return {}
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        return data
+
+    @staticmethod
+    def error(message, status_code=status.HTTP_400_BAD_REQUEST):
+        return JsonResponse({'error': message}, status=status_code)
@@ -0,0 +1,185 @@
+"""
+Stateless JWT authentication for the REST API.
+
+``issue_token`` signs the user's id, email and username at login.
+``JWTAuthentication`` verifies ``Authorization: Bearer <token>`` and returns a
+``TokenUser`` built from those claims, so authenticated requests never touch
+the database.  Tokens are not revocable before they expire, so
+``LIFETIME_SECONDS`` should be kept short.
+
+``OptionalJWTAuthentication`` is the project-wide default: a bad or expired
+token leaves the request anonymous instead of failing it, so public endpoints
+(login and signup included) keep working for clients holding a stale token.
+Views that require a user set ``authentication_classes = [JWTAuthentication]``
+with ``IsAuthenticated``, which answers such tokens with a 401.
+
+Checking a signature is the expensive part, and a client sends the same token
+on every request.  Verified claims are therefore kept in a bounded LRU cache
+keyed on the token.  An entry is served only until the token's ``exp`` (plus
+the same leeway a fresh verification allows), so expiry is enforced exactly
+as without the cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import jwt
+from django.conf import settings
+from rest_framework import authentication, exceptions
+
+DEFAULTS = {
+    # Defaults to settings.SECRET_KEY
+    'SECRET_KEY': None,
+    'ALGORITHM': 'HS256',
+    'LIFETIME_SECONDS': 12 * 3600,
+    'LEEWAY_SECONDS': 30,
+    'CACHE_SIZE': 10000,
+}
+
+
+def jwt_setting(name):
+    value = getattr(settings, 'JWT_AUTH', {}).get(name, DEFAULTS[name])
+    if name == 'SECRET_KEY' and not value:
+        return settings.SECRET_KEY
+    return value
+
+
+class ClaimsCache:
+    """Thread-safe LRU of verified claims; each entry lapses when its token expires."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token, now=None):
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] <= now:
+                del self._entries[token]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, claims, expires_at):
+        with self._lock:
+            self._entries[token] = (claims, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'maxEntries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_claims_cache():
+    return ClaimsCache(jwt_setting('CACHE_SIZE'))
+
+
+def issue_token(user, lifetime=None):
+    now = int(time.time())
+    claims = {
+        'id': str(user.id),
+        'email': user.email,
+        'username': user.username,
+        'iat': now,
+        'exp': now + (lifetime or jwt_setting('LIFETIME_SECONDS')),
+    }
+    return jwt.encode(claims, jwt_setting('SECRET_KEY'), algorithm=jwt_setting('ALGORITHM'))
+
+
+def verify_token(token):
+    """Claims of a valid, unexpired token; raises AuthenticationFailed otherwise."""
+    cache = get_claims_cache()
+    claims = cache.get(token)
+    if claims is not None:
+        return claims
+
+    leeway = jwt_setting('LEEWAY_SECONDS')
+    try:
+        claims = jwt.decode(
+            token,
+            jwt_setting('SECRET_KEY'),
+            algorithms=[jwt_setting('ALGORITHM')],
+            leeway=leeway,
+            options={'require': ['exp', 'id']},
+        )
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed('Invalid token')
+    cache.set(token, claims, claims['exp'] + leeway)
+    return claims
+
+
+class TokenUser:
+    """The authenticated user, built from token claims rather than a database row."""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.id = self.pk = claims['id']
+        self.email = claims.get('email', '')
+        self.username = claims.get('username', '')
+
+    def __str__(self):
+        return self.email or self.id
+
+
+class JWTAuthentication(authentication.BaseAuthentication):
+    """``Authorization: Bearer <token>``; requests without one stay anonymous."""
+
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header')
+        try:
+            token = header[1].decode('ascii')
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token')
+
+        claims = verify_token(token)
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
+
+
+class OptionalJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that treats an invalid token like no token at all."""
+
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return None
@@ -0,0 +1,36 @@
+"""
+Strong ETags and conditional requests for API payloads.
+
+A view tags what it is about to return with a cheap version of the data
+behind it, such as a fund snapshot id plus the query, or the digest the
+response cache stored with an entry.  A client repeating the request with
+``If-None-Match`` then gets a 304 before anything is serialized.  Django's
+``get_conditional_response`` evaluates the preconditions.  A matching
+``If-None-Match`` on a POST therefore gets a 412, as RFC 9110 requires.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+def etag_for(content):
+    """Strong ETag for ``content`` bytes."""
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+
+def make_etag(*parts):
+    """Strong ETag for a version made of ``parts`` with stable ``repr``s."""
+    return etag_for(repr(parts).encode())
+
+
+def conditional_response(request, etag):
+    """The 304 or 412 answering ``request``'s preconditions against ``etag``, or None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def tagged(response, etag):
+    response['ETag'] = etag
+    return response
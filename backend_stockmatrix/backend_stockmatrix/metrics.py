@@ -0,0 +1,281 @@
+"""
+Request timing spans, Server-Timing headers and Prometheus metrics.
+
+``span(name)`` times one stage of a request, for example an upstream fetch,
+a computation or rendering:
+
+* the duration is added to the stage's entry in the ``Server-Timing``
+  response header, summed if the stage runs more than once
+* it is also observed in the ``stockmatrix_stage_duration_seconds`` histogram
+
+``TimingMiddleware`` times whole requests per URL name, method and status.
+It also times DRF rendering as the ``render`` stage.  Spans that run outside
+a request, such as background refreshes or batch worker threads, only feed
+the histograms.
+
+``MetricsView`` serves every metric in the Prometheus text format.  That
+includes what the shared building blocks already count, read when scraped:
+response cache hits, single-flight coalescing, upstream calls, errors and
+circuit state, rate-limit rejections and the JWT claims cache.  Other
+modules add their own with ``register_collector``.
+
+Metrics are per process, so scrape every worker.  The hot path is two
+``perf_counter`` calls, a bisect and a short lock per span.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DEFAULTS = {
+    'SERVER_TIMING': True,
+    'BUCKETS': (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_timing = contextvars.ContextVar('request_timing', default=None)
+_collectors = []
+
+
+def metrics_setting(name):
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{_labels(self.labels, labels)} {value}' for labels, value in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets or metrics_setting('BUCKETS'))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labels, labels)} {cumulative}')
+        return lines
+
+
+request_seconds = Histogram(
+    'stockmatrix_request_duration_seconds', 'Request latency by URL name, method and status.',
+    ('view', 'method', 'status'),
+)
+stage_seconds = Histogram(
+    'stockmatrix_stage_duration_seconds', 'Latency of instrumented request stages.', ('stage',),
+)
+ratelimit_requests = Counter(
+    'stockmatrix_ratelimit_requests_total', 'Rate-limit checks by scope and outcome.', ('scope', 'result'),
+)
+
+
+class span:
+    """Context manager timing one stage of the current request."""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stage_seconds.observe(elapsed, self.name)
+        timing = _timing.get()
+        if timing is not None:
+            timing[self.name] = timing.get(self.name, 0.0) + elapsed
+        return False
+
+
+def server_timing(timing, total):
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timing.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+class TimingMiddleware:
+    """Times every request and adds its stage spans as a Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = {}
+        token = _timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timing.reset(token)
+        return self._finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing = {}
+        token = _timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timing.reset(token)
+        return self._finish(request, response, timing, started)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        render = response.render
+
+        def timed_render():
+            with span('render'):
+                return render()
+        response.render = timed_render
+        return response
+
+    def _finish(self, request, response, timing, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # URL names, not paths, keep the label set bounded
+        view = (match.view_name or 'unnamed') if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        request_seconds.observe(elapsed, view, method, response.status_code)
+        if metrics_setting('SERVER_TIMING'):
+            response['Server-Timing'] = server_timing(timing, elapsed)
+        return response
+
+
+def register_collector(collector):
+    """Add ``collector()``, returning ``[(name, type, help, [(labels, value), ...]), ...]``, to every scrape."""
+    _collectors.append(collector)
+    return collector
+
+
+def _family(name, kind, documentation, samples):
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {value}')
+    return lines
+
+
+@register_collector
+def _building_block_metrics():
+    from .authentication import get_claims_cache
+    from .response_cache import response_caches
+    from .singleflight import all_stats as singleflight_stats
+    from .upstream import all_stats as upstream_stats
+
+    caches = {name: cache.stats() for name, cache in response_caches.items()}
+    flights = singleflight_stats()
+    upstreams = upstream_stats()
+    claims = get_claims_cache().stats()
+    return [
+        ('stockmatrix_response_cache_requests_total', 'counter', 'Response cache lookups by result.', [
+            ({'cache': name, 'result': result}, stats[key])
+            for name, stats in caches.items()
+            for result, key in (('hit', 'hits'), ('stale', 'staleHits'), ('miss', 'misses'))
+        ]),
+        ('stockmatrix_response_cache_hit_ratio', 'gauge', 'Fresh and stale hits over all lookups.', [
+            ({'cache': name}, round((stats['hits'] + stats['staleHits']) / total, 6))
+            for name, stats in caches.items()
+            if (total := stats['hits'] + stats['staleHits'] + stats['misses'])
+        ]),
+        ('stockmatrix_singleflight_calls_total', 'counter', 'Single-flight calls executed or coalesced.', [
+            ({'group': name, 'result': result}, stats[result])
+            for name, stats in flights.items() for result in ('executed', 'coalesced')
+        ]),
+        ('stockmatrix_singleflight_in_flight', 'gauge', 'Single-flight calls running now.', [
+            ({'group': name}, stats['inFlight']) for name, stats in flights.items()
+        ]),
+        ('stockmatrix_upstream_calls_total', 'counter', 'Upstream calls, counting retries once.', [
+            ({'upstream': name}, stats['calls']) for name, stats in upstreams.items()
+        ]),
+        ('stockmatrix_upstream_retries_total', 'counter', 'Upstream attempts retried after a transient error.', [
+            ({'upstream': name}, stats['retried']) for name, stats in upstreams.items()
+        ]),
+        ('stockmatrix_upstream_errors_total', 'counter', 'Upstream attempts that failed with a transient error.', [
+            ({'upstream': name}, stats['errors']) for name, stats in upstreams.items()
+        ]),
+        ('stockmatrix_upstream_rejected_total', 'counter', 'Upstream calls failed fast by an open circuit.', [
+            ({'upstream': name}, stats['rejected']) for name, stats in upstreams.items()
+        ]),
+        ('stockmatrix_upstream_circuit_open', 'gauge', '1 while the circuit breaker is not closed.', [
+            ({'upstream': name}, int(stats['state'] != 'closed')) for name, stats in upstreams.items()
+        ]),
+        ('stockmatrix_jwt_claims_cache_requests_total', 'counter', 'Verified-claims cache lookups by result.', [
+            ({'result': 'hit'}, claims['hits']), ({'result': 'miss'}, claims['misses']),
+        ]),
+        ('stockmatrix_jwt_claims_cache_entries', 'gauge', 'Tokens in the verified-claims cache.', [
+            ({}, claims['entries']),
+        ]),
+    ]
+
+
+def render_metrics():
+    lines = []
+    for metric in (request_seconds, stage_seconds, ratelimit_requests):
+        lines += metric.render()
+    for collector in _collectors:
+        for family in collector():
+            lines += _family(*family)
+    return '\n'.join(lines) + '\n'
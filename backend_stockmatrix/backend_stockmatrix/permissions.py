@@ -0,0 +1,17 @@
+"""
+Access control for the operational endpoints (metrics, coalescing stats).
+
+They expose traffic and upstream details, so they answer only requests from
+an address in ``settings.INTERNAL_IPS`` such as a local Prometheus scraper or
+a sidecar.  Behind a reverse proxy, the proxy must pass the real client
+address in ``REMOTE_ADDR`` for this check to mean anything.
+"""
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class IsInternalRequest(BasePermission):
+    message = 'This endpoint is only available from internal addresses.'
+
+    def has_permission(self, request, view):
+        return request.META.get('REMOTE_ADDR') in getattr(settings, 'INTERNAL_IPS', ())
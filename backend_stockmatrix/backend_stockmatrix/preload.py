@@ -0,0 +1,47 @@
+"""
+Opt-in preloading of libraries that are otherwise imported on first use.
+
+yfinance (and pandas with it) is only imported by the code paths that call
+it, so ``manage.py`` commands, worker boots and requests that never reach
+Yahoo do not pay for it.  Deployments that would rather pay once at boot
+list modules in ``PRELOAD['MODULES']``.  An example is gunicorn
+``--preload``, where forked workers then share the imported pages.
+``wsgi.py`` and ``asgi.py`` import them once Django is set up.
+
+``PRELOAD['CALLABLES']`` names functions called at the same point, to start
+warming state such as the screener universe before the first request.  They
+should return quickly and do their work in the background.
+"""
+import importlib
+import logging
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MODULES': (),
+    'CALLABLES': (),
+}
+
+
+def preload_setting(name):
+    return getattr(settings, 'PRELOAD', {}).get(name, DEFAULTS[name])
+
+
+def preload(modules=None, callables=None):
+    """Import ``modules`` and call ``callables`` (default from ``PRELOAD``) now; returns the seconds each took."""
+    timings = {}
+    for name in preload_setting('MODULES') if modules is None else modules:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - started
+    for name in preload_setting('CALLABLES') if callables is None else callables:
+        started = time.perf_counter()
+        import_string(name)()
+        timings[name] = time.perf_counter() - started
+    if timings:
+        logger.info('Preloaded ' + ', '.join(f'{name} ({seconds * 1000:.0f} ms)' for name, seconds in timings.items()))
+    return timings
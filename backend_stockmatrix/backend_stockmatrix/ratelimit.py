@@ -0,0 +1,286 @@
+"""
+Sliding-window rate limiting shared by every worker process.
+
+Each key keeps two fixed-window counters (current and previous); the
+request count over the last ``period`` seconds is estimated as
+``previous * overlap + current``.  A hit costs O(1) and the check-and-increment
+is atomic in every backend.  When several limits apply to one request (per
+client and global), all of them are checked before any is incremented, so a
+request rejected by one limit costs nothing against the others:
+
+* ``SharedFileBackend`` keeps the counters in a memory-mapped file guarded by
+  ``flock``, so all workers on one host share the same budget.  If every slot
+  a key may use is taken by a live counter, the request is rejected.
+* ``CacheBackend`` uses ``cache.add``/``cache.incr`` on a Django cache alias and
+  is atomic on Redis and Memcached, for limits shared across hosts.
+
+The decorators wrap both DRF ``APIView`` methods and ``async def`` handlers of
+plain Django views; the latter get a ``JsonResponse`` when limited.  Backends
+block (``flock``, cache round trips), so async views run the check in a worker
+thread rather than on the event loop.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import ratelimit_requests, span
+
+logger = logging.getLogger(__name__)
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'remaining', 'retry_after'])
+
+
+def ratelimit_setting(name, default=None):
+    return getattr(settings, 'RATE_LIMIT', {}).get(name, default)
+
+
+def _window(now, period):
+    window = int(now // period)
+    elapsed = now - window * period
+    return window, 1 - elapsed / period, period - elapsed
+
+
+def _result(allowed, estimated, limit, retry_after):
+    return RateLimitResult(allowed, max(int(limit - estimated), 0), 0 if allowed else int(retry_after) + 1)
+
+
+class RateLimitBackend:
+    """Backends implement ``hit_many``: check every ``(key, limit, period)``, and
+    count the request against all of them only if all allow it."""
+
+    def hit_many(self, limits):
+        raise NotImplementedError
+
+    def hit(self, key, limit, period):
+        return self.hit_many([(key, limit, period)])[0]
+
+
+class SharedFileBackend(RateLimitBackend):
+    """Fixed-size hash table of counters in a shared, memory-mapped file."""
+    SLOT = struct.Struct('<QqIId')  # key hash, window, current, previous, expires at
+    PROBES = 8
+
+    def __init__(self, path=None, slots=65536):
+        self.path = Path(path or ratelimit_setting('PATH'))
+        self.slots = slots
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # flock is held per open file, so every process needs its own descriptor
+        if self._pid == os.getpid():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = self.slots * self.SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _find_slot(self, key_hash, now):
+        """The key's slot and its contents, else a free or expired slot and None, else (None, None)."""
+        free = None
+        for probe in range(self.PROBES):
+            index = (key_hash + probe) % self.slots
+            slot = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+            if slot[0] == key_hash:
+                return index, slot
+            if free is None and (slot[0] == 0 or slot[4] < now):
+                free = index
+        return free, None
+
+    def hit_many(self, limits):
+        now = time.time()
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                checks = [self._check_slot(key, limit, period, now) for key, limit, period in limits]
+                allowed = all(check['allowed'] for check in checks)
+                if allowed:
+                    for check in checks:
+                        check['current'] += 1
+                        self._store(check)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        return [
+            _result(check['allowed'], check['estimated'] + allowed, limit, check['retry_after'])
+            for check, (_, limit, _) in zip(checks, limits)
+        ]
+
+    def _check_slot(self, key, limit, period, now):
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        window, overlap, retry_after = _window(now, period)
+        index, slot = self._find_slot(key_hash, now)
+        if index is None:
+            # Overwriting a live counter would reset another client's budget
+            logger.warning(f"Rate limit table {self.path} is full around {key}; rejecting")
+            return {'allowed': False, 'estimated': limit, 'retry_after': retry_after}
+
+        current = previous = 0
+        if slot is not None:
+            _, slot_window, current, previous, _ = slot
+            if slot_window != window:
+                previous = current if slot_window == window - 1 else 0
+                current = 0
+        check = {
+            'index': index, 'key_hash': key_hash, 'window': window, 'period': period,
+            'current': current, 'previous': previous, 'retry_after': retry_after,
+            'estimated': previous * overlap + current,
+        }
+        check['allowed'] = check['estimated'] < limit
+        # Claimed (and rolled over) now, so a later key in the same hit cannot take the slot
+        self._store(check)
+        return check
+
+    def _store(self, check):
+        self.SLOT.pack_into(
+            self._map, check['index'] * self.SLOT.size,
+            check['key_hash'], check['window'], check['current'], check['previous'],
+            (check['window'] + 2) * check['period'],
+        )
+
+
+class CacheBackend(RateLimitBackend):
+    """Counters in a Django cache alias; atomic when the backend's incr is."""
+
+    def __init__(self, alias=None):
+        self.alias = alias or ratelimit_setting('CACHE_ALIAS', 'default')
+
+    def hit_many(self, limits):
+        cache = caches[self.alias]
+        now = time.time()
+        checks = []
+        for key, limit, period in limits:
+            window, overlap, retry_after = _window(now, period)
+            current_key = f'{key}:{window}'
+
+            cache.add(current_key, 0, period * 2)
+            try:
+                current = cache.incr(current_key)
+            except ValueError:
+                # The counter expired between add() and incr()
+                cache.add(current_key, 1, period * 2)
+                current = 1
+            previous = cache.get(f'{key}:{window - 1}', 0)
+
+            estimated = previous * overlap + current
+            checks.append((current_key, estimated <= limit, estimated, limit, retry_after))
+
+        allowed = all(check[1] for check in checks)
+        if not allowed:
+            # Rejected requests do not consume budget under any of the limits
+            for current_key, *_ in checks:
+                cache.decr(current_key)
+        return [
+            _result(key_allowed, estimated, limit, retry_after)
+            for _, key_allowed, estimated, limit, retry_after in checks
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(ratelimit_setting('BACKEND', 'backend_stockmatrix.ratelimit.SharedFileBackend'))()
+
+
+def _too_many_requests(message, result, is_async=False):
+    if is_async:
+        response = JsonResponse({'error': message}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    else:
+        response = Response({'error': message}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(result.retry_after)
+    return response
+
+
+def _check(scopes, limits):
+    with span('ratelimit'):
+        results = get_backend().hit_many(limits)
+    allowed = all(result.allowed for result in results)
+    for scope in scopes:
+        ratelimit_requests.inc(scope, 'allowed' if allowed else 'limited')
+    return results
+
+
+def _first_rejection(request, rules):
+    """``(message, result)`` for the first rule rejecting ``request``, else None."""
+    results = _check(
+        [rule.scope for rule in rules], [(rule.key_func(request), rule.limit, rule.period) for rule in rules],
+    )
+    for rule, result in zip(rules, results):
+        if not result.allowed:
+            return rule.message, result
+    return None
+
+
+_Rule = namedtuple('_Rule', ['scope', 'key_func', 'limit', 'period', 'message'])
+
+
+def _limited(view_func, scope, key_func, limit, period, message):
+    # Stacked rate-limit decorators merge into one wrapper, so every limit is
+    # checked before any of them is counted
+    rules = [_Rule(scope, key_func, limit, period, message), *getattr(view_func, 'rate_limit_rules', ())]
+    view_func = getattr(view_func, 'unlimited_view', view_func)
+
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapped_view(self, request, *args, **kwargs):
+            rejection = await sync_to_async(_first_rejection)(request, rules)
+            if rejection is not None:
+                return _too_many_requests(*rejection, is_async=True)
+            return await view_func(self, request, *args, **kwargs)
+        wrapped_view = async_wrapped_view
+    else:
+        @wraps(view_func)
+        def wrapped_view(self, request, *args, **kwargs):
+            rejection = _first_rejection(request, rules)
+            if rejection is not None:
+                return _too_many_requests(*rejection)
+            return view_func(self, request, *args, **kwargs)
+
+    wrapped_view.rate_limit_rules = rules
+    wrapped_view.unlimited_view = view_func
+    return wrapped_view
+
+
+def check_rate_limit(key_prefix, address, limit=60, period=60):
+    """Count one hit on ``key_prefix``'s limit for ``address`` outside a view, e.g. a WebSocket connect."""
+    return _check([key_prefix], [(f'ratelimit:{key_prefix}:{address}', limit, period)])[0]
+
+
+def rate_limit(key_prefix, limit=60, period=60):
+    def decorator(view_func):
+        return _limited(
+            view_func, key_prefix,
+            lambda request: f"ratelimit:{key_prefix}:{request.META.get('REMOTE_ADDR')}",
+            limit, period, 'Too many requests. Please try again later.',
+        )
+    return decorator
+
+
+def global_rate_limit(limit=100, period=60):
+    def decorator(view_func):
+        return _limited(
+            view_func, 'global', lambda request: 'global_ratelimit',
+            limit, period, 'Global rate limit exceeded. Please try again later.',
+        )
+    return decorator
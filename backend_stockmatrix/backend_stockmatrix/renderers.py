@@ -0,0 +1,55 @@
+"""
+JSON rendering for the API.
+
+``FastJSONRenderer`` serializes with orjson when it is installed, which is
+several times faster than the stdlib encoder on the fund and stock payloads,
+and otherwise renders exactly as DRF's ``JSONRenderer``.  Types orjson does
+not handle natively (datetimes, Decimals, lazy strings) go through DRF's
+encoder, so both paths produce the same values.  ``JSONBytesResponse`` is the
+same encoding for the plain Django (ASGI) views.
+"""
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes are passed through so they keep DRF's format
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """Compact UTF-8 JSON for ``data``."""
+    if orjson is None:
+        content = _encoder.encode(data)
+        return content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+    content = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    # Keep the output a strict JavaScript subset, as JSONRenderer does
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Pretty-printing (``Accept: application/json; indent=4``) is left to DRF
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class JSONBytesResponse(HttpResponse):
+    """``JsonResponse`` rendered with ``dumps``."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,168 @@
+"""
+Stale-while-revalidate cache for API payloads.
+
+Entries are stored in a Django cache alias (``RESPONSE_CACHE['ALIAS']``) so
+any shared backend works: the default file-based cache is shared by all
+worker processes on a host, and Redis/Memcached can be used across hosts.
+Each entry is fresh for ``TTL`` seconds and may then be served stale for
+``STALE_TTL`` more seconds while one background refresh, guarded by a
+cache-level lock, repopulates it.
+
+Entries also carry a strong ETag, a digest of the value taken when it is
+stored, so views can answer conditional requests for cached payloads
+without serializing them (``get_tagged``).  The async variants run cache
+reads and writes (and the pickling behind each ETag) in a worker thread, so a
+slow cache backend never blocks the event loop.
+"""
+import asyncio
+import logging
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .conditional import etag_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE_SETTINGS = {'TTL': 60, 'STALE_TTL': 600}
+
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='response-cache-refresh')
+
+response_caches = {}
+
+# Strong references to async background refreshes until they finish
+_refresh_tasks = set()
+
+
+def response_cache_setting(name, default=None):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, default)
+
+
+class ResponseCache:
+    def __init__(self, namespace):
+        self.namespace = namespace
+        options = dict(DEFAULT_NAMESPACE_SETTINGS, **response_cache_setting(namespace, {}))
+        self.ttl = options['TTL']
+        self.stale_ttl = options['STALE_TTL']
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        response_caches[namespace] = self
+
+    @property
+    def cache(self):
+        return caches[response_cache_setting('ALIAS', 'default')]
+
+    def _key(self, key):
+        return f'swr:{self.namespace}:{key}'
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, fn):
+        """Return the cached value for ``key``, calling ``fn`` only on a miss.
+
+        Stale values are returned immediately and refreshed in the background.
+        Exceptions from ``fn`` are not cached.
+        """
+        return self.get_tagged(key, fn)[0]
+
+    async def aget(self, key, afn):
+        """Async variant of ``get`` for coroutine functions ``afn``."""
+        return (await self.aget_tagged(key, afn))[0]
+
+    def _lookup(self, key):
+        entry = self.cache.get(self._key(key))
+        if entry is None:
+            return None, False
+        value, fresh_until, etag = entry if len(entry) == 3 else (*entry, None)
+        fresh = time.time() < fresh_until
+        self._count('hits' if fresh else 'stale_hits')
+        # Entries stored before ETags were added are tagged on read
+        return (value, etag or self._etag(value)), fresh
+
+    def get_tagged(self, key, fn):
+        """``(value, etag)`` for ``key``, with the caching of ``get``."""
+        tagged, fresh = self._lookup(key)
+        if tagged is not None:
+            if not fresh:
+                self._schedule_refresh(key, fn)
+            return tagged
+
+        self._count('misses')
+        return self.set_tagged(key, fn())
+
+    async def aget_tagged(self, key, afn):
+        """Async variant of ``get_tagged`` for coroutine functions ``afn``."""
+        tagged, fresh = await sync_to_async(self._lookup)(key)
+        if tagged is not None:
+            if not fresh:
+                await self._schedule_async_refresh(key, afn)
+            return tagged
+
+        self._count('misses')
+        return await sync_to_async(self.set_tagged)(key, await afn())
+
+    @staticmethod
+    def _etag(value):
+        # Equal values pickle alike, so an unchanged refresh keeps its ETag
+        return etag_for(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def set(self, key, value):
+        return self.set_tagged(key, value)[0]
+
+    def set_tagged(self, key, value):
+        etag = self._etag(value)
+        self.cache.set(self._key(key), (value, time.time() + self.ttl, etag), self.ttl + self.stale_ttl)
+        return value, etag
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def _schedule_refresh(self, key, fn):
+        lock_key = self._key(key) + ':refreshing'
+        # add() is atomic on every shared backend, so only one worker refreshes
+        if not self.cache.add(lock_key, 1, max(self.ttl, 30)):
+            return
+
+        def refresh():
+            try:
+                self.set(key, fn())
+            except Exception as e:
+                logger.warning(f"Background refresh of {self._key(key)} failed: {str(e)}")
+            finally:
+                self.cache.delete(lock_key)
+
+        _refresh_executor.submit(refresh)
+
+    async def _schedule_async_refresh(self, key, afn):
+        lock_key = self._key(key) + ':refreshing'
+        if not await self.cache.aadd(lock_key, 1, max(self.ttl, 30)):
+            return
+
+        async def refresh():
+            try:
+                value = await afn()
+                await sync_to_async(self.set)(key, value)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self._key(key)} failed: {str(e)}")
+            finally:
+                await self.cache.adelete(lock_key)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'staleHits': self.stale_hits,
+            'misses': self.misses,
+        }
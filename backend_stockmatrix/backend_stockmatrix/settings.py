@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 MIDDLEWARE = [
+    'backend_stockmatrix.metrics.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -160,15 +161,181 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # Shared by every worker process on this host; point at RedisCache or
+    # PyMemcacheCache to share it across hosts
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'responses',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# Rate limiting: SharedFileBackend shares counters between the workers on one
+# host; use 'backend_stockmatrix.ratelimit.CacheBackend' with a Redis or
+# Memcached CACHE_ALIAS to share them across hosts
+RATE_LIMIT = {
+    'BACKEND': 'backend_stockmatrix.ratelimit.SharedFileBackend',
+    'PATH': BASE_DIR / '.cache' / 'ratelimit.bin',
+    'CACHE_ALIAS': 'default',
+}
+
+# Stale-while-revalidate response cache: entries are fresh for TTL seconds and
+# served stale for up to STALE_TTL more while a background refresh runs
+RESPONSE_CACHE = {
+    'ALIAS': 'responses',
+    'stock': {'TTL': 60, 'STALE_TTL': 600},
+    'mutual_funds': {'TTL': 900, 'STALE_TTL': 6 * 3600},
+    'news': {'TTL': 900, 'STALE_TTL': 3600},
+    # Keyed on the NAV store version, so entries only change when new NAVs are loaded
+    'nav_analytics': {'TTL': 24 * 3600, 'STALE_TTL': 24 * 3600},
 }
 
 # Rest Framework settings
+# FastJSONRenderer uses orjson when it is installed (pip install orjson) and
+# falls back to DRF's JSONRenderer otherwise.  Public views ignore bad bearer
+# tokens; views that require a user opt into JWTAuthentication explicitly
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'backend_stockmatrix.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'backend_stockmatrix.authentication.OptionalJWTAuthentication',
+    ],
+}
+
+# JWT authentication: tokens issued at login are verified without a database
+# lookup, and verified claims are cached (at most CACHE_SIZE tokens) until expiry
+JWT_AUTH = {
+    'ALGORITHM': 'HS256',
+    'LIFETIME_SECONDS': 12 * 3600,
+    'LEEWAY_SECONDS': 30,
+    'CACHE_SIZE': 10000,
+}
+
+# Market data settings
+# PROVIDER can be switched to 'StockSearch.market_data.FixtureProvider' to run offline, or to
+# 'StockSearch.market_data.YahooChartProvider' for native async upstream calls in the async views
+MARKET_DATA = {
+    'PROVIDER': 'StockSearch.market_data.YahooProvider',
+    'CHART_URL': 'https://query2.finance.yahoo.com/v8/finance/chart',
+    'STORE_DIR': BASE_DIR / 'market_data',
+    'FIXTURE_DIR': BASE_DIR / 'StockSearch' / 'fixtures' / 'market_data',
+    'HISTORY_DAYS': 400,
+    'REFRESH_SECONDS': 300,
+    'INFO_TTL': 300,
+    # Upstream calls in flight per provider, and limits for the batch endpoint
+    'MAX_CONCURRENCY': 8,
+    'MAX_BATCH_SYMBOLS': 100,
+    'BATCH_TIMEOUT': 30,
+}
+
+# Stock screener: UNIVERSE_FILE lists one symbol per line (e.g. RELIANCE.NS);
+# symbols already in the market data store are always included
+SCREENER = {
+    'UNIVERSE_FILE': BASE_DIR / 'StockSearch' / 'fixtures' / 'universe.txt',
+    'REFRESH_SECONDS': 300,
+    # Seconds a client is told to wait while the universe is first built
+    'RETRY_AFTER': 5,
+}
+
+# Price forecasts: one model per symbol per trading day, fitted by `manage.py fit_forecasts`
+FORECAST = {
+    'MODEL_DIR': BASE_DIR / 'market_data' / 'forecasts',
+    'LOOKBACK_DAYS': 120,
+    'MIN_OBSERVATIONS': 20,
+    'HORIZON_DAYS': 30,
+}
+
+# Chart images: rendered by WORKERS matplotlib processes and stored under IMAGE_DIR
+CHARTS = {
+    'IMAGE_DIR': BASE_DIR / '.cache' / 'charts',
+    'DAYS': 180,
+    'WORKERS': 2,
+    'RENDER_TIMEOUT': 30,
+    # Charts kept on disk: at most MAX_CHARTS, none older than MAX_AGE seconds
+    'MAX_CHARTS': 2000,
+    'MAX_AGE': 7 * 24 * 3600,
+    # Seconds a client is told to wait for a chart that is still rendering
+    'RETRY_AFTER': 2,
+}
+
+# News headlines for sentiment analysis
+# SOURCE can be switched to 'StockSearch.news.FixtureNewsSource' to run offline
+NEWS = {
+    'SOURCE': 'StockSearch.news.YahooNewsSource',
+    'FIXTURE_DIR': BASE_DIR / 'StockSearch' / 'fixtures' / 'news',
+    'MAX_HEADLINES': 10,
+}
+
+# Mutual fund NAV history, loaded from AMFI NAV files by `manage.py load_navs`
+NAV_HISTORY = {
+    'STORE_DIR': BASE_DIR / 'market_data' / 'navs',
+}
+
+# Addresses allowed to read the operational endpoints (/metrics/ and
+# /api/upstream/coalescing/), e.g. the Prometheus scraper; add its address
+# when it does not run on the same host
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# Request metrics: stage timings are sent in a Server-Timing header, and each
+# worker serves Prometheus metrics at /metrics/ (latency buckets in seconds)
+METRICS = {
+    'SERVER_TIMING': True,
+    'BUCKETS': (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+# yfinance (and pandas with it) is imported on first use. List modules here to
+# import them when a WSGI/ASGI worker boots instead, e.g. ['yfinance'] with gunicorn --preload.
+# CALLABLES run at the same point; warm_universe builds the screener in the background
+PRELOAD = {
+    'MODULES': [],
+    'CALLABLES': ['StockSearch.screener.warm_universe'],
+}
+
+# Pooled async HTTP client used by the async (ASGI) views
+ASYNC_HTTP = {
+    'MAX_CONNECTIONS': 500,
+    'MAX_CONNECTIONS_PER_HOST': 100,
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 10,
+    'TOTAL_TIMEOUT': 30,
+}
+
+# Live quote streaming (SSE at api/stream/quotes/, WebSocket at ws/quotes/; ASGI only):
+# one poller per symbol per worker, polling every POLL_SECONDS
+STREAMING = {
+    'POLL_SECONDS': 5,
+    'HEARTBEAT_SECONDS': 15,
+    'QUEUE_SIZE': 32,
+    'MAX_SYMBOLS': 20,
+    # Per worker: open streams per client address and symbols polled in total
+    'MAX_CONNECTIONS_PER_CLIENT': 5,
+    'MAX_HUB_SYMBOLS': 500,
+    # Cross-site pages allowed to open the quote WebSocket; same-origin always is
+    'ALLOWED_ORIGINS': CORS_ALLOWED_ORIGINS,
+    # WebSocket connects per client address per minute
+    'CONNECT_RATE_LIMIT': 30,
+}
+
+# Upstream HTTP calls: a pooled session per host, RETRIES retries with jittered
+# exponential backoff, and a circuit breaker that fails fast for RESET_TIMEOUT
+# seconds after FAILURE_THRESHOLD consecutive failed calls
+UPSTREAM = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 32,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF_BASE': 0.25,
+    'BACKOFF_MAX': 4.0,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT': 30,
 }
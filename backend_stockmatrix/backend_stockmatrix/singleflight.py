@@ -0,0 +1,90 @@
+"""
+Single-flight coalescing of identical upstream calls.
+
+Concurrent callers asking a SingleFlight group for the same key share one
+execution of the underlying function: the first caller runs it, everyone
+else waits for that result (or exception) instead of issuing their own call.
+``do`` coalesces threads and ``ado`` coalesces coroutines on one event loop.
+"""
+import asyncio
+import threading
+
+groups = {}
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.executed = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        groups[name] = self
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, afn):
+        task = self._async_calls.get(key)
+        with self._lock:
+            if task is None:
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if task is None:
+            # The call runs in its own task, so cancelling any caller, the
+            # first one included, leaves it running for the others
+            task = self._async_calls[key] = asyncio.get_running_loop().create_task(afn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        # Mark the exception as retrieved when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'inFlight': len(self._calls) + len(self._async_calls),
+            }
+
+
+def all_stats():
+    return {name: group.stats() for name, group in groups.items()}
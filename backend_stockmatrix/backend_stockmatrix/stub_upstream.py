@@ -0,0 +1,221 @@
+"""
+Local stand-ins for the upstream services, for offline load tests.
+
+StubUpstream runs a small asyncio HTTP/1.1 server (keep-alive, many
+concurrent connections) on 127.0.0.1 in a background thread.  Every response
+is delayed by ``latency`` seconds to model a remote API, and a fraction
+``error_rate`` of requests is answered with a 503.  Routes:
+
+* ``/v8/finance/chart/<symbol>``: Yahoo chart API responses built from the
+  symbol's recorded fixtures in ``fixture_dir`` (see
+  ``manage.py record_market_fixtures``), or else from a deterministic random
+  walk per symbol
+* ``/mutual-funds/best-funds/equity.html``: the saved moneycontrol page at
+  ``fund_page``, or else a synthetic one
+"""
+import asyncio
+import json
+import random
+import threading
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from MutualFund.synthetic import synthetic_fund_page
+from StockSearch.market_data import FixtureProvider
+from StockSearch.synthetic import random_walk_closes
+
+CHART_PREFIX = '/v8/finance/chart/'
+FUNDS_PATH = '/mutual-funds/best-funds/equity.html'
+REASONS = {200: 'OK', 404: 'Not Found', 503: 'Service Unavailable'}
+
+
+def _day(timestamp):
+    return np.datetime64(int(timestamp) // 86400, 'D')
+
+
+@lru_cache(maxsize=4096)
+def _walk(symbol):
+    return random_walk_closes(1, 2000, seed=zlib.crc32(symbol.encode()))[0]
+
+
+def _chart_range(query, today):
+    if 'period1' in query:
+        return _day(query['period1'][0]), min(_day(query['period2'][0]), today + 1)
+    return today - 7, today + 1
+
+
+def _chart_payload(meta, dates, columns):
+    return {'chart': {'result': [{
+        'meta': dict(meta, currency='INR', exchangeName='NSI', gmtoffset=19800),
+        'timestamp': (dates.astype('datetime64[s]').astype('i8') + 3 * 3600).tolist(),
+        'indicators': {'quote': [{column: values.tolist() for column, values in columns.items()}]},
+    }], 'error': None}}
+
+
+def chart_response(symbol, query):
+    """Chart API payload for ``symbol`` with the same shape Yahoo returns."""
+    today = np.datetime64(datetime.now(timezone.utc).date(), 'D')
+    start, end = _chart_range(query, today)
+    dates = np.arange(start, end, dtype='datetime64[D]')
+    dates = dates[np.is_busday(dates)]
+
+    # Prices are a function of the date, so overlapping ranges agree
+    closes = _walk(symbol)
+    index = (dates - np.datetime64('2020-01-01')).astype(int) % len(closes)
+    close = closes[index]
+    last = float(close[-1]) if len(close) else 100.0
+
+    return _chart_payload({
+        'symbol': symbol, 'longName': f'{symbol} Ltd', 'shortName': symbol.split('.')[0],
+        'regularMarketPrice': last, 'chartPreviousClose': float(close[-2]) if len(close) > 1 else last,
+        'regularMarketDayHigh': last * 1.01, 'regularMarketDayLow': last * 0.99,
+        'regularMarketVolume': 1_000_000,
+    }, dates, {
+        'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': np.full(len(close), 1_000_000),
+    })
+
+
+def fixture_chart_response(fixtures, symbol, query):
+    """Chart API payload replaying ``symbol``'s recorded info and bars."""
+    today = np.datetime64(datetime.now(timezone.utc).date(), 'D')
+    start, end = _chart_range(query, today)
+    info = fixtures.get_info(symbol)
+    bars = fixtures.get_history(symbol, start, end)
+    meta = {
+        'symbol': symbol,
+        'longName': info.get('longName'),
+        'shortName': info.get('shortName'),
+        'regularMarketPrice': info.get('currentPrice'),
+        'chartPreviousClose': info.get('previousClose'),
+        'regularMarketDayHigh': info.get('dayHigh'),
+        'regularMarketDayLow': info.get('dayLow'),
+        'regularMarketVolume': info.get('volume'),
+        'fiftyTwoWeekHigh': info.get('fiftyTwoWeekHigh'),
+        'fiftyTwoWeekLow': info.get('fiftyTwoWeekLow'),
+    }
+    return _chart_payload(
+        {key: value for key, value in meta.items() if value is not None},
+        bars['date'], {column: bars[column] for column in ('open', 'high', 'low', 'close', 'volume')},
+    )
+
+
+class StubUpstream:
+    def __init__(self, latency=0.1, fund_rows=2000, error_rate=0.0, fixture_dir=None, fund_page=None, seed=0):
+        self.latency = latency
+        self.fund_rows = fund_rows
+        self.error_rate = error_rate
+        self.fixtures = FixtureProvider(fixture_dir) if fixture_dir else None
+        self.fund_page = fund_page
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self.base_url = None
+        self._fund_page = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._connections = set()
+
+    def _route(self, target):
+        url = urlsplit(target)
+        if url.path.startswith(CHART_PREFIX):
+            symbol = url.path[len(CHART_PREFIX):]
+            query = parse_qs(url.query)
+            if self.fixtures and (self.fixtures.directory / f'{symbol}.csv').exists():
+                payload = fixture_chart_response(self.fixtures, symbol, query)
+            else:
+                payload = chart_response(symbol, query)
+            return 200, 'application/json', json.dumps(payload).encode()
+        if url.path == FUNDS_PATH:
+            if self._fund_page is None:
+                if self.fund_page:
+                    with open(self.fund_page, 'rb') as f:
+                        self._fund_page = f.read()
+                else:
+                    self._fund_page = synthetic_fund_page(self.fund_rows)
+            return 200, 'text/html; charset=utf-8', self._fund_page
+        return 404, 'application/json', b'{"error": "not found"}'
+
+    async def _handle(self, reader, writer):
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                if self.error_rate and self._random.random() < self.error_rate:
+                    self.errors += 1
+                    status, content_type, body = 503, 'application/json', b'{"error": "injected failure"}'
+                else:
+                    status, content_type, body = self._route(request_line.split()[1].decode())
+                writer.write(
+                    f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                    f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                    f'Connection: keep-alive\r\n\r\n'.encode() + body
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    def start(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=4096)
+            )
+            port = self._server.sockets[0].getsockname()[1]
+            self.base_url = f'http://127.0.0.1:{port}'
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    async def _shutdown(self):
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._loop.stop()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def chart_url(self):
+        return self.base_url + CHART_PREFIX.rstrip('/')
+
+    @property
+    def funds_url(self):
+        return self.base_url + FUNDS_PATH
@@ -0,0 +1,559 @@
+import asyncio
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from . import ratelimit, renderers, response_cache
+from .conditional import conditional_response, etag_for, make_etag, tagged
+from .renderers import JSONBytesResponse
+from .response_cache import ResponseCache
+from .singleflight import SingleFlight
+from .upstream import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class SingleFlightTests(SimpleTestCase):
+    def run_threads(self, flight, key, fn, n_threads=8):
+        """Call ``flight.do(key, fn)`` from ``n_threads`` threads at once; returns each thread's result or exception."""
+        outcomes = [None] * n_threads
+
+        def call(index):
+            try:
+                outcomes[index] = flight.do(key, fn)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def blocking(self, flight, result, n_followers):
+        """A function that returns (or raises) ``result`` once ``n_followers`` callers are waiting on it."""
+        calls = []
+
+        def fn():
+            calls.append(threading.get_ident())
+            deadline = time.monotonic() + 5
+            while flight.stats()['coalesced'] < n_followers and time.monotonic() < deadline:
+                time.sleep(0.001)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return fn, calls
+
+    def test_concurrent_threads_share_one_call(self):
+        flight = SingleFlight('test-threads')
+        fn, calls = self.blocking(flight, {'price': 1}, n_followers=7)
+        outcomes = self.run_threads(flight, 'AAA', fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{'price': 1}] * 8)
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+        self.assertEqual(flight.stats(), {'executed': 1, 'coalesced': 7, 'inFlight': 0})
+
+    def test_exception_reaches_every_waiter(self):
+        flight, error = SingleFlight('test-thread-errors'), requests.ConnectionError('upstream down')
+        fn, calls = self.blocking(flight, error, n_followers=7)
+        outcomes = self.run_threads(flight, 'AAA', fn)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+
+    def test_key_is_released_after_each_call(self):
+        flight, calls = SingleFlight('test-release'), []
+        with self.assertRaises(ValueError):
+            flight.do('AAA', mock.Mock(side_effect=ValueError('bad')))
+        self.assertEqual(flight.stats()['inFlight'], 0)
+        for _ in range(2):
+            self.assertEqual(flight.do('AAA', lambda: calls.append(1) or len(calls)), len(calls))
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual(flight.stats(), {'executed': 3, 'coalesced': 0, 'inFlight': 0})
+
+    def test_different_keys_do_not_wait_for_each_other(self):
+        flight, release = SingleFlight('test-keys'), threading.Event()
+        slow = threading.Thread(target=flight.do, args=('AAA', lambda: release.wait(5)))
+        slow.start()
+        try:
+            deadline = time.monotonic() + 5
+            while flight.stats()['inFlight'] < 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(flight.do('BBB', lambda: 'quote'), 'quote')
+            self.assertEqual(flight.stats(), {'executed': 2, 'coalesced': 0, 'inFlight': 1})
+        finally:
+            release.set()
+            slow.join(5)
+
+    def test_cancelled_leader_leaves_the_call_to_followers(self):
+        flight, calls = SingleFlight('test-cancelled-leader'), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'quote'
+
+        async def scenario():
+            leader = asyncio.create_task(flight.ado('AAA', fetch))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(flight.ado('AAA', fetch)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*followers)
+
+        self.assertEqual(asyncio.run(scenario()), ['quote'] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {'executed': 1, 'coalesced': 3, 'inFlight': 0})
+
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight('test-errors')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream')
+
+        async def scenario():
+            return await asyncio.gather(*(flight.ado('AAA', fail) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertEqual([type(result) for result in results], [ValueError] * 3)
+        self.assertEqual(flight.stats()['inFlight'], 0)
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f'{status_code} error', response=response)
+
+
+class Failing:
+    """Callable raising each of ``errors`` in turn, then returning 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@override_settings(UPSTREAM=dict(settings.UPSTREAM, RETRIES=2, BACKOFF_BASE=0, FAILURE_THRESHOLD=3, RESET_TIMEOUT=60))
+class UpstreamPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = Upstream('test')
+
+    def test_retries_network_errors_and_server_errors(self):
+        fn = Failing(requests.exceptions.ConnectionError('reset'), http_error(503))
+        self.assertEqual(self.upstream.call(fn), 'ok')
+        self.assertEqual(fn.calls, 3)
+        self.assertEqual(self.upstream.stats()['failures'], 0)
+
+    def test_client_errors_are_not_retried_and_keep_the_breaker_closed(self):
+        for _ in range(5):
+            fn = Failing(http_error(404))
+            with self.assertRaises(requests.exceptions.HTTPError):
+                self.upstream.call(fn)
+            self.assertEqual(fn.calls, 1)
+        self.assertEqual(self.upstream.stats()['state'], CircuitBreaker.CLOSED)
+
+    def test_deterministic_errors_are_not_retried_and_keep_the_breaker_closed(self):
+        for _ in range(5):
+            fn = Failing(KeyError('regularMarketPrice'))
+            with self.assertRaises(KeyError):
+                self.upstream.call(fn, retry_on=(OSError,))
+            self.assertEqual(fn.calls, 1)
+        self.assertEqual(self.upstream.stats(), {
+            'calls': 5, 'retried': 0, 'errors': 0, 'state': CircuitBreaker.CLOSED, 'failures': 0, 'rejected': 0,
+        })
+
+    def test_breaker_opens_after_failed_calls_and_probes_after_reset(self):
+        for _ in range(3):
+            with self.assertRaises(requests.exceptions.Timeout):
+                self.upstream.call(Failing(*[requests.exceptions.Timeout('slow') for _ in range(3)]))
+        self.assertEqual(self.upstream.stats()['state'], CircuitBreaker.OPEN)
+
+        fn = Failing()
+        with self.assertRaises(CircuitOpenError):
+            self.upstream.call(fn)
+        self.assertEqual(fn.calls, 0)
+
+        # Once RESET_TIMEOUT has passed one probe goes through and closes the breaker
+        self.upstream.breaker.opened_at -= 60
+        self.assertEqual(self.upstream.call(fn), 'ok')
+        self.assertEqual(self.upstream.stats()['state'], CircuitBreaker.CLOSED)
+
+    def test_yahoo_provider_retries_only_network_errors(self):
+        from StockSearch.market_data import YahooProvider
+
+        provider = YahooProvider()
+        provider.upstream = self.upstream
+        ticker = mock.Mock()
+        type(ticker).info = mock.PropertyMock(side_effect=[OSError('reset'), {'currentPrice': 10.0}])
+        with mock.patch('yfinance.Ticker', return_value=ticker):
+            self.assertEqual(provider.get_info('AAA.NS'), {'currentPrice': 10.0})
+
+        type(ticker).info = mock.PropertyMock(side_effect=ValueError('unparseable payload'))
+        with mock.patch('yfinance.Ticker', return_value=ticker):
+            with self.assertRaises(ValueError):
+                provider.get_info('AAA.NS')
+        self.assertEqual(self.upstream.stats()['retried'], 1)
+        self.assertEqual(self.upstream.stats()['failures'], 0)
+
+
+def hammer(path, hits, limit, results):
+    # Runs in a separate process
+    backend = ratelimit.SharedFileBackend(path=path, slots=1024)
+    results.put(sum(backend.hit('shared', limit, 10 ** 6).allowed for _ in range(hits)))
+
+
+class LimitedView:
+    @ratelimit.rate_limit('test_api', limit=5, period=60)
+    @ratelimit.global_rate_limit(limit=2, period=60)
+    def get(self, request):
+        return 'ok'
+
+
+class AsyncLimitedView:
+    @ratelimit.rate_limit('test_async_api', limit=1, period=60)
+    async def get(self, request):
+        return 'ok'
+
+
+@override_settings(RATE_LIMIT=dict(settings.RATE_LIMIT, BACKEND='backend_stockmatrix.ratelimit.CacheBackend'))
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'ratelimit.bin'
+        caches['default'].clear()
+        ratelimit.get_backend.cache_clear()
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+
+    def backends(self):
+        return [ratelimit.SharedFileBackend(path=self.path), ratelimit.CacheBackend()]
+
+    def allowed(self, backend, key, at, hits=20, limit=10, period=60):
+        with mock.patch.object(ratelimit.time, 'time', return_value=at):
+            return sum(backend.hit(key, limit, period).allowed for _ in range(hits))
+
+    def test_window(self):
+        self.assertEqual(ratelimit._window(125.0, 60), (2, 1 - 5 / 60, 55.0))
+
+    def test_sliding_window_estimate(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(self.allowed(backend, 'a', at=600), 10)
+                with mock.patch.object(ratelimit.time, 'time', return_value=630):
+                    self.assertEqual(backend.hit('a', 10, 60), (False, 0, 31))
+                # Half way through the next window half of the previous count still applies
+                self.assertEqual(self.allowed(backend, 'a', at=690), 5)
+                # A skipped window forgets the old counts
+                self.assertEqual(self.allowed(backend, 'a', at=840), 10)
+
+    def test_full_table_rejects_new_keys_until_slots_expire(self):
+        backend = ratelimit.SharedFileBackend(path=self.path, slots=ratelimit.SharedFileBackend.PROBES)
+        for n in range(backend.PROBES - 1):
+            self.assertEqual(self.allowed(backend, f'short{n}', at=1000, hits=1, period=1), 1)
+        self.assertEqual(self.allowed(backend, 'long', at=1000, limit=3, period=3600), 3)
+        self.assertEqual(self.allowed(backend, 'new', at=1000, hits=1), 0)
+
+        # Expired neighbours are reused; the live key keeps its count
+        self.assertEqual(self.allowed(backend, 'new', at=1010, hits=1), 1)
+        self.assertEqual(self.allowed(backend, 'long', at=1010, limit=3, period=3600), 0)
+
+    def test_rejected_requests_do_not_consume_other_limits(self):
+        request, view = SimpleNamespace(META={'REMOTE_ADDR': '10.0.0.1'}), LimitedView()
+        responses = [view.get(request) for _ in range(3)]
+        self.assertEqual(responses[:2], ['ok', 'ok'])
+        self.assertEqual(responses[2].status_code, 429)
+        self.assertEqual(responses[2].data, {'error': 'Global rate limit exceeded. Please try again later.'})
+        # Two requests counted against the client's limit of 5, not three
+        self.assertEqual(ratelimit.get_backend().hit('ratelimit:test_api:10.0.0.1', 5, 60).remaining, 2)
+
+    def test_async_views_check_off_the_event_loop(self):
+        request, view, threads = SimpleNamespace(META={'REMOTE_ADDR': '10.0.0.1'}), AsyncLimitedView(), []
+        hit_many = ratelimit.CacheBackend.hit_many
+
+        def recording_hit_many(backend, limits):
+            threads.append(threading.get_ident())
+            return hit_many(backend, limits)
+
+        async def scenario():
+            return threading.get_ident(), [await view.get(request) for _ in range(2)]
+
+        with mock.patch.object(ratelimit.CacheBackend, 'hit_many', recording_hit_many):
+            loop_thread, responses = asyncio.run(scenario())
+        self.assertEqual(responses[0], 'ok')
+        self.assertEqual(responses[1].status_code, 429)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_shared_file_is_atomic_across_processes(self):
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        workers = [context.Process(target=hammer, args=(str(self.path), 50, 120, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get(timeout=60) for _ in workers)
+        for worker in workers:
+            worker.join()
+        self.assertEqual(allowed, 120)
+
+
+class RecordingCache(LocMemCache):
+    """LocMemCache that records the thread of every call."""
+
+    def __init__(self):
+        super().__init__('response-cache-tests', {})
+        self.threads = []
+
+    def get(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().add(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().delete(*args, **kwargs)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = RecordingCache()
+        self.backend.clear()
+        patcher = mock.patch.object(ResponseCache, 'cache', new_callable=mock.PropertyMock, return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def clock(self, now):
+        """Patch the clock the response cache and LocMemCache both read."""
+        patcher = mock.patch.object(time, 'time', return_value=now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return patcher
+
+    def stale_while_revalidate(self):
+        """A ResponseCache with TTL 60 and STALE_TTL 600, its background refreshes queued for the test to run."""
+        refreshes = []
+        patcher = mock.patch.object(response_cache._refresh_executor, 'submit', side_effect=refreshes.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with override_settings(RESPONSE_CACHE={'test-swr': {'TTL': 60, 'STALE_TTL': 600}}):
+            return ResponseCache('test-swr'), refreshes
+
+    def test_fresh_stale_and_expired_entries(self):
+        values = iter(range(10))
+        cache, refreshes = self.stale_while_revalidate()
+        fetch = values.__next__
+
+        clock = self.clock(1000)
+        self.assertEqual(cache.get('AAA', fetch), 0)
+        clock.stop()
+        # Fresh for TTL seconds
+        clock = self.clock(1059)
+        self.assertEqual(cache.get('AAA', fetch), 0)
+        self.assertEqual(refreshes, [])
+        clock.stop()
+        # Then stale: served at once while one refresh runs in the background
+        clock = self.clock(1061)
+        self.assertEqual([cache.get('AAA', fetch) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(len(refreshes), 1)
+        refreshes.pop()()
+        self.assertEqual(cache.get('AAA', fetch), 1)
+        self.assertEqual(refreshes, [])
+        clock.stop()
+        # Past TTL + STALE_TTL the entry is gone and the next get fetches in line
+        self.clock(1061 + 661)
+        self.assertEqual(cache.get('AAA', fetch), 2)
+        self.assertEqual(cache.stats(), {'hits': 2, 'staleHits': 3, 'misses': 2})
+
+    def test_failed_refresh_keeps_serving_the_stale_value(self):
+        cache, refreshes = self.stale_while_revalidate()
+        self.clock(1000)
+        cache.get('AAA', lambda: 'quote')
+        self.clock(1100)
+
+        def failing():
+            raise requests.ConnectionError('upstream down')
+
+        self.assertEqual(cache.get('AAA', failing), 'quote')
+        with self.assertLogs('backend_stockmatrix.response_cache', 'WARNING'):
+            refreshes.pop()()
+        # The refresh lock was released, so the next stale read tries again
+        self.assertEqual(cache.get('AAA', lambda: 'new quote'), 'quote')
+        refreshes.pop()()
+        self.assertEqual(cache.get('AAA', failing), 'new quote')
+
+    def test_errors_on_a_miss_are_not_cached(self):
+        cache, _ = self.stale_while_revalidate()
+        self.clock(1000)
+        with self.assertRaises(requests.ConnectionError):
+            cache.get('AAA', mock.Mock(side_effect=requests.ConnectionError('upstream down')))
+        self.assertEqual(cache.get('AAA', lambda: 'quote'), 'quote')
+
+    def test_async_stale_values_refresh_once(self):
+        cache, _ = self.stale_while_revalidate()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return len(calls)
+
+        async def scenario():
+            with mock.patch.object(time, 'time', return_value=1000):
+                await cache.aget('AAA', fetch)
+            with mock.patch.object(time, 'time', return_value=1100):
+                stale = await asyncio.gather(*(cache.aget('AAA', fetch) for _ in range(5)))
+                await asyncio.gather(*response_cache._refresh_tasks)
+                return stale, await cache.aget('AAA', fetch)
+
+        stale, refreshed = asyncio.run(scenario())
+        self.assertEqual((stale, refreshed, len(calls)), ([1] * 5, 2, 2))
+
+    def test_async_lookups_and_refreshes_stay_off_the_event_loop(self):
+        cache = ResponseCache('test-async')
+
+        async def fetch():
+            return {'price': 1}
+
+        async def scenario():
+            first = await cache.aget_tagged('AAA', fetch)
+            with mock.patch.object(time, 'time', return_value=time.time() + cache.ttl + 1):
+                stale = await cache.aget_tagged('AAA', fetch)
+            await asyncio.gather(*response_cache._refresh_tasks)
+            return threading.get_ident(), first, stale
+
+        loop_thread, first, stale = asyncio.run(scenario())
+        self.assertEqual(first, stale)
+        # get and set on the miss; get, lock add, set and lock delete on the stale hit
+        self.assertEqual(len(self.backend.threads), 6)
+        self.assertNotIn(loop_thread, self.backend.threads)
+
+
+class InternalEndpointTests(SimpleTestCase):
+    def test_metrics_are_only_served_to_internal_addresses(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+        for address in ('10.0.0.5', '203.0.113.9', ''):
+            with self.subTest(address=address):
+                self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR=address).status_code, 403)
+        with override_settings(INTERNAL_IPS=['10.0.0.5']):
+            self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    def test_coalescing_stats_are_only_served_to_internal_addresses(self):
+        response = self.client.get('/api/upstream/coalescing/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('groups', response.json())
+        self.assertEqual(self.client.get('/api/upstream/coalescing/', REMOTE_ADDR='10.0.0.5').status_code, 403)
+
+
+class ConditionalResponseTests(SimpleTestCase):
+    ETAG = make_etag('funds', 1, [('sort', ['aum_cr'])])
+
+    def respond(self, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/api/mutualfunds/', headers=headers)
+        return conditional_response(request, self.ETAG) or tagged(JSONBytesResponse({'data': []}), self.ETAG)
+
+    def test_etags_are_strong_and_stable(self):
+        self.assertRegex(self.ETAG, r'^"[0-9a-f]{32}"$')
+        self.assertEqual(self.ETAG, make_etag('funds', 1, [('sort', ['aum_cr'])]))
+        self.assertNotEqual(self.ETAG, make_etag('funds', 2, [('sort', ['aum_cr'])]))
+        self.assertEqual(etag_for(b'{}'), etag_for(b'{}'))
+
+    def test_matching_if_none_match_gets_a_304(self):
+        for value in (self.ETAG, f'"other", {self.ETAG}', '*'):
+            with self.subTest(value=value):
+                response = self.respond(if_none_match=value)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual((response['ETag'], response.content), (self.ETAG, b''))
+        response = self.respond(if_none_match='"other"')
+        self.assertEqual((response.status_code, response['ETag']), (200, self.ETAG))
+
+    def test_failed_if_match_gets_a_412(self):
+        for value in ('"other"', f'W/{self.ETAG}'):
+            with self.subTest(value=value):
+                self.assertEqual(self.respond(if_match=value).status_code, 412)
+        for value in (self.ETAG, '*'):
+            with self.subTest(value=value):
+                self.assertEqual(self.respond(if_match=value).status_code, 200)
+
+    def test_if_none_match_compares_weakly_and_if_match_strongly(self):
+        weak = f'W/{self.ETAG}'
+        self.assertEqual(self.respond(if_none_match=weak).status_code, 304)
+        self.assertEqual(self.respond(if_match=weak).status_code, 412)
+
+    def test_matching_if_none_match_on_a_post_gets_a_412(self):
+        self.assertEqual(self.respond('post', if_none_match=self.ETAG).status_code, 412)
+        self.assertEqual(self.respond('post', if_none_match='"other"').status_code, 200)
+
+
+class RendererTests(SimpleTestCase):
+    PAYLOAD = {
+        'price': np.float64(1523.45),
+        'volume': np.int64(1250000),
+        'closes': np.array([101.5, 102.25, 99.0]),
+        'flags': np.array([True, False]),
+        'fetchedAt': datetime(2024, 2, 28, 9, 15, 30, 123456, tzinfo=timezone.utc),
+        'listedAt': datetime(2024, 2, 28, 9, 15, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+        'asOf': date(2024, 2, 28),
+        'nav': Decimal('12.3400'),
+        'name': 'Tata Consultancy \u2028Services',
+        7: 'seven',
+    }
+
+    def render(self, data):
+        return renderers.FastJSONRenderer().render(data, 'application/json', {})
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_orjson_output_matches_drf(self):
+        content = self.render(self.PAYLOAD)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(self.PAYLOAD)))
+        self.assertEqual(json.loads(content), {
+            'price': 1523.45,
+            'volume': 1250000,
+            'closes': [101.5, 102.25, 99.0],
+            'flags': [True, False],
+            'fetchedAt': '2024-02-28T09:15:30.123456Z',
+            'listedAt': '2024-02-28T09:15:30+05:30',
+            'asOf': '2024-02-28',
+            'nav': 12.34,
+            'name': 'Tata Consultancy \u2028Services',
+            '7': 'seven',
+        })
+        self.assertIn(b'\\u2028', content)
+        self.assertEqual(JSONBytesResponse(self.PAYLOAD).content, content)
+
+    def test_stdlib_fallback_renders_the_same_values(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            content = self.render(self.PAYLOAD)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(self.PAYLOAD)))
+        self.assertIn(b'\\u2028', content)
+
+    def test_indented_output_is_left_to_drf(self):
+        content = renderers.FastJSONRenderer().render({'a': [1]}, 'application/json; indent=2', {})
+        self.assertEqual(content, b'{\n  "a": [\n    1\n  ]\n}')
@@ -0,0 +1,241 @@
+"""
+Resilient access to upstream services (Yahoo, moneycontrol, ...).
+
+Each upstream host gets one ``Upstream`` holding:
+
+* a ``requests.Session`` whose keep-alive connection pool is reused by every
+  thread in the process, so repeat calls skip the TCP and TLS handshakes
+* retries with full-jitter exponential backoff for connection errors,
+  timeouts and 429/5xx responses
+* a circuit breaker.  After ``FAILURE_THRESHOLD`` consecutive failed calls
+  the breaker opens, and calls fail at once with ``CircuitOpenError`` for
+  ``RESET_TIMEOUT`` seconds instead of waiting out the timeout.  Then one
+  probe call is let through, and its outcome closes or reopens the breaker.
+
+``CircuitOpenError`` is a ``requests.exceptions.ConnectionError``, so existing
+handlers treat an open breaker like an unreachable upstream.  Callers holding
+older data (the price store, the response cache) serve that data instead.
+
+``get`` uses the pooled session.  ``afetch`` applies the same policy to the
+pooled async client.  ``call`` wraps any other client, such as yfinance.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .async_http import UPSTREAM_ERRORS, get_async_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 32,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF_BASE': 0.25,
+    'BACKOFF_MAX': 4.0,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT': 30,
+    'USER_AGENT': 'Mozilla/5.0 (compatible; StockMatrix/1.0)',
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+TRANSIENT_ERRORS = (requests.exceptions.RequestException, *UPSTREAM_ERRORS)
+
+upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream_setting(name):
+    return getattr(settings, 'UPSTREAM', {}).get(name, DEFAULTS[name])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    def __init__(self, name, retry_in):
+        super().__init__(f"Upstream {name} is unavailable; retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) or getattr(error, 'status', None)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            retry_in = self.opened_at + self.reset_timeout - now
+            if retry_in <= 0:
+                # Let one probe through (another if it has not reported back
+                # within reset_timeout); everyone else keeps failing fast
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+            self.rejected += 1
+        raise CircuitOpenError(self.name, max(retry_in, 0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Upstream {self.name} recovered; closing circuit")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Upstream {self.name} failing; opening circuit for {self.reset_timeout}s")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class Upstream:
+    def __init__(self, name):
+        self.name = name
+        self.retries = upstream_setting('RETRIES')
+        self.timeout = (upstream_setting('CONNECT_TIMEOUT'), upstream_setting('READ_TIMEOUT'))
+        self.breaker = CircuitBreaker(name, upstream_setting('FAILURE_THRESHOLD'), upstream_setting('RESET_TIMEOUT'))
+        self.calls = 0
+        self.retried = 0
+        self.errors = 0
+        self._counter_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=upstream_setting('POOL_CONNECTIONS'),
+            pool_maxsize=upstream_setting('POOL_MAXSIZE'),
+            max_retries=0,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = upstream_setting('USER_AGENT')
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def backoff(self, attempt):
+        # Full jitter: spreads out the retries of callers that failed together
+        return random.uniform(0, min(upstream_setting('BACKOFF_MAX'), upstream_setting('BACKOFF_BASE') * 2 ** attempt))
+
+    def _failed(self, error, attempt, retry_on):
+        """Record a failed attempt; True if it should be retried."""
+        if isinstance(error, CircuitOpenError):
+            return False
+        status_code = _status_code(error)
+        if not isinstance(error, retry_on) or (status_code is not None and status_code not in RETRY_STATUSES):
+            # The upstream answered, so the breaker counts it as healthy
+            self.breaker.record_success()
+            return False
+        self._count('errors')
+        # A failed probe reopens the breaker straight away
+        if attempt < self.retries and self.breaker.state == CircuitBreaker.CLOSED:
+            self._count('retried')
+            return True
+        self.breaker.record_failure()
+        return False
+
+    def call(self, fn, retry_on=TRANSIENT_ERRORS):
+        """Run ``fn()`` under the retry and circuit breaker policy.
+
+        Exceptions of the ``retry_on`` types (other than 4xx responses) are
+        retried and count against the breaker; anything else propagates at once.
+        """
+        self._count('calls')
+        for attempt in range(self.retries + 1):
+            self.breaker.allow()
+            try:
+                result = fn()
+            except Exception as e:
+                if not self._failed(e, attempt, retry_on):
+                    raise
+                logger.info(f"Retrying {self.name} after {type(e).__name__}: {str(e)}")
+                time.sleep(self.backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def get(self, url, **kwargs):
+        """GET ``url`` through the pooled session; raises for error statuses.
+
+        With ``stream=True`` only establishing the response is retried; the
+        caller reads the body (and should close the response).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+
+        def request():
+            response = self.session.get(url, **kwargs)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+            return response
+        return self.call(request)
+
+    async def afetch(self, url, read, **kwargs):
+        """GET ``url`` with the pooled async client and return ``await read(response)``."""
+        self._count('calls')
+        for attempt in range(self.retries + 1):
+            self.breaker.allow()
+            try:
+                async with get_async_client().get(url, **kwargs) as response:
+                    result = await read(response)
+            except UPSTREAM_ERRORS as e:
+                if not self._failed(e, attempt, UPSTREAM_ERRORS):
+                    raise
+                logger.info(f"Retrying {self.name} after {type(e).__name__}: {str(e)}")
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self):
+        with self._counter_lock:
+            counters = {'calls': self.calls, 'retried': self.retried, 'errors': self.errors}
+        return dict(counters, **self.breaker.stats())
+
+
+def get_upstream(name_or_url):
+    """The shared Upstream for a host (given as a URL or a host name) or a named client."""
+    name = urlsplit(name_or_url).netloc or name_or_url
+    with _upstreams_lock:
+        if name not in upstreams:
+            upstreams[name] = Upstream(name)
+        return upstreams[name]
+
+
+def all_stats():
+    with _upstreams_lock:
+        return {name: upstream.stats() for name, upstream in upstreams.items()}
@@ -17,10 +17,13 @@ Including another URLconf
 # backend_stockmatrix/urls.py
 from django.contrib import admin
 from django.urls import path, include
+from .views import CoalescingStatsView, MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),                    # Django admin path
     path('api/', include('StockSearch.urls')),  # Include the URLs from the StockSearch app
     path('api/',include('MutualFund.urls')),
+    path('api/upstream/coalescing/', CoalescingStatsView.as_view(), name='coalescing-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
    
 ]
@@ -0,0 +1,28 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from .metrics import CONTENT_TYPE, render_metrics
+from .permissions import IsInternalRequest
+from .singleflight import all_stats
+
+
+class CoalescingStatsView(APIView):
+    """Single-flight coalescing counters per group, for INTERNAL_IPS only."""
+
+    authentication_classes = []
+    permission_classes = [IsInternalRequest]
+
+    def get(self, request):
+        return Response({'groups': all_stats()}, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """This worker's metrics in the Prometheus text exposition format, for INTERNAL_IPS only."""
+
+    authentication_classes = []
+    permission_classes = [IsInternalRequest]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
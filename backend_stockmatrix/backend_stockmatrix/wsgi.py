@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_stockmatrix.settings')
 
 application = get_wsgi_application()
+
+# Imports PRELOAD['MODULES'] and calls PRELOAD['CALLABLES'] before the first request
+from backend_stockmatrix.preload import preload  # noqa: E402
+
+preload()
@@ -292,20 +292,28 @@ const StockDetails = ({ data }) => {
     return parseFloat(value) >= 0 ? "positive-change" : "negative-change";
   };
 
+  // Indicators are null until enough history has been seen
+  const isNumber = (value) => typeof value === "number" && !Number.isNaN(value);
+
+  const formatIndicator = (value) => (isNumber(value) ? value.toFixed(2) : "N/A");
+
   // Indicator health status
   const getRSIStatus = (value) => {
+    if (!isNumber(value)) return "N/A";
     if (value > 70) return "Overbought";
     if (value < 30) return "Oversold";
     return "Neutral";
   };
 
   const getMACDStatus = (macd, signal) => {
+    if (!isNumber(macd) || !isNumber(signal)) return "N/A";
     if (macd > signal) return "Bullish";
     if (macd < signal) return "Bearish";
     return "Neutral";
   };
 
   const getMAStatus = (price, ma50, ma200) => {
+    if (!isNumber(ma50) || !isNumber(ma200)) return "N/A";
     if (price > ma50 && ma50 > ma200) return "Strong Uptrend";
     if (price < ma50 && ma50 < ma200) return "Strong Downtrend";
     if (ma50 > ma200) return "Bullish Crossover";
@@ -374,7 +382,7 @@ const StockDetails = ({ data }) => {
         <h2>Stock Price Chart</h2>
         <div className="chart-container">
           <img
-            src={`data:image/jpeg;base64,${graph}`}
+            src={`http://127.0.0.1:8000${graph}`}
             alt="Stock Price Chart"
             className="stock-chart"
           />
@@ -518,15 +526,16 @@ const StockDetails = ({ data }) => {
                   <td>
                     <span
                       className={`indicator-value ${
-                        technicalIndicators.RSI > 70
+                        getRSIStatus(technicalIndicators.RSI) === "Overbought"
                           ? "overbought"
-                          : technicalIndicators.RSI < 30
+                          : getRSIStatus(technicalIndicators.RSI) === "Oversold"
                           ? "oversold"
                           : "neutral"
                       }`}
                     >
-                      {technicalIndicators.RSI.toFixed(2)} (
-                      {getRSIStatus(technicalIndicators.RSI)})
+                      {formatIndicator(technicalIndicators.RSI)}
+                      {isNumber(technicalIndicators.RSI) &&
+                        ` (${getRSIStatus(technicalIndicators.RSI)})`}
                     </span>
                   </td>
                 </tr>
@@ -543,19 +552,26 @@ const StockDetails = ({ data }) => {
                   <td>
                     <span
                       className={`indicator-value ${
-                        technicalIndicators.MACD >
-                        technicalIndicators.SignalLine
+                        getMACDStatus(
+                          technicalIndicators.MACD,
+                          technicalIndicators.SignalLine
+                        ) === "Bullish"
                           ? "positive-change"
-                          : "negative-change"
+                          : getMACDStatus(
+                              technicalIndicators.MACD,
+                              technicalIndicators.SignalLine
+                            ) === "Bearish"
+                          ? "negative-change"
+                          : ""
                       }`}
                     >
-                      {technicalIndicators.MACD.toFixed(2)}
+                      {formatIndicator(technicalIndicators.MACD)}
                     </span>
                   </td>
                 </tr>
                 <tr>
                   <td>Signal Line:</td>
-                  <td>{technicalIndicators.SignalLine.toFixed(2)}</td>
+                  <td>{formatIndicator(technicalIndicators.SignalLine)}</td>
                 </tr>
                 <tr>
                   <td>MA Status:</td>